@@ -3,6 +3,7 @@ GoodFoods Restaurant Reservation System
 Main Streamlit Application with Llama-3.3-70B AI
 """
 
+import html
 import streamlit as st
 import sys
 from pathlib import Path
@@ -83,16 +84,29 @@ def initialize_session_state():
         st.session_state.agent = None
 
 
+@st.cache_resource
+def get_database() -> RestaurantDatabase:
+    """One pooled database shared by every session"""
+    db = RestaurantDatabase()
+    # Build the in-memory location indexes at startup rather than on the first turn
+    db.facets.refresh()
+    db.text_index.refresh()
+    db.resolver.refresh()
+    db.spatial.refresh()
+    db.demand.refresh()
+    return db
+
+
 def initialize_agent():
     """Initialize the AI agent and database"""
     if not st.session_state.agent_initialized:
         try:
             with st.spinner("Initializing AI agent..."):
-                # Initialize database
-                db = RestaurantDatabase()
+                # Shared database (per-thread readers, one serialized writer)
+                db = get_database()
                 
                 # Initialize ML models
-                no_show_predictor = NoShowPredictor()
+                no_show_predictor = NoShowPredictor(db)
                 recommendation_engine = RecommendationEngine(db)
                 
                 # Initialize Llama agent
@@ -132,6 +146,8 @@ def render_sidebar():
         st.sidebar.write(f"**Time:** {res.get('time', 'N/A')}")
         st.sidebar.write(f"**Party Size:** {res.get('party_size', 'N/A')}")
     
+    render_usage()
+    
     st.sidebar.markdown("---")
     
     if st.sidebar.button("🔄 Clear Conversation", use_container_width=True):
@@ -140,7 +156,7 @@ def render_sidebar():
         st.session_state.active_reservation = None
         # Reset chat in agent
         if st.session_state.agent:
-            st.session_state.agent.chat = None
+            st.session_state.agent.reset_conversation()
         st.rerun()
     
     st.sidebar.markdown("---")
@@ -154,6 +170,37 @@ def render_sidebar():
     )
 
 
+def render_usage():
+    """Render this session's token, cost and latency accounting"""
+    if not st.session_state.agent:
+        return
+    report = st.session_state.agent.get_usage_report()
+    totals = report["totals"]
+    
+    st.sidebar.markdown("### 📊 Usage")
+    col1, col2 = st.sidebar.columns(2)
+    col1.metric("Tokens", f"{totals['total_tokens']:,}")
+    col2.metric("Cost", f"${totals['cost_usd']:.4f}")
+    st.sidebar.caption(
+        f"{totals['calls']} model calls ({totals['cached_calls']} cached) in {totals['turns']} turns, "
+        f"{totals['latency_ms'] / 1000:.1f}s waiting on the model"
+    )
+    
+    budget = report["budget"]
+    if budget["state"] == "hard":
+        st.sidebar.error("Token budget used up - only quick searches and cancellations still work")
+    elif budget["state"] == "soft":
+        st.sidebar.warning("Soft token budget reached - older messages are trimmed harder")
+    
+    if report["by_path"]:
+        with st.sidebar.expander("Tokens by tool path"):
+            st.table([
+                {"path": path, "calls": row["calls"], "tokens": row["total_tokens"],
+                 "cost ($)": f"{row['cost_usd']:.4f}"}
+                for path, row in sorted(report["by_path"].items(), key=lambda item: -item[1]["total_tokens"])
+            ])
+
+
 def render_conversation():
     """Render conversation history"""
     st.markdown("## 💬 Conversation")
@@ -175,14 +222,14 @@ def render_conversation():
     for message in st.session_state.conversation_history:
         if message["role"] == "user":
             # Escape HTML in user content
-            content = message["content"].replace("<", "&lt;").replace(">", "&gt;")
+            content = html.escape(message["content"])
             st.markdown(
                 f'<div class="message-user"><strong>You:</strong> {content}</div>',
                 unsafe_allow_html=True
             )
         else:
             # Escape HTML in assistant content to prevent rendering raw function calls
-            content = message["content"].replace("<", "&lt;").replace(">", "&gt;")
+            content = html.escape(message["content"])
             st.markdown(
                 f'<div class="message-assistant"><strong>AI Assistant:</strong> {content}</div>',
                 unsafe_allow_html=True
@@ -199,20 +246,55 @@ def render_conversation():
                         })
 
 
-def process_user_input(user_input: str):
-    """Process user input through the agent"""
+def render_streaming_reply(placeholder, text: str, status: str = ""):
+    """Render a partially generated assistant reply"""
+    content = html.escape(text)
+    if status:
+        content += f"<br><em>{status}</em>"
+    placeholder.markdown(
+        f'<div class="message-assistant"><strong>AI Assistant:</strong> {content}▌</div>',
+        unsafe_allow_html=True
+    )
+
+
+def process_user_input(user_input: str, live_area=None):
+    """Process user input through the agent, rendering the reply as it streams"""
     # Add user message
     st.session_state.conversation_history.append({
         "role": "user",
         "content": user_input
     })
     
+    live_area = live_area or st.container()
+    with live_area:
+        content = html.escape(user_input)
+        st.markdown(
+            f'<div class="message-user"><strong>You:</strong> {content}</div>',
+            unsafe_allow_html=True
+        )
+        placeholder = st.empty()
+    
     try:
-        # Get agent response
-        response = st.session_state.agent.process_message(
+        # Stream agent events: text deltas and tool progress
+        response = None
+        text = ""
+        render_streaming_reply(placeholder, text, "Thinking...")
+        for event in st.session_state.agent.stream_message(
             user_input,
             st.session_state.conversation_history
-        )
+        ):
+            if event["type"] == "text":
+                text += event["delta"]
+                render_streaming_reply(placeholder, text)
+            elif event["type"] == "replace":
+                text = event["text"]
+                render_streaming_reply(placeholder, text)
+            elif event["type"] == "tool_call":
+                render_streaming_reply(placeholder, text, f"🔧 Running {event['name']}...")
+            elif event["type"] == "done":
+                response = event["response"]
+        
+        response = response or {}
         
         # Update active reservation if created
         if response.get("reservation_created"):
@@ -242,9 +324,16 @@ def main():
     # Initialize agent
     if not initialize_agent():
         st.stop()
-    
+
+    # Follow-ups the model finished writing in the background since the last run
+    for text in st.session_state.agent.collect_follow_ups():
+        st.session_state.conversation_history.append({"role": "assistant", "content": text})
+
     render_conversation()
     
+    # Streaming replies render here, below the finished conversation
+    live_area = st.container()
+    
     # Input section
     st.markdown("## ✍️ Your Message")
     
@@ -262,7 +351,7 @@ def main():
         send_button = st.button("📤 Send", use_container_width=True, type="primary")
     
     if send_button and user_input.strip():
-        process_user_input(user_input)
+        process_user_input(user_input, live_area)
         st.rerun()
 
 
@@ -0,0 +1,3 @@
+"""
+Load tests and benchmarks for GoodFoods (run from the repository root)
+"""
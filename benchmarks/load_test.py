@@ -0,0 +1,322 @@
+"""
+Concurrent conversation load generator
+Runs N simultaneous scripted conversations (search -> select -> book ->
+modify -> cancel) through LlamaAgent and RestaurantDatabase against the
+offline LLM stand-in, and reports throughput, per-stage turn latency
+percentiles, sqlite write-lock waits and errors as JSON.
+
+    python -m benchmarks.load_test --users 20 --conversations 200 --output load.json
+    python -m benchmarks.load_test --compare load.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+
+STAGES = ["search", "select", "book", "modify", "cancel"]
+CITIES = ["San Francisco", "New York", "Los Angeles", "Chicago", "Austin", "Seattle", "Miami", "Boston"]
+TIMES = ["18:00", "18:30", "19:00", "19:30", "20:00", "20:30"]
+NAMES = ["Ann Lee", "Ravi Shah", "Maria Lopez", "Tom Baker", "Yuki Sato", "Sam Cole"]
+
+# What a successful turn of each stage produces
+EXPECTED_TOOL = {"search": "search_available_slots", "book": "create_reservation",
+                 "modify": "modify_reservation", "cancel": "cancel_reservation"}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """q-th percentile (0-100) with linear interpolation; None for no data"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """Count, mean and tail percentiles of latencies in seconds, reported in ms"""
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+    return {
+        "count": len(values),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(max(values)) if values else None,
+    }
+
+
+def conversation_script(rng: random.Random, fast_path: bool) -> List[Tuple[str, str]]:
+    """One customer's (stage, message) turns"""
+    day = (date.today() + timedelta(days=rng.randint(1, 60))).isoformat()
+    party = rng.randint(2, 6)
+    # A preference word keeps the search on the model path unless asked otherwise
+    preference = "" if fast_path else " somewhere nice"
+    return [
+        ("search", f"Table for {party} in {rng.choice(CITIES)} on {day} at {rng.choice(TIMES)}{preference}"),
+        ("select", "The first one sounds great"),
+        ("book", f"Please book it, my name is {rng.choice(NAMES)} and my phone is "
+                 f"555-{rng.randint(0, 9999):04d}"),
+        ("modify", f"Can you change it to a party of {party + 1}?"),
+        ("cancel", "Actually, please cancel the reservation"),
+    ]
+
+
+class Recorder:
+    """Thread-safe collection of timings and errors"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.turns: Dict[str, List[float]] = defaultdict(list)
+        self.turn_llm: Dict[str, List[float]] = defaultdict(list)
+        self.turn_tools: Dict[str, List[float]] = defaultdict(list)
+        self.llm_calls: List[float] = []
+        self.tools: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.stage_errors: Counter = Counter()
+        self.conversations_completed = 0
+        self.local = threading.local()
+
+    def add(self, target: str, key: Optional[str], seconds: float):
+        """Record an LLM call or tool run against the current thread's turn"""
+        with self.lock:
+            if target == "llm":
+                self.llm_calls.append(seconds)
+            else:
+                self.tools[key].append(seconds)
+        setattr(self.local, target, getattr(self.local, target, 0.0) + seconds)
+
+
+class TimedClient:
+    """Completion client wrapper that times every call"""
+
+    def __init__(self, client: Any, recorder: Recorder):
+        self.client = client
+        self.recorder = recorder
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.client.chat.completions.create(**kwargs)
+        finally:
+            self.recorder.add("llm", None, time.perf_counter() - started)
+
+
+class TimedAgent(LlamaAgent):
+    """LlamaAgent that times each tool execution"""
+
+    recorder: Recorder = None
+
+    def _execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            return super()._execute_tool(tool_name, arguments)
+        finally:
+            self.recorder.add("tools", tool_name, time.perf_counter() - started)
+
+
+def _stage_error(stage: str, response: Dict[str, Any]) -> Optional[str]:
+    """Why a turn did not do what its stage needs, or None"""
+    text = response.get("response_text") or ""
+    if text.startswith("I apologize, I encountered an error"):
+        return text
+    expected = EXPECTED_TOOL.get(stage)
+    if expected is None:
+        return None
+    results = [call["result"] for call in response.get("tool_calls", []) if call["name"] == expected]
+    if not results:
+        return f"{stage}: {expected} was not called"
+    if not results[-1].get("success"):
+        return f"{stage}: {results[-1].get('error')}"
+    if stage == "search" and not results[-1].get("count"):
+        return "search: no available restaurants"
+    return None
+
+
+def run_conversation(agent: LlamaAgent, script: List[Tuple[str, str]], recorder: Recorder):
+    """Play one conversation, stopping at the first failed stage"""
+    for stage, message in script:
+        recorder.local.llm = recorder.local.tools = 0.0
+        started = time.perf_counter()
+        try:
+            response = agent.process_message(message)
+            error = _stage_error(stage, response)
+        except Exception as e:
+            error = f"{stage}: {type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+
+        with recorder.lock:
+            recorder.turns[stage].append(elapsed)
+            recorder.turn_llm[stage].append(recorder.local.llm)
+            recorder.turn_tools[stage].append(recorder.local.tools)
+            if error:
+                recorder.errors[error[:200]] += 1
+                recorder.stage_errors[stage] += 1
+        if error:
+            return
+    with recorder.lock:
+        recorder.conversations_completed += 1
+
+
+def _git_commit() -> Optional[str]:
+    """HEAD of the working tree, for comparing runs across commits"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_load_test(users: int = 10, conversations: int = 50, db_path: Optional[str] = None,
+                  latency_ms: float = 50, token_latency_ms: float = 0.5, seed: int = 7,
+                  fast_path: bool = False, quiet: bool = True) -> Dict[str, Any]:
+    """Run the load test and return the JSON-ready report"""
+    temp_dir = None
+    if db_path is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(temp_dir.name, "load.db")
+
+    db = RestaurantDatabase(db_path)
+    recorder = Recorder()
+    client = TimedClient(LocalClient(ScriptedResponder(), latency_ms, token_latency_ms), recorder)
+    predictor, engine = NoShowPredictor(db), RecommendationEngine(db)
+    agent_class = type("LoadTestAgent", (TimedAgent,), {"recorder": recorder})
+
+    rng = random.Random(seed)
+    scripts = [conversation_script(rng, fast_path) for _ in range(conversations)]
+
+    # One agent per conversation, measuring the agent rather than the completion
+    # cache; each announces its model on creation, which quiet keeps out of the report
+    with contextlib.redirect_stdout(io.StringIO() if quiet else sys.stdout):
+        agents = [agent_class(db, predictor, engine, client=client, use_cache=False, fast_path=fast_path)
+                  for _ in scripts]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users, thread_name_prefix="load-user") as executor:
+        futures = [executor.submit(run_conversation, agent, script, recorder)
+                   for agent, script in zip(agents, scripts)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    write_stats = db.pool.write_stats()
+    db.close()
+    if temp_dir:
+        temp_dir.cleanup()
+
+    all_turns = [t for stage in STAGES for t in recorder.turns[stage]]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": {"users": users, "conversations": conversations, "latency_ms": latency_ms,
+                       "token_latency_ms": token_latency_ms, "seed": seed, "fast_path": fast_path},
+        },
+        "summary": {
+            "duration_s": round(elapsed, 3),
+            "turns": len(all_turns),
+            "turns_per_s": round(len(all_turns) / elapsed, 2) if elapsed else None,
+            "conversations_completed": recorder.conversations_completed,
+            "conversations_per_s": round(recorder.conversations_completed / elapsed, 2) if elapsed else None,
+            "errors": sum(recorder.errors.values()),
+            "turn_latency": summarize(all_turns),
+        },
+        "stages": {
+            stage: {
+                **summarize(recorder.turns[stage]),
+                "errors": recorder.stage_errors[stage],
+                "llm_mean_ms": summarize(recorder.turn_llm[stage])["mean_ms"],
+                "tools_mean_ms": summarize(recorder.turn_tools[stage])["mean_ms"],
+            }
+            for stage in STAGES
+        },
+        "llm_calls": summarize(recorder.llm_calls),
+        "tools": {name: summarize(times) for name, times in sorted(recorder.tools.items())},
+        "sqlite": {
+            **write_stats,
+            "wait_seconds": round(write_stats["wait_seconds"], 6),
+            "max_wait_seconds": round(write_stats["max_wait_seconds"], 6),
+            "mean_wait_ms": round(write_stats["wait_seconds"] * 1000 / write_stats["transactions"], 3)
+            if write_stats["transactions"] else None,
+            "locked_errors": sum(count for error, count in recorder.errors.items() if "locked" in error),
+        },
+        "errors": dict(recorder.errors.most_common(20)),
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """Human-readable summary, with p95 deltas against a baseline report"""
+    summary = report["summary"]
+    print(f"{summary['turns']} turns in {summary['duration_s']}s - {summary['turns_per_s']} turns/s, "
+          f"{summary['conversations_completed']} conversations completed, {summary['errors']} errors")
+    print(f"{'stage':<8} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'llm ms':>8} "
+          f"{'tools ms':>9} {'errors':>6}" + ("  p95 vs baseline" if baseline else ""))
+    for stage, row in report["stages"].items():
+        line = (f"{stage:<8} {row['count']:>6} {row['p50_ms'] or 0:>9.1f} {row['p95_ms'] or 0:>9.1f} "
+                f"{row['p99_ms'] or 0:>9.1f} {row['llm_mean_ms'] or 0:>8.1f} {row['tools_mean_ms'] or 0:>9.1f} "
+                f"{row['errors']:>6}")
+        before = (baseline or {}).get("stages", {}).get(stage, {}).get("p95_ms")
+        if before and row["p95_ms"]:
+            line += f"  {(row['p95_ms'] - before) / before:+.1%}"
+        print(line)
+    sqlite = report["sqlite"]
+    print(f"sqlite writes: {sqlite['transactions']} transactions, {sqlite['contended']} waited for the lock, "
+          f"mean wait {sqlite['mean_wait_ms']} ms, max {sqlite['max_wait_seconds'] * 1000:.1f} ms, "
+          f"{sqlite['locked_errors']} 'database is locked' errors")
+    for error, count in report["errors"].items():
+        print(f"  {count:>5} x {error}")
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Concurrent conversation load test (offline LLM stand-in)")
+    parser.add_argument("--users", type=int, default=10, help="concurrent conversations")
+    parser.add_argument("--conversations", type=int, default=50, help="total conversations to run")
+    parser.add_argument("--db", help="database file (default: a fresh temporary database)")
+    parser.add_argument("--latency-ms", type=float, default=50, help="stand-in time to first token")
+    parser.add_argument("--token-latency-ms", type=float, default=0.5, help="stand-in time per token")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--fast-path", action="store_true", help="let the intent router answer searches")
+    parser.add_argument("--verbose", action="store_true", help="keep the agent's own output")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare p95 latencies against")
+    args = parser.parse_args()
+
+    report = run_load_test(args.users, args.conversations, args.db, args.latency_ms,
+                           args.token_latency_ms, args.seed, args.fast_path, quiet=not args.verbose)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Microbenchmarks for the database and scoring hot paths
+Times each hot path at several data scales with warm-up and repeated runs,
+captures peak Python memory, and compares medians against a stored baseline.
+
+    python -m benchmarks.microbench --scales 87:0,1000:100000 --output bench.json
+    python -m benchmarks.microbench --save-baseline benchmarks/baseline.json
+    python -m benchmarks.microbench --baseline benchmarks/baseline.json   # exit 1 on regression
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.load_test import _git_commit, percentile
+from src.database.generator import DEFAULT_CITIES as CITIES, DEFAULT_CUISINES as CUISINES, PRICE_RANGES
+from src.database.generator import GeneratorConfig, generate_database
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.no_show import fit_no_show_model
+from src.database.restaurant_db import RestaurantDatabase
+
+# (locations, reservations) presets
+SCALE_PRESETS = {
+    "smoke": [(87, 0)],
+    "default": [(87, 0), (1_000, 100_000), (10_000, 1_000_000)],
+    "full": [(87, 0), (1_000, 100_000), (10_000, 1_000_000), (100_000, 10_000_000)],
+}
+
+TIMES = [f"{hour:02d}:{minute:02d}" for hour in range(11, 22) for minute in (0, 30)]
+
+
+def build_fixture(path: str, locations: int, reservations: int, seed: int = 0):
+    """Create a database with the given numbers of locations and reservations"""
+    generate_database(path, GeneratorConfig(locations=locations, reservations=reservations, seed=seed))
+
+
+def fixture_path(data_dir: str, locations: int, reservations: int, seed: int) -> str:
+    """Build (once) and return the database file for a scale"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench_gen_{locations}_{reservations}_{seed}.db")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        for suffix in ("", "-wal", "-shm"):
+            # Left behind by an interrupted build
+            if os.path.exists(path + ".partial" + suffix):
+                os.remove(path + ".partial" + suffix)
+        build_fixture(path + ".partial", locations, reservations, seed)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + ".partial" + suffix):
+                os.replace(path + ".partial" + suffix, path + suffix)
+        print(f"  built {os.path.basename(path)} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+
+# --- Benchmarks: each returns a zero-argument callable doing one operation ---------
+
+def bench_get_available_slots(db, rng, calls):
+    def run():
+        db.get_available_slots(_future_date(rng), rng.choice(TIMES), rng.randint(1, 8),
+                               cuisine=rng.choice(CUISINES) if rng.random() < 0.5 else None,
+                               city=rng.choice(CITIES))
+    return run
+
+
+def bench_create_reservation(db, rng, calls):
+    location_ids = _location_ids(db)
+
+    def run():
+        db.create_reservation(rng.choice(location_ids), _future_date(rng), rng.choice(TIMES),
+                              rng.randint(1, 4), "Bench Guest", "555-0100")
+    return run
+
+
+def bench_modify_reservation(db, rng, calls):
+    confirmations = _seed_reservations(db, rng, 50)
+
+    def run():
+        db.modify_reservation(rng.choice(confirmations), {"party_size": rng.randint(1, 4)})
+    return run
+
+
+def bench_cancel_reservation(db, rng, calls):
+    # One fresh reservation per call; creating them is not timed
+    confirmations = _seed_reservations(db, rng, calls)
+
+    def run():
+        db.cancel_reservation(confirmations.pop())
+    return run
+
+
+def bench_get_statistics(db, rng, calls):
+    return db.get_statistics
+
+
+def bench_get_recommendations(db, rng, calls):
+    engine = RecommendationEngine(db)
+
+    def run():
+        engine.get_recommendations(party_size=rng.randint(1, 8), cuisine=rng.choice(CUISINES),
+                                   occasion="casual", budget=rng.choice(PRICE_RANGES))
+    return run
+
+
+def bench_predict_demand(db, rng, calls):
+    location_ids = _location_ids(db)
+
+    def run():
+        db.predict_demand(rng.choice(location_ids), _future_date(rng), rng.choice(TIMES))
+    return run
+
+
+def _fitted_predictor(db):
+    """Predictor with a model fitted on the fixture's history, else the configured one"""
+    try:
+        return NoShowPredictor(db, model=fit_no_show_model(db.conn))
+    except ValueError:
+        return NoShowPredictor(db)
+
+
+def bench_predict_risk(db, rng, calls):
+    predictor = _fitted_predictor(db)
+
+    def run():
+        predictor.predict_risk(party_size=rng.randint(1, 12), advance_days=rng.randint(0, 60),
+                               occasion=rng.choice(["casual", "business", "anniversary"]),
+                               customer_phone="555-0100", date=_future_date(rng))
+    return run
+
+
+def bench_score_upcoming(db, rng, calls):
+    # The nightly pass: every confirmed future reservation in one batch
+    return _fitted_predictor(db).score_upcoming
+
+
+BENCHMARKS: Dict[str, Callable[[RestaurantDatabase, random.Random, int], Callable[[], Any]]] = {
+    "get_available_slots": bench_get_available_slots,
+    "create_reservation": bench_create_reservation,
+    "modify_reservation": bench_modify_reservation,
+    "cancel_reservation": bench_cancel_reservation,
+    "get_statistics": bench_get_statistics,
+    "get_recommendations": bench_get_recommendations,
+    "predict_risk": bench_predict_risk,
+    "predict_demand": bench_predict_demand,
+    "score_upcoming": bench_score_upcoming,
+}
+
+
+def _future_date(rng: random.Random) -> str:
+    return (date.today() + timedelta(days=rng.randint(1, 90))).isoformat()
+
+
+def _location_ids(db: RestaurantDatabase) -> List[str]:
+    return [row["location_id"] for row in db.conn.execute("SELECT location_id FROM locations")]
+
+
+def _seed_reservations(db: RestaurantDatabase, rng: random.Random, count: int) -> List[str]:
+    """Create count small reservations for write benchmarks"""
+    location_ids = _location_ids(db)
+    return [
+        db.create_reservation(rng.choice(location_ids), _future_date(rng), rng.choice(TIMES), 1,
+                              "Bench Guest", "555-0100")["confirmation_number"]
+        for _ in range(count)
+    ]
+
+
+# --- Runner --------------------------------------------------------------------
+
+def measure(make: Callable[[], Callable[[], Any]], warmup: int, repeat: int) -> Dict[str, Any]:
+    """Warm up, time repeat calls, then one traced pass for the memory peak"""
+    run = make(warmup + repeat + 1)
+    for _ in range(warmup):
+        run()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def ms(value):
+        return round(value * 1000, 4)
+    median = statistics.median(timings)
+    return {
+        "repeat": repeat,
+        "min_ms": ms(min(timings)),
+        "median_ms": ms(median),
+        "mean_ms": ms(statistics.fmean(timings)),
+        "p95_ms": ms(percentile(timings, 95)),
+        "stdev_ms": ms(statistics.stdev(timings)) if len(timings) > 1 else 0.0,
+        "ops_per_s": round(1 / median, 1) if median else None,
+        "py_peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_suite(scales: List[Tuple[int, int]], benchmarks: Optional[List[str]] = None,
+              warmup: int = 5, repeat: int = 50, data_dir: str = "bench_data",
+              seed: int = 0) -> Dict[str, Any]:
+    """Run the selected benchmarks at every scale"""
+    results = []
+    work_dir = tempfile.TemporaryDirectory()
+    for locations, reservations in scales:
+        # Write benchmarks run on a copy so the cached fixture never drifts
+        path = os.path.join(work_dir.name, "bench.db")
+        shutil.copyfile(fixture_path(data_dir, locations, reservations, seed), path)
+        db = RestaurantDatabase(path)
+        for name in benchmarks or BENCHMARKS:
+            rng = random.Random(f"{seed}:{name}")
+            stats = measure(lambda calls: BENCHMARKS[name](db, rng, calls), warmup, repeat)
+            results.append({"benchmark": name, "locations": locations, "reservations": reservations, **stats})
+            print(f"  {name:<22} {locations:>7} loc {reservations:>9} res  median {stats['median_ms']:>9.3f} ms"
+                  f"  p95 {stats['p95_ms']:>9.3f} ms  peak {stats['py_peak_kib']:>8.1f} KiB", file=sys.stderr)
+        db.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    work_dir.cleanup()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {"warmup": warmup, "repeat": repeat, "seed": seed},
+        },
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.25,
+            min_delta_ms: float = 0.05) -> List[Dict[str, Any]]:
+    """Benchmarks whose median got slower than the baseline by more than their threshold"""
+    thresholds = baseline.get("thresholds", {})
+    previous = {(r["benchmark"], r["locations"], r["reservations"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["benchmark"], result["locations"], result["reservations"]))
+        if not before:
+            continue
+        limit = thresholds.get(result["benchmark"], threshold)
+        delta = result["median_ms"] - before["median_ms"]
+        # Tiny absolute differences are timer noise, whatever their ratio
+        if delta > min_delta_ms and delta > before["median_ms"] * limit:
+            regressions.append({
+                "benchmark": result["benchmark"], "locations": result["locations"],
+                "reservations": result["reservations"], "baseline_ms": before["median_ms"],
+                "median_ms": result["median_ms"], "change": round(delta / before["median_ms"], 3),
+                "threshold": limit,
+            })
+    return regressions
+
+
+def parse_scales(value: str) -> List[Tuple[int, int]]:
+    """A preset name or comma-separated locations:reservations pairs"""
+    if value in SCALE_PRESETS:
+        return SCALE_PRESETS[value]
+    scales = []
+    for pair in value.split(","):
+        locations, _, reservations = pair.partition(":")
+        scales.append((int(locations), int(reservations or 0)))
+    return scales
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Database and scoring microbenchmarks")
+    parser.add_argument("--scales", default="default",
+                        help=f"preset ({', '.join(SCALE_PRESETS)}) or pairs like 87:0,1000:100000")
+    parser.add_argument("--bench", action="append", choices=list(BENCHMARKS),
+                        help="benchmark to run (repeatable; default all)")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="bench_data", help="where scaled fixture databases are cached")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="baseline report; exit 1 if any median regresses")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed median slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", help="write this run as the new baseline")
+    args = parser.parse_args()
+
+    report = run_suite(parse_scales(args.scales), args.bench, args.warmup, args.repeat,
+                       args.data_dir, args.seed)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression['benchmark']} @ {regression['locations']}/{regression['reservations']}: "
+                  f"{regression['baseline_ms']} -> {regression['median_ms']} ms "
+                  f"({regression['change']:+.0%}, limit {regression['threshold']:.0%})")
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {path}")
+
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
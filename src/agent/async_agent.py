@@ -0,0 +1,137 @@
+"""
+Asyncio-native variant of LlamaAgent
+Awaits Groq completions and runs tools on the async database executor, so
+one event loop can serve many conversations without a thread per user
+"""
+
+import asyncio
+from datetime import date
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from src.agent.backends import StreamAccumulator, create_client
+from src.agent.llama_agent import LlamaAgent, TurnIO
+from src.agent.llm_cache import ResponseCache
+from src.database.async_db import AsyncRestaurantDatabase
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.utils.telemetry import Telemetry
+
+
+class AsyncLlamaAgent(LlamaAgent):
+    """LlamaAgent whose process_message is a coroutine
+
+    The turn logic is LlamaAgent's; only its I/O points (completions, tool
+    execution and database reads) are awaited here.
+    """
+
+    def __init__(self, db: AsyncRestaurantDatabase, no_show_predictor: NoShowPredictor,
+                 recommendation_engine: RecommendationEngine, client: Any = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 telemetry: Optional[Telemetry] = None, use_cache: Optional[bool] = None,
+                 fast_path: Optional[bool] = None, clock: Optional[Callable[[], date]] = None):
+        """Initialize with an async database facade (pass client to share one async client)"""
+        self.async_db = db
+        super().__init__(db.db, no_show_predictor, recommendation_engine, client=client,
+                         response_cache=response_cache, telemetry=telemetry, use_cache=use_cache,
+                         fast_path=fast_path, clock=clock)
+        # Turns of one conversation must not interleave on self.messages
+        self._turn_lock = asyncio.Lock()
+
+    def _create_client(self) -> Any:
+        """Create the async completion client (see backends.create_client)"""
+        return create_client(async_mode=True)
+
+    def _start_follow_up(self, kwargs: Dict[str, Any]) -> Any:
+        """Run a follow-up completion as a task on the running event loop"""
+        return asyncio.ensure_future(self.client.chat.completions.create(**kwargs))
+
+    async def _route_turn(self, user_message: str) -> tuple:
+        """Resolve and route a message on the database executor; a catalog check may query SQLite"""
+        return await self.async_db.run(super()._route_turn, user_message)
+
+    async def _run_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a tool on the database executor"""
+        return await self.async_db.run(self._execute_tool, tool_name, arguments)
+
+    async def _execute_tool_calls(self, tool_calls: List[Any]) -> List[tuple]:
+        """Execute one round of tool calls, keeping call order (see LlamaAgent._tool_batches)"""
+        async def run(item):
+            tool_call, function_args, error = item
+            if error:
+                return tool_call, function_args, error
+            return tool_call, function_args, await self._run_tool(tool_call.function.name, function_args)
+
+        results = []
+        for batch in self._tool_batches(tool_calls):
+            results.extend(await asyncio.gather(*(run(item) for item in batch)))
+        return results
+
+    async def _data_version(self) -> int:
+        """Availability data version, read on the database executor"""
+        return await self.async_db.run(self.db.get_data_version)
+
+    async def _request_completion(self, kwargs: Dict[str, Any], stream: bool,
+                                  call: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Await a completion request, yielding text events and finally a result event"""
+        if not stream:
+            completion = await self.client.chat.completions.create(**kwargs)
+            message = completion.choices[0].message
+            if message.content:
+                yield {"type": "text", "delta": message.content}
+            yield {"type": "result", "value": (message, getattr(completion, "usage", None))}
+            return
+
+        accumulator = StreamAccumulator()
+        async for chunk in await self.client.chat.completions.create(**kwargs, stream=True):
+            text = accumulator.add(chunk)
+            if text:
+                call.set_once(first_token_ms=call.elapsed_ms())
+                yield {"type": "text", "delta": text}
+        yield {"type": "result", "value": (accumulator.message(), accumulator.usage)}
+
+    async def process_message(self, user_message: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
+        """Async version of LlamaAgent.process_message"""
+        response = None
+        async for event in self._locked_turn(user_message, stream=False):
+            if event["type"] == "done":
+                response = event["response"]
+        return response
+
+    async def stream_message(self, user_message: str,
+                             conversation_history: List[Dict] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async version of LlamaAgent.stream_message (same event shapes)"""
+        async for event in self._locked_turn(user_message, stream=True):
+            yield event
+
+    async def _locked_turn(self, user_message: str, stream: bool) -> AsyncIterator[Dict[str, Any]]:
+        """Run a turn while holding this conversation's lock"""
+        async with self._turn_lock:
+            async for event in self._drive_async(self._run_turn(user_message, stream)):
+                yield event
+
+    async def _drive_async(self, turn_events: Iterator[Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Await a turn's I/O points, yielding its events (see LlamaAgent._drive)"""
+        send, value = turn_events.send, None
+        try:
+            while True:
+                try:
+                    item = send(value)
+                except StopIteration:
+                    return
+                send, value = turn_events.send, None
+                if not isinstance(item, TurnIO):
+                    yield item
+                    continue
+                try:
+                    method = getattr(self, item.method)
+                    if item.streams:
+                        async for event in method(*item.args):
+                            if event["type"] == "result":
+                                value = event["value"]
+                            else:
+                                yield event
+                    else:
+                        value = await method(*item.args)
+                except Exception as e:
+                    send, value = turn_events.throw, e
+        finally:
+            turn_events.close()
@@ -0,0 +1,542 @@
+"""
+Pluggable completion backends for LlamaAgent
+Groq in production; offline, a scripted OpenAI-compatible stand-in with
+simulated latency and token counts, and record/replay cassettes of real
+sessions. The stand-in can also be served over HTTP for any OpenAI/Groq client
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from src.agent.intent_router import CONFIRMATION_PATTERN, parse_date, parse_party_size, parse_time
+from src.agent.llm_cache import ResponseCache, message_to_dict
+from src.agent.memory import estimate_tokens
+
+BACKENDS = ("groq", "scripted", "record", "replay")
+
+DEFAULT_CITIES = ["san francisco", "new york", "los angeles", "chicago", "austin", "seattle", "miami", "boston"]
+
+
+class StreamAccumulator:
+    """Reassembles streamed chat-completion chunks into one assistant message"""
+
+    def __init__(self):
+        self.content_parts = []
+        self.tool_calls = {}
+        # Token usage, reported on the last chunk
+        self.usage = None
+
+    def add(self, chunk: Any) -> str:
+        """Fold one chunk in; returns its text delta (may be empty)"""
+        self.usage = _chunk_usage(chunk) or self.usage
+        if not chunk.choices:
+            return ""
+        delta = chunk.choices[0].delta
+
+        # Tool calls arrive as fragments keyed by index
+        for fragment in getattr(delta, "tool_calls", None) or []:
+            call = self.tool_calls.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+            if fragment.id:
+                call["id"] = fragment.id
+            if fragment.function:
+                call["name"] += fragment.function.name or ""
+                call["arguments"] += fragment.function.arguments or ""
+
+        text = getattr(delta, "content", None) or ""
+        if text:
+            self.content_parts.append(text)
+        return text
+
+    def message(self) -> Any:
+        """The assistant message built so far, shaped like a non-streamed one"""
+        tool_calls = [
+            SimpleNamespace(
+                id=call["id"],
+                type="function",
+                function=SimpleNamespace(name=call["name"], arguments=call["arguments"])
+            )
+            for _, call in sorted(self.tool_calls.items())
+        ]
+        return SimpleNamespace(
+            content="".join(self.content_parts) or None,
+            tool_calls=tool_calls or None
+        )
+
+
+# --- OpenAI-compatible wire format -------------------------------------------
+
+def _namespace(value: Any) -> Any:
+    """JSON payload -> attribute access like the SDK's response objects"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+def _usage(request: Dict[str, Any], reply: Dict[str, Any]) -> Dict[str, int]:
+    """Token usage for a reply: recorded counts, else a chars/4 estimate"""
+    if reply.get("usage"):
+        return reply["usage"]
+    prompt = sum(estimate_tokens(m) for m in request.get("messages", []))
+    completion = estimate_tokens({
+        "content": reply.get("content"),
+        "tool_calls": [{"function": tc} for tc in reply.get("tool_calls") or []],
+    })
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def completion_payload(request: Dict[str, Any], reply: Dict[str, Any]) -> Dict[str, Any]:
+    """A chat.completion response body for reply ({"content", "tool_calls", "usage"})"""
+    message = {"role": "assistant", "content": reply.get("content"), "tool_calls": None}
+    if reply.get("tool_calls"):
+        message["tool_calls"] = [
+            {"id": tc["id"], "type": "function",
+             "function": {"name": tc["name"], "arguments": tc["arguments"]}}
+            for tc in reply["tool_calls"]
+        ]
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model"),
+        "choices": [{"index": 0, "message": message,
+                     "finish_reason": "tool_calls" if reply.get("tool_calls") else "stop"}],
+        "usage": _usage(request, reply),
+    }
+
+
+def chunk_payloads(request: Dict[str, Any], reply: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The same reply as chat.completion.chunk bodies: one per word, tool calls whole"""
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": request.get("model")}
+
+    def chunk(delta, finish_reason=None, **extra):
+        return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+
+    chunks = [chunk({"role": "assistant", "content": ""})]
+    chunks += [chunk({"content": word}) for word in re.findall(r"\S+\s*|\s+", reply.get("content") or "")]
+    for index, tc in enumerate(reply.get("tool_calls") or []):
+        chunks.append(chunk({"tool_calls": [{
+            "index": index, "id": tc["id"], "type": "function",
+            "function": {"name": tc["name"], "arguments": tc["arguments"]},
+        }]}))
+    chunks.append(chunk({}, "tool_calls" if reply.get("tool_calls") else "stop",
+                        x_groq={"usage": _usage(request, reply)}))
+    return chunks
+
+
+# --- Responders: request -> reply ---------------------------------------------
+
+class ScriptedResponder:
+    """Deterministic stand-in for the model
+
+    With a script, replies are taken from it in order (the last one repeats).
+    Without one, formulaic requests become tool calls (search, book with a
+    name and phone, change, cancel; missing details are taken from earlier
+    tool calls and results), tool results get a short summary, and anything
+    else gets a clarifying question.
+    """
+
+    def __init__(self, script: Optional[List[Dict[str, Any]]] = None,
+                 cities: Optional[List[str]] = None, completion_tokens: Optional[int] = None):
+        """script entries: {"content": str} and/or {"tool_calls": [{"name", "arguments"}]}"""
+        self.script = list(script or [])
+        self.cities = sorted(cities or DEFAULT_CITIES, key=len, reverse=True)
+        self.completion_tokens = completion_tokens
+        self._position = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ScriptedResponder":
+        """Load a script from a JSON list"""
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Reply to one chat.completions request"""
+        if self.script:
+            with self._lock:
+                entry = self.script[min(self._position, len(self.script) - 1)]
+                self._position += 1
+            reply = {
+                "content": entry.get("content"),
+                "tool_calls": [self._tool_call(tc["name"], tc.get("arguments", {}))
+                               for tc in entry.get("tool_calls") or []],
+            }
+        else:
+            reply = self._default_reply(request)
+
+        if self.completion_tokens:
+            reply["usage"] = {**_usage(request, reply), "completion_tokens": self.completion_tokens}
+            reply["usage"]["total_tokens"] = reply["usage"]["prompt_tokens"] + self.completion_tokens
+        return reply
+
+    def _tool_call(self, name: str, arguments: Any) -> Dict[str, Any]:
+        if not isinstance(arguments, str):
+            arguments = json.dumps(arguments)
+        return {"id": f"call_{uuid.uuid4().hex[:8]}", "name": name, "arguments": arguments}
+
+    def _default_reply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Rule-based reply covering search -> select -> book -> modify -> cancel"""
+        messages = request["messages"]
+        last = messages[-1]
+        if last["role"] == "tool":
+            lines = (last.get("content") or "").splitlines()
+            return {"content": f"Here is what I found ({lines[0] if lines else 'no results'}). "
+                               f"Would you like me to book one of these?", "tool_calls": []}
+
+        original = last.get("content") or ""
+        text = original.lower()
+        words = set(re.findall(r"[a-z]+", text))
+        tool_names = {tool["function"]["name"] for tool in request.get("tools") or []}
+        confirmation = CONFIRMATION_PATTERN.search(text) or _find_in_history(messages, CONFIRMATION_PATTERN)
+
+        if "cancel" in words and confirmation and "cancel_reservation" in tool_names:
+            return self._call("cancel_reservation", {"confirmation_number": confirmation.group(0).upper()})
+
+        if words & {"change", "modify", "move"} and confirmation and "modify_reservation" in tool_names:
+            arguments = {"confirmation_number": confirmation.group(0).upper(), "new_date": parse_date(text),
+                         "new_time": parse_time(text), "new_party_size": parse_party_size(text)}
+            return self._call("modify_reservation", {k: v for k, v in arguments.items() if v})
+
+        search = _last_tool_arguments(messages, "search_available_slots")
+        name = NAME_PATTERN.search(original)
+        phone = PHONE_PATTERN.search(original)
+        location = LOCATION_PATTERN.search(original) or _find_in_history(messages, LOCATION_PATTERN)
+        if words & {"book", "reserve"} and search and name and phone and location \
+                and "create_reservation" in tool_names:
+            return self._call("create_reservation", {
+                "location_id": location.group(0), "date": search["date"], "time": search["time"],
+                "party_size": search["party_size"], "customer_name": name.group(1).strip(),
+                "customer_phone": phone.group(0),
+            })
+
+        city = next((c for c in self.cities if c in text), None)
+        arguments = {"date": parse_date(text), "time": parse_time(text),
+                     "party_size": parse_party_size(text), "city": city}
+        if all(arguments.values()) and "search_available_slots" in tool_names:
+            return self._call("search_available_slots", arguments)
+
+        if search:
+            return {"content": "Great choice! What name and phone number should I put the booking under?",
+                    "tool_calls": []}
+        return {"content": "Happy to help! What date, time, party size and city should I search for?",
+                "tool_calls": []}
+
+    def _call(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """A reply consisting of one tool call"""
+        return {"content": None, "tool_calls": [self._tool_call(name, arguments)]}
+
+
+NAME_PATTERN = re.compile(r"\b(?i:my name is|name is|i'm|i am|under)\s+([A-Z][a-z]+(?: [A-Z][a-z]+)?)")
+PHONE_PATTERN = re.compile(r"\b\d{3}[-. ]?\d{3,4}(?:[-. ]?\d{4})?\b")
+LOCATION_PATTERN = re.compile(r"\bLOC\d{3,}\b")
+
+
+def _find_in_history(messages: List[Dict[str, Any]], pattern: re.Pattern) -> Optional[re.Match]:
+    """Newest match of pattern in any earlier message"""
+    for message in reversed(messages[:-1]):
+        match = pattern.search(message.get("content") or "")
+        if match:
+            return match
+    return None
+
+
+def _last_tool_arguments(messages: List[Dict[str, Any]], tool_name: str) -> Optional[Dict[str, Any]]:
+    """Arguments of the newest call to tool_name in the history"""
+    for message in reversed(messages):
+        for tool_call in reversed(message.get("tool_calls") or []):
+            if tool_call["function"]["name"] == tool_name:
+                return json.loads(tool_call["function"]["arguments"])
+    return None
+
+
+def _masked(text: Optional[str]) -> Optional[str]:
+    """text with confirmation numbers, which differ on every run, blanked"""
+    return CONFIRMATION_PATTERN.sub("GF-########", text) if text else text
+
+
+def cassette_key(request: Dict[str, Any]) -> str:
+    """ResponseCache.make_key over the user turns and tool calls only
+
+    Tool results and the replies built from them carry confirmation numbers and
+    availability counts that change between runs, so they are left out; the
+    calls that produced them stay in, with confirmation numbers masked.
+    """
+    messages = []
+    for message in request.get("messages", []):
+        if message["role"] == "user":
+            messages.append({"role": "user", "content": _masked(message.get("content"))})
+        elif message["role"] == "assistant" and message.get("tool_calls"):
+            messages.append({"role": "assistant", "content": None, "tool_calls": [
+                {"function": {"name": tc["function"]["name"], "arguments": _masked(tc["function"]["arguments"])}}
+                for tc in message["tool_calls"]
+            ]})
+    return ResponseCache.make_key({**request, "messages": messages})
+
+
+class Cassette:
+    """Recorded completions keyed by the conversation's user turns and tool calls (see cassette_key)"""
+
+    VERSION = 2
+
+    def __init__(self, path: str):
+        """Load path if it exists; recordings are written back to it"""
+        self.path = path
+        self.interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self._replayed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                payload = json.load(f)
+            if payload.get("version") != self.VERSION:
+                raise ValueError(f"{path} was recorded with an older key format; record it again")
+            for interaction in payload["interactions"]:
+                self.interactions.setdefault(interaction["key"], []).append(interaction["response"])
+
+    def record(self, request: Dict[str, Any], reply: Dict[str, Any]):
+        """Add an interaction and save the cassette"""
+        with self._lock:
+            self.interactions.setdefault(cassette_key(request), []).append(reply)
+            self._save()
+
+    def respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Replay the recorded reply; repeats of a request replay in recorded order"""
+        key = cassette_key(request)
+        with self._lock:
+            replies = self.interactions.get(key)
+            if not replies:
+                raise ValueError(f"No recorded completion for this request in {self.path}")
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+            return replies[min(index, len(replies) - 1)]
+
+    def _save(self):
+        """Write atomically so an interrupted recording never corrupts the file"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        payload = {"version": self.VERSION, "interactions": [
+            {"key": key, "response": reply} for key, replies in self.interactions.items() for reply in replies
+        ]}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+# --- Clients: the slice of the Groq SDK the agent uses ----------------------------
+
+class LocalClient:
+    """client.chat.completions.create backed by a responder, with simulated latency"""
+
+    def __init__(self, responder: Any, latency_ms: Optional[float] = None,
+                 token_latency_ms: Optional[float] = None, async_mode: bool = False):
+        """latency_ms before the first token, token_latency_ms per completion token"""
+        self.responder = responder
+        self.latency = (latency_ms if latency_ms is not None
+                        else float(os.getenv("LLM_STUB_LATENCY_MS", "0"))) / 1000
+        self.token_latency = (token_latency_ms if token_latency_ms is not None
+                              else float(os.getenv("LLM_STUB_TOKEN_LATENCY_MS", "0"))) / 1000
+        self.async_mode = async_mode
+        create = self._create_async if async_mode else self._create
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    def _reply(self, kwargs: Dict[str, Any]):
+        """Reply, SSE-style chunks, and the pause between chunks"""
+        reply = self.responder.respond(kwargs)
+        chunks = chunk_payloads(kwargs, reply)
+        tokens = _usage(kwargs, reply)["completion_tokens"]
+        return reply, chunks, self.token_latency * tokens / max(1, len(chunks))
+
+    def _create(self, stream: bool = False, **kwargs) -> Any:
+        reply, chunks, pause = self._reply(kwargs)
+        time.sleep(self.latency)
+        if not stream:
+            time.sleep(pause * len(chunks))
+            return _namespace(completion_payload(kwargs, reply))
+
+        def iterate() -> Iterator[Any]:
+            for chunk in chunks:
+                time.sleep(pause)
+                yield _namespace(chunk)
+        return iterate()
+
+    async def _create_async(self, stream: bool = False, **kwargs) -> Any:
+        reply, chunks, pause = self._reply(kwargs)
+        await asyncio.sleep(self.latency)
+        if not stream:
+            await asyncio.sleep(pause * len(chunks))
+            return _namespace(completion_payload(kwargs, reply))
+
+        async def iterate() -> AsyncIterator[Any]:
+            for chunk in chunks:
+                await asyncio.sleep(pause)
+                yield _namespace(chunk)
+        return iterate()
+
+
+class RecordingClient:
+    """Wraps a real client and writes every completion to a cassette"""
+
+    def __init__(self, client: Any, cassette: Cassette, async_mode: bool = False):
+        self.client = client
+        self.cassette = cassette
+        create = self._create_async if async_mode else self._create
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    def _record(self, kwargs: Dict[str, Any], message: Any, usage: Any):
+        reply = message_to_dict(message)
+        if usage is not None:
+            reply["usage"] = {key: getattr(usage, key) for key in
+                              ("prompt_tokens", "completion_tokens", "total_tokens")}
+        self.cassette.record(kwargs, reply)
+
+    def _create(self, stream: bool = False, **kwargs) -> Any:
+        if not stream:
+            response = self.client.chat.completions.create(**kwargs)
+            self._record(kwargs, response.choices[0].message, getattr(response, "usage", None))
+            return response
+
+        def iterate() -> Iterator[Any]:
+            accumulator = StreamAccumulator()
+            usage = None
+            for chunk in self.client.chat.completions.create(**kwargs, stream=True):
+                accumulator.add(chunk)
+                usage = _chunk_usage(chunk) or usage
+                yield chunk
+            self._record(kwargs, accumulator.message(), usage)
+        return iterate()
+
+    async def _create_async(self, stream: bool = False, **kwargs) -> Any:
+        if not stream:
+            response = await self.client.chat.completions.create(**kwargs)
+            self._record(kwargs, response.choices[0].message, getattr(response, "usage", None))
+            return response
+
+        async def iterate() -> AsyncIterator[Any]:
+            accumulator = StreamAccumulator()
+            usage = None
+            async for chunk in await self.client.chat.completions.create(**kwargs, stream=True):
+                accumulator.add(chunk)
+                usage = _chunk_usage(chunk) or usage
+                yield chunk
+            self._record(kwargs, accumulator.message(), usage)
+        return iterate()
+
+
+def _chunk_usage(chunk: Any) -> Any:
+    """Usage reported on a stream chunk (Groq puts it under x_groq)"""
+    x_groq = getattr(chunk, "x_groq", None)
+    return getattr(chunk, "usage", None) or getattr(x_groq, "usage", None)
+
+
+def create_client(backend: Optional[str] = None, async_mode: bool = False) -> Any:
+    """Completion client for LLM_BACKEND (groq, scripted, record or replay)"""
+    backend = (backend or os.getenv("LLM_BACKEND", "groq")).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}'. Choose from: {', '.join(BACKENDS)}")
+
+    cassette_path = os.getenv("LLM_CASSETTE_PATH", "cassettes/session.json")
+    if backend == "scripted":
+        script_path = os.getenv("LLM_SCRIPT_PATH")
+        completion_tokens = int(os.getenv("LLM_STUB_COMPLETION_TOKENS", "0")) or None
+        responder = (ScriptedResponder.from_file(script_path, completion_tokens=completion_tokens)
+                     if script_path else ScriptedResponder(completion_tokens=completion_tokens))
+        return LocalClient(responder, async_mode=async_mode)
+    if backend == "replay":
+        if not os.path.exists(cassette_path):
+            raise ValueError(f"Cassette not found: {cassette_path}")
+        return LocalClient(Cassette(cassette_path), async_mode=async_mode)
+
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY not set. Get your free key at https://console.groq.com/keys")
+    from groq import AsyncGroq, Groq
+    client = AsyncGroq(api_key=api_key) if async_mode else Groq(api_key=api_key)
+    if backend == "record":
+        return RecordingClient(client, Cassette(cassette_path), async_mode=async_mode)
+    return client
+
+
+# --- HTTP stand-in ---------------------------------------------------------------
+
+def make_server(responder: Any, host: str = "127.0.0.1", port: int = 8011,
+                latency_ms: Optional[float] = None, token_latency_ms: Optional[float] = None) -> ThreadingHTTPServer:
+    """OpenAI-compatible /chat/completions server; point GROQ_BASE_URL at it"""
+    # Reuse LocalClient's latency model so in-process and HTTP runs behave alike
+    timing = LocalClient(responder, latency_ms, token_latency_ms)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            try:
+                reply, chunks, pause = timing._reply(request)
+            except ValueError as e:
+                self._send_json(400, {"error": {"message": str(e), "type": "invalid_request_error"}})
+                return
+
+            time.sleep(timing.latency)
+            if not request.get("stream"):
+                time.sleep(pause * len(chunks))
+                self._send_json(200, completion_payload(request, reply))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for chunk in chunks:
+                time.sleep(pause)
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def _send_json(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    """Serve the scripted stand-in or a cassette over HTTP"""
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible completion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--script", help="JSON list of scripted replies")
+    parser.add_argument("--cassette", help="replay a recorded cassette instead")
+    args = parser.parse_args()
+
+    if args.cassette:
+        responder = Cassette(args.cassette)
+    elif args.script:
+        responder = ScriptedResponder.from_file(args.script)
+    else:
+        responder = ScriptedResponder()
+
+    server = make_server(responder, args.host, args.port)
+    print(f"Serving completions on http://{args.host}:{server.server_port} "
+          f"(GROQ_BASE_URL=http://{args.host}:{server.server_port})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Deterministic fast-path intent router
+Extracts intent and slots from formulaic messages ("cancel GF-AB12CD34",
+"Italian in Chicago for 4 on 2026-11-02 at 19:00") so they can be answered
+without the model; anything ambiguous returns None and goes to the LLM
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.database.migrations import normalize_key
+from src.utils.validators import ReservationValidator
+
+CONFIRMATION_PATTERN = re.compile(r"\bGF-[A-Z0-9]{8}\b", re.IGNORECASE)
+ISO_DATE_PATTERN = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+RELATIVE_DATE_PATTERN = re.compile(r"\b(today|tonight|tomorrow)\b")
+CLOCK_TIME_PATTERN = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b(?!\s*[ap]\.?m)")
+MERIDIEM_TIME_PATTERN = re.compile(r"\b(1[0-2]|0?[1-9])(?::([0-5]\d))?\s*([ap])\.?m\.?(?![a-z])")
+PARTY_PATTERNS = [
+    re.compile(r"\b(?:party|table|group) of (\d{1,2}|[a-z]+)\b"),
+    re.compile(r"\b(\d{1,2}|[a-z]+) (?:people|persons|guests|diners|pax)\b"),
+    re.compile(r"\bfor (\d{1,2}|[a-z]+)\b(?! *(?::|[ap]\.?m))"),
+]
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+# Words that may surround the slots without changing what was asked
+SEARCH_FILLER = {
+    "a", "an", "any", "are", "at", "available", "availability", "can", "check", "cuisine",
+    "dinner", "do", "find", "food", "for", "get", "have", "i", "in", "is", "lunch", "me",
+    "need", "of", "on", "options", "please", "place", "places", "restaurant", "restaurants",
+    "search", "show", "spot", "spots", "table", "tables", "there", "to", "want", "we",
+    "what", "whats", "would", "like", "you", "some", "open", "free",
+}
+CANCEL_FILLER = {
+    "a", "booking", "can", "cancel", "confirmation", "i", "it", "like", "me", "my",
+    "number", "please", "reservation", "the", "to", "want", "would", "you", "need", "for",
+}
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z]+", text)
+
+
+def _party_number(value: str) -> Optional[int]:
+    return int(value) if value.isdigit() else NUMBER_WORDS.get(value)
+
+
+def parse_party_size(text: str) -> Optional[int]:
+    """Party size from "for 4", "4 people", "party of four"; None if absent or conflicting"""
+    found = set()
+    for pattern in PARTY_PATTERNS:
+        for match in pattern.finditer(text):
+            number = _party_number(match.group(1))
+            if number:
+                found.add(number)
+    return found.pop() if len(found) == 1 else None
+
+
+def _blank_slots(text: str) -> str:
+    """Remove recognized date, time and party-size phrases"""
+    for pattern in [ISO_DATE_PATTERN, RELATIVE_DATE_PATTERN, CLOCK_TIME_PATTERN, MERIDIEM_TIME_PATTERN]:
+        text = pattern.sub(" ", text)
+    for pattern in PARTY_PATTERNS:
+        # Only phrases that really were party sizes ("for dinner" keeps "dinner")
+        text = pattern.sub(lambda m: " " if _party_number(m.group(1)) else m.group(0), text)
+    return text
+
+
+def parse_time(text: str) -> Optional[str]:
+    """HH:MM from "19:00", "7 pm", "7:30pm"; None if absent or conflicting"""
+    found = set()
+    for match in CLOCK_TIME_PATTERN.finditer(text):
+        found.add(f"{int(match.group(1)):02d}:{match.group(2)}")
+    for match in MERIDIEM_TIME_PATTERN.finditer(text):
+        hour = int(match.group(1)) % 12 + (12 if match.group(3) == "p" else 0)
+        found.add(f"{hour:02d}:{match.group(2) or '00'}")
+    if "noon" in _words(text):
+        found.add("12:00")
+    return found.pop() if len(found) == 1 else None
+
+
+def parse_date(text: str, today: Optional[date] = None) -> Optional[str]:
+    """YYYY-MM-DD from an ISO date, "today"/"tonight" or "tomorrow"; None if absent or conflicting"""
+    today = today or datetime.now().date()
+    found = set(ISO_DATE_PATTERN.findall(text))
+    for word in RELATIVE_DATE_PATTERN.findall(text):
+        offset = 1 if word == "tomorrow" else 0
+        found.add((today + timedelta(days=offset)).isoformat())
+    return found.pop() if len(found) == 1 else None
+
+
+class IntentRouter:
+    """Rule-based intent and slot extractor for unambiguous searches and cancellations"""
+
+    def __init__(self, cities: Iterable[str], cuisines: Iterable[str], today: Optional[date] = None,
+                 resolver: Any = None):
+        """Known city/cuisine keys (see RestaurantDatabase.get_lookup_values); resolver adds aliases and typos"""
+        # Longest first so "san francisco" wins over a shorter overlapping key
+        self.cities = sorted({normalize_key(c) for c in cities if c}, key=len, reverse=True)
+        self.cuisines = sorted({normalize_key(c) for c in cuisines if c}, key=len, reverse=True)
+        self.today = today
+        self.resolver = resolver
+        self.validator = ReservationValidator()
+
+    def route(self, message: str, today: Optional[date] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return (tool_name, arguments) for an unambiguous request, else None; today overrides self.today"""
+        text = " ".join(message.lower().split())
+        if not text:
+            return None
+        return self._route_cancel(text) or self._route_search(text, today or self.today)
+
+    def _route_cancel(self, text: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        numbers = {m.upper() for m in CONFIRMATION_PATTERN.findall(text)}
+        if "cancel" not in _words(text) or len(numbers) != 1:
+            return None
+
+        leftover = _words(CONFIRMATION_PATTERN.sub(" ", text))
+        if not set(leftover) <= CANCEL_FILLER:
+            return None
+        return "cancel_reservation", {"confirmation_number": numbers.pop()}
+
+    def _find_phrases(self, text: str, phrases: List[str]) -> Tuple[List[str], str]:
+        """Known phrases present in text, and the text with them blanked out"""
+        found = []
+        for phrase in phrases:
+            pattern = re.compile(rf"\b{re.escape(phrase)}\b")
+            if pattern.search(text):
+                found.append(phrase)
+                text = pattern.sub(" ", text)
+        return found, text
+
+    def _route_search(self, text: str, today: Optional[date]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        cities, rest = self._find_phrases(text, self.cities)
+        cuisines, rest = self._find_phrases(rest, self.cuisines)
+        if self.resolver is not None:
+            # "LA", "nyc", "Bostn", "japanes": the same keys, found fuzzily
+            more, rest = self.resolver.match_cities(rest)
+            cities += [city for city in more if city not in cities]
+            more, rest = self.resolver.match_cuisines(rest)
+            cuisines += [cuisine for cuisine in more if cuisine not in cuisines]
+        if len(cities) != 1 or len(cuisines) > 1:
+            return None
+
+        party_size = parse_party_size(rest)
+        time = parse_time(rest)
+        day = parse_date(rest, today)
+        if not (party_size and time and day):
+            return None
+
+        if not (self.validator.validate_date(day) and self.validator.validate_party_size(party_size)):
+            return None
+
+        # Every remaining word must be filler; anything else may carry
+        # preferences (romantic, vegan, cheap...) only the model can honor
+        leftover = set(_words(_blank_slots(rest))) - SEARCH_FILLER - {"noon"}
+        if leftover:
+            return None
+
+        arguments = {"date": day, "time": time, "party_size": party_size, "city": cities[0]}
+        if cuisines:
+            arguments["cuisine"] = cuisines[0]
+        return "search_available_slots", arguments
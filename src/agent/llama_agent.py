@@ -3,24 +3,58 @@ Conversational AI Agent using Llama-3.3-70B via Groq
 Implements tool calling and intent recognition from scratch
 """
 
+import contextvars
 import json
 import os
 import re
-from typing import Dict, List, Any, Optional
-from groq import Groq
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Any, NamedTuple, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+from src.agent.backends import StreamAccumulator, create_client
+from src.agent.intent_router import IntentRouter, parse_date, parse_party_size, parse_time
+from src.agent.llm_cache import ResponseCache, message_from_dict, message_to_dict
+from src.agent.memory import ConversationMemory
+from src.agent.response_templates import (
+    BACKGROUND, FOLLOW_UP_PROMPT, KEEP, RESPONSE_RENDERERS, choose_policy,
+    get_response_policy, render_tool_reply
+)
+from src.agent.tool_encoding import encode_tool_result
+from src.agent.usage import HARD, HARD_BUDGET_REPLY, SOFT, UsageLedger, estimate_usage
 from src.database.restaurant_db import RestaurantDatabase
 from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.utils.telemetry import Telemetry
 from src.utils.validators import ReservationValidator
 
 
+class TurnIO(NamedTuple):
+    """An I/O point in a turn: the driver runs agent.<method>(*args) and sends back the result"""
+    method: str
+    args: tuple = ()
+    # The method yields text events before its result
+    streams: bool = False
+
+
 class LlamaAgent:
     """Main conversational agent using Llama-3.3-70B on Groq"""
     
+    # Worker pool shared by every agent for running independent tool calls
+    _tool_executor: Optional[ThreadPoolExecutor] = None
+    _tool_executor_lock = threading.Lock()
+    # Separate small pool for background follow-up completions, so slow model
+    # calls never hold up tool calls
+    _follow_up_executor: Optional[ThreadPoolExecutor] = None
+    
+    # Tools that change bookings; never run alongside other calls
+    WRITE_TOOLS = {"create_reservation", "modify_reservation", "cancel_reservation"}
+    
     # Tool definitions for Groq (OpenAI-compatible format)
     TOOLS = [
         {
@@ -41,6 +75,65 @@ class LlamaAgent:
                 }
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_availability_grid",
+                "description": "Search availability across a date range and time window in one call (e.g. 'between 6 and 9 pm this weekend'). Returns, per restaurant, seats left for each date and time slot (0 = unavailable)",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "start_date": {"type": "string", "description": "First date in YYYY-MM-DD format"},
+                        "end_date": {"type": "string", "description": "Last date in YYYY-MM-DD format (same as start_date for one day)"},
+                        "time_from": {"type": "string", "description": "Earliest time HH:MM (24-hour)"},
+                        "time_to": {"type": "string", "description": "Latest time HH:MM (24-hour)"},
+                        "party_size": {"type": "integer", "description": "Number of people"},
+                        "city": {"type": "string", "description": "City name (optional)"},
+                        "cuisine": {"type": "string", "description": "Preferred cuisine type (optional)"},
+                        "granularity_minutes": {"type": "integer", "description": "Minutes between slots (optional, default 30)"}
+                    },
+                    "required": ["start_date", "end_date", "time_from", "time_to", "party_size"]
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_restaurants",
+                "description": "Find restaurants matching a free-text description (e.g. 'romantic rooftop with vegan options'), searching names, cuisines, cities, price ranges and special features. Does not check availability",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {"type": "string", "description": "What the guest is looking for, in their words"},
+                        "city": {"type": "string", "description": "City name (optional)"},
+                        "cuisine": {"type": "string", "description": "Cuisine type (optional)"},
+                        "party_size": {"type": "integer", "description": "Number of people (optional)"}
+                    },
+                    "required": ["query"]
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "search_nearby",
+                "description": "Find the restaurants closest to a place (a restaurant name, a city, or 'me' for the guest's shared location), nearest first. Pass date, time and party_size to keep only ones with a free table",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "near": {"type": "string", "description": "Where to search around: a restaurant name, a city, or 'me'"},
+                        "latitude": {"type": "number", "description": "Latitude, if the guest gave coordinates (optional)"},
+                        "longitude": {"type": "number", "description": "Longitude, if the guest gave coordinates (optional)"},
+                        "radius_km": {"type": "number", "description": "Only restaurants within this many km (optional)"},
+                        "cuisine": {"type": "string", "description": "Cuisine type (optional)"},
+                        "date": {"type": "string", "description": "Date YYYY-MM-DD, to check availability (optional)"},
+                        "time": {"type": "string", "description": "Time HH:MM, to check availability (optional)"},
+                        "party_size": {"type": "integer", "description": "Number of people (optional)"}
+                    },
+                    "required": []
+                }
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -74,7 +167,7 @@ class LlamaAgent:
                         "party_size": {"type": "integer", "description": "Number of diners"},
                         "cuisine_preference": {"type": "string", "description": "Preferred cuisine"},
                         "occasion": {"type": "string", "description": "Dining occasion"},
-                        "budget": {"type": "string", "description": "Budget: budget, moderate, upscale"}
+                        "budget": {"type": "string", "description": "Budget: budget, moderate, upscale, fine_dining"}
                     },
                     "required": ["party_size", "occasion"]
                 }
@@ -115,31 +208,90 @@ class LlamaAgent:
     ]
     
     def __init__(self, db: RestaurantDatabase, no_show_predictor: NoShowPredictor, 
-                 recommendation_engine: RecommendationEngine):
-        """Initialize Llama agent with Groq"""
+                 recommendation_engine: RecommendationEngine, client: Any = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 telemetry: Optional[Telemetry] = None, use_cache: Optional[bool] = None,
+                 fast_path: Optional[bool] = None, clock: Optional[Callable[[], date]] = None):
+        """Initialize Llama agent with Groq (pass client to share one across agents)
+        
+        use_cache and fast_path override LLM_CACHE_ENABLED and FAST_PATH_ENABLED;
+        clock supplies today's date (default date.today).
+        """
         self.db = db
+        self.clock = clock or date.today
         self.no_show_predictor = no_show_predictor
         self.recommendation_engine = recommendation_engine
         self.validator = ReservationValidator()
+        # Fuzzy names, cities and cuisines -> canonical values and location ids
+        self.resolver = getattr(db, "resolver", None)
+        # (latitude, longitude) the guest shared, used for "near me"
+        self.user_location: Optional[tuple] = None
         
-        # Initialize Groq client
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not set. Get your free key at https://console.groq.com/keys")
+        # Completion client: Groq, or an offline backend picked by LLM_BACKEND
+        if client is None:
+            client = self._create_client()
         
-        self.client = Groq(api_key=api_key)
+        self.client = client
         
         # Model configuration - Read from environment or default to 70B for better tool calling
         self.model_name = os.getenv("MODEL_NAME", "llama-3.3-70b-versatile")
         print(f"🤖 Using model: {self.model_name}")
         
-        # Conversation history
+        # Completion cache shared across sessions (LLM_CACHE_ENABLED=false to disable)
+        if use_cache is None:
+            use_cache = response_cache is not None or os.getenv("LLM_CACHE_ENABLED", "true").lower() != "false"
+        if response_cache is None and use_cache:
+            response_cache = ResponseCache.shared(os.getenv("LLM_CACHE_PATH", "llm_cache.db"))
+        self.response_cache = response_cache if use_cache else None
+        
+        # Spans and metrics (TRACE_PATH / METRICS_* in the environment)
+        self.telemetry = telemetry or Telemetry.shared()
+        if self.telemetry.tracing:
+            self.db.pool.set_trace_callback(self.telemetry.trace_sql)
+        
+        # Rule-based fast path for formulaic requests (FAST_PATH_ENABLED=false to disable)
+        self.intent_router = None
+        if fast_path is None:
+            fast_path = os.getenv("FAST_PATH_ENABLED", "true").lower() != "false"
+        if fast_path:
+            self.intent_router = IntentRouter(**self.db.get_lookup_values(), resolver=self.resolver)
+        
+        # Tool-call rounds allowed per turn before the model must answer
+        self.max_tool_steps = max(1, int(os.getenv("MAX_TOOL_STEPS", "3")))
+        
+        # Whether tool rounds are answered from templates (see response_templates)
+        self.response_policy = get_response_policy()
+        self._follow_ups = []
+        
+        # Token, cost and latency accounting with per-session budgets
+        self.usage = UsageLedger()
+        self._answered_by = None
+        
+        # Conversation history, kept under a token budget by the memory manager
+        self.memory = ConversationMemory()
         self.messages = []
         self._initialize_system_prompt()
     
+    def reset_conversation(self):
+        """Start a fresh conversation"""
+        for follow_up in self._follow_ups:
+            follow_up.cancel()
+        self._follow_ups = []
+        self.usage.new_conversation()
+        self.memory.reset()
+        self._initialize_system_prompt()
+    
+    def _create_client(self) -> Any:
+        """Create the completion client (see backends.create_client)"""
+        return create_client()
+    
     def _initialize_system_prompt(self):
         """Initialize with system prompt"""
-        system_prompt = """You are an intelligent restaurant reservation assistant for GoodFoods, a premium dining network.
+        # Read once per conversation: the date the prompt gives the model is the one
+        # "today" and "tomorrow" in guest messages resolve against
+        self.today = self.clock()
+        today, tomorrow = self.today.isoformat(), (self.today + timedelta(days=1)).isoformat()
+        system_prompt = f"""You are an intelligent restaurant reservation assistant for GoodFoods, a premium dining network.
 
 CRITICAL RULES - YOU MUST FOLLOW THESE:
 1. NEVER make up or invent confirmation numbers
@@ -158,15 +310,19 @@ Your capabilities:
 - Handle special requests and dietary restrictions
 
 IMPORTANT DATE FORMATTING RULES:
-- Today's date is 2025-11-26
-- When user says "tomorrow", use date: 2025-11-27
-- When user says "today", use date: 2025-11-26
+- Today's date is {today}
+- When user says "tomorrow", use date: {tomorrow}
+- When user says "today", use date: {today}
 - Always use YYYY-MM-DD format for dates
 - Always use HH:MM format for times (24-hour, e.g., 20:00 for 8 PM, 19:00 for 7 PM)
 
 WORKFLOW:
 1. User asks for restaurant → Call search_available_slots tool
+   (for a range of dates or times, e.g. "between 6 and 9 pm this weekend", call search_availability_grid ONCE instead of searching each slot)
+   (for descriptive requests, e.g. "romantic rooftop with vegan options", call search_restaurants ONCE with the description)
+   (for "near me", "close to X" or "walking distance", call search_nearby with near set to the place or "me")
 2. Show results from the tool
+   (each slot has a demand level from the booking forecast; only advise booking soon when it is high or very high)
 3. User selects restaurant → Ask for name and phone if not provided
 4. Once you have ALL details → Call create_reservation tool
 5. ONLY after create_reservation returns success → Share the confirmation number from the tool response
@@ -193,178 +349,601 @@ REMEMBER: Always use the provided tools. Never make up responses."""
         Returns:
             Dictionary with response_text, tool_calls, and any reservation info
         """
-        # Add user message
-        self.messages.append({"role": "user", "content": user_message})
+        response = None
+        for event in self._drive(self._run_turn(user_message, stream=False)):
+            if event["type"] == "done":
+                response = event["response"]
+        return response
+    
+    def stream_message(self, user_message: str, conversation_history: List[Dict] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Process user message, yielding events as they happen
         
-        # FORCED TOOL CALLING: Detect if user wants to book and we have the info
-        forced_tool_call = self._detect_and_force_booking(user_message)
+        Events:
+            {"type": "text", "delta": str} - next piece of the reply
+            {"type": "tool_call", "name": str, "input": dict} - tool about to run
+            {"type": "tool_result", "name": str, "input": dict, "result": dict}
+            {"type": "replace", "text": str} - discard streamed text, show this instead
+            {"type": "done", "response": dict} - same dictionary process_message returns
+        """
+        yield from self._drive(self._run_turn(user_message, stream=True))
+    
+    def _drive(self, turn_events: Iterator[Any]) -> Iterator[Dict[str, Any]]:
+        """Run a turn's I/O points as blocking calls, yielding its events"""
+        send, value = turn_events.send, None
+        try:
+            while True:
+                try:
+                    item = send(value)
+                except StopIteration:
+                    return
+                send, value = turn_events.send, None
+                if not isinstance(item, TurnIO):
+                    yield item
+                    continue
+                try:
+                    method = getattr(self, item.method)
+                    value = (yield from method(*item.args)) if item.streams else method(*item.args)
+                except Exception as e:
+                    # The turn handles I/O failures itself
+                    send, value = turn_events.throw, e
+        finally:
+            turn_events.close()
+    
+    def _run_turn(self, user_message: str, stream: bool) -> Iterator[Any]:
+        """One user turn as a sequence of events and I/O points; stream controls token streaming"""
+        turn = self.telemetry.span("turn", stream=stream)
+        self._answered_by = None
+        self._turn_tools = []
+        try:
+            yield from self._turn_events(user_message, stream, turn)
+        finally:
+            self._end_turn(turn, self._turn_tools)
+    
+    def _tool_call_event(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Event announcing a tool call, noted for the turn's usage record"""
+        self._turn_tools.append(name)
+        return {"type": "tool_call", "name": name, "input": arguments}
+    
+    def _end_turn(self, turn: Any, tools: List[str]):
+        """Close a turn's usage record and span"""
+        usage = self.usage.end_turn(self._answered_by or "error", tools)
+        turn.set(total_tokens=usage["total_tokens"], cost_usd=usage["cost_usd"])
+        turn.end(sys.exc_info()[1])
+    
+    def _count_turn(self, turn: Any, path: str):
+        """Record how a turn was answered: forced, fast, template, llm, budget or error"""
+        self._answered_by = path
+        turn.set(path=path)
+        self.telemetry.metrics.inc("goodfoods_turns_total", path=path)
+    
+    def _compact_history(self):
+        """Trim the history to the memory budget, harder once the soft token budget is spent"""
+        if self.usage.budget_state() == SOFT:
+            self.messages = self.memory.compact(self.messages, max_tokens=self.memory.max_tokens // 2,
+                                                keep_recent_turns=1)
+        else:
+            self.messages = self.memory.compact(self.messages)
+    
+    def _budget_response(self) -> Dict[str, Any]:
+        """Reply for a turn refused because the hard token budget is spent"""
+        self.messages.append({"role": "assistant", "content": HARD_BUDGET_REPLY})
+        return {
+            "response_text": HARD_BUDGET_REPLY,
+            "tool_calls": [],
+            "reservation_created": None
+        }
+    
+    def get_usage_report(self) -> Dict[str, Any]:
+        """Tokens, cost and latency so far (see UsageLedger.report)"""
+        return self.usage.report()
+    
+    def _turn_events(self, user_message: str, stream: bool, turn: Any) -> Iterator[Any]:
+        """Body of _run_turn; I/O points run with turn as the current span"""
+        # Background follow-ups that finished since the last turn join the history first
+        self.collect_follow_ups()
+        
+        # Add user message, then trim older history to the token budget
+        self.messages.append({"role": "user", "content": user_message})
+        self._compact_history()
         
         try:
+            # FORCED TOOL CALLING: Detect if user wants to book and we have the info,
+            # else whether the fast path can answer; both read the location catalog
+            forced_tool_call, routed = yield TurnIO("_route_turn", (user_message,))
+            
             # If we detected forced booking, execute it directly
             if forced_tool_call:
-                tool_result = self._create_reservation(**forced_tool_call)
-                
-                if tool_result.get("success"):
-                    reservation = tool_result.get("reservation")
-                    final_text = f"✅ Reservation confirmed!\n\n" \
-                                f"📋 **Confirmation Number:** {reservation['confirmation_number']}\n" \
-                                f"🍽️ **Restaurant:** {reservation['restaurant_name']}\n" \
-                                f"📅 **Date:** {reservation['reservation_date']}\n" \
-                                f"🕐 **Time:** {reservation['reservation_time']}\n" \
-                                f"👥 **Party Size:** {reservation['party_size']}\n" \
-                                f"📞 **Contact:** {reservation['customer_phone']}\n\n" \
-                                f"See you there! 🎉"
-                    
-                    self.messages.append({"role": "assistant", "content": final_text})
-                    
-                    return {
-                        "response_text": final_text,
-                        "tool_calls": [{
-                            "name": "create_reservation",
-                            "input": forced_tool_call,
-                            "result": tool_result
-                        }],
-                        "reservation_created": reservation
-                    }
-                else:
-                    error_msg = f"❌ Unable to complete reservation: {tool_result.get('error')}"
-                    self.messages.append({"role": "assistant", "content": error_msg})
-                    return {
-                        "response_text": error_msg,
-                        "tool_calls": [],
-                        "reservation_created": None
-                    }
+                self._count_turn(turn, "forced")
+                yield self._tool_call_event("create_reservation", forced_tool_call)
+                with self.telemetry.activate(turn):
+                    tool_result = yield TurnIO("_run_tool", ("create_reservation", forced_tool_call))
+                yield {"type": "tool_result", "name": "create_reservation",
+                       "input": forced_tool_call, "result": tool_result}
+                response = self._forced_booking_response(forced_tool_call, tool_result)
+                yield {"type": "text", "delta": response["response_text"]}
+                yield {"type": "done", "response": response}
+                return
             
-            # Call Llama via Groq with tool calling
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=self.messages,
-                tools=self.TOOLS,
-                tool_choice="auto",
-                temperature=0.7,
-                max_tokens=2000
-            )
+            # FAST PATH: unambiguous searches and cancellations skip the model
+            if routed:
+                tool_name, arguments = routed
+                self._count_turn(turn, "fast")
+                yield self._tool_call_event(tool_name, arguments)
+                with self.telemetry.activate(turn):
+                    tool_result = yield TurnIO("_run_tool", (tool_name, arguments))
+                yield {"type": "tool_result", "name": tool_name, "input": arguments, "result": tool_result}
+                response = self._fast_path_response(tool_name, arguments, tool_result)
+                yield {"type": "text", "delta": response["response_text"]}
+                yield {"type": "done", "response": response}
+                return
+            
+            # Out of token budget: only the model-free paths above still work
+            if self.usage.budget_state() == HARD:
+                self._count_turn(turn, "budget")
+                response = self._budget_response()
+                yield {"type": "text", "delta": response["response_text"]}
+                yield {"type": "done", "response": response}
+                return
             
-            assistant_message = response.choices[0].message
             tool_calls_info = []
             reservation_created = None
+            steps = 0
             
-            # Check if model wants to call tools
-            if assistant_message.tool_calls:
-                # Add assistant message with tool calls (convert to dict format)
-                self.messages.append({
-                    "role": "assistant",
-                    "content": assistant_message.content,
-                    "tool_calls": [
-                        {
-                            "id": tc.id,
-                            "type": "function",
-                            "function": {
-                                "name": tc.function.name,
-                                "arguments": tc.function.arguments
-                            }
-                        } for tc in assistant_message.tool_calls
-                    ]
-                })
+            # Call Llama via Groq with tool calling, then run tool rounds until
+            # the model answers or the step limit is hit
+            while True:
+                with_tools = steps < self.max_tool_steps
+                assistant_message = yield from self._complete(with_tools, stream, turn)
                 
-                # Execute each tool call
-                for tool_call in assistant_message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    # Execute the tool
-                    tool_result = self._execute_tool(function_name, function_args)
-                    
-                    # Track if reservation was created
-                    if function_name == "create_reservation" and tool_result.get("success"):
-                        reservation_created = tool_result.get("reservation")
-                    
-                    tool_calls_info.append({
-                        "name": function_name,
-                        "input": function_args,
-                        "result": tool_result
-                    })
-                    
-                    # Add tool result to messages
-                    self.messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": json.dumps(tool_result)
-                    })
+                if not (with_tools and assistant_message.tool_calls):
+                    break
                 
-                # Get final response after tools
-                final_response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=self.messages,
-                    temperature=0.7,
-                    max_tokens=1000
-                )
+                self._record_tool_calls(assistant_message)
                 
-                final_text = final_response.choices[0].message.content
-                self.messages.append({"role": "assistant", "content": final_text})
+                for tool_call in assistant_message.tool_calls:
+                    yield self._tool_call_event(tool_call.function.name, self._parse_tool_call(tool_call)[1])
                 
-            else:
-                # No tool calls, just add assistant response
-                final_text = assistant_message.content or ""
+                # Read-only calls run concurrently, bookings one by one; results keep call order
+                round_start = len(tool_calls_info)
+                with self.telemetry.activate(turn):
+                    results = yield TurnIO("_execute_tool_calls", (assistant_message.tool_calls,))
+                for tool_call, function_args, tool_result in results:
+                    reservation_created = self._record_tool_result(
+                        tool_call, function_args, tool_result, tool_calls_info
+                    ) or reservation_created
+                    yield {"type": "tool_result", "name": tool_call.function.name,
+                           "input": function_args, "result": tool_result}
                 
-                # VALIDATION: Detect hallucinated reservations
-                hallucination_keywords = ["confirmation", "confirmed", "booked", "reservation is complete", "#CONF"]
-                if final_text and any(keyword.lower() in final_text.lower() for keyword in hallucination_keywords):
-                    # Check if we actually have reservation details
-                    if not reservation_created:
-                        # AI is hallucinating! Override the response
-                        final_text = "⚠️ I apologize, but I cannot complete the reservation without calling the proper booking system. Let me help you properly:\n\n" + \
-                                   "To make a reservation, I need:\n" + \
-                                   "1. Date and time\n" + \
-                                   "2. Number of people\n" + \
-                                   "3. Your name\n" + \
-                                   "4. Your phone number\n\n" + \
-                                   "Please provide these details so I can search for available restaurants and complete your booking using the official system."
+                steps += 1
                 
-                self.messages.append({"role": "assistant", "content": final_text})
+                # Transactional results can be answered from a template
+                response = self._templated_response(tool_calls_info, round_start, reservation_created)
+                if response:
+                    self._count_turn(turn, "template")
+                    yield {"type": "text", "delta": response["response_text"]}
+                    yield {"type": "done", "response": response}
+                    return
             
-            return {
+            final_text = assistant_message.content or ""
+            if not tool_calls_info:
+                checked_text = self._check_hallucination(final_text, reservation_created)
+                if checked_text != final_text:
+                    final_text = checked_text
+                    yield {"type": "replace", "text": final_text}
+            
+            self.messages.append({"role": "assistant", "content": final_text})
+            self._count_turn(turn, "llm")
+            
+            yield {"type": "done", "response": {
                 "response_text": final_text,
                 "tool_calls": tool_calls_info,
                 "reservation_created": reservation_created
-            }
+            }}
             
         except Exception as e:
-            error_msg = f"I apologize, I encountered an error: {str(e)}"
-            self.messages.append({"role": "assistant", "content": error_msg})
+            self._count_turn(turn, "error")
+            turn.fail(e)
+            response = self._error_response(e)
+            yield {"type": "replace", "text": response["response_text"]}
+            yield {"type": "done", "response": response}
+    
+    def _complete(self, with_tools: bool, stream: bool, turn: Any = None) -> Iterator[Any]:
+        """Run one completion, yielding text events and I/O points; returns the assistant message"""
+        kwargs = self._completion_kwargs(with_tools)
+        
+        call = self._llm_span(turn, kwargs, stream)
+        try:
+            cache_key = self._cache_key(kwargs)
+            data_version = None
+            if cache_key and ResponseCache.depends_on_data(kwargs):
+                with self.telemetry.activate(call):
+                    data_version = yield TurnIO("_data_version")
+            cached = self._cache_get(cache_key, data_version)
+            self._count_llm_call(call, cached is not None, stream)
+            if cached:
+                self._record_usage(call, kwargs, None, cached, cached=True)
+                if cached.content:
+                    yield {"type": "text", "delta": cached.content}
+                return cached
+            
+            message, usage = yield TurnIO("_request_completion", (kwargs, stream, call), streams=True)
+            call.set(tool_calls=len(message.tool_calls or []))
+            self._record_usage(call, kwargs, usage, message)
+            self._cache_put(cache_key, message, data_version)
+            return message
+        finally:
+            call.end(sys.exc_info()[1])
+    
+    def _request_completion(self, kwargs: Dict[str, Any], stream: bool, call: Any) -> Iterator[Dict[str, Any]]:
+        """Send a completion request, yielding text events; returns (message, usage)"""
+        if not stream:
+            completion = self.client.chat.completions.create(**kwargs)
+            message = completion.choices[0].message
+            if message.content:
+                yield {"type": "text", "delta": message.content}
+            return message, getattr(completion, "usage", None)
+        
+        accumulator = StreamAccumulator()
+        for chunk in self.client.chat.completions.create(**kwargs, stream=True):
+            text = accumulator.add(chunk)
+            if text:
+                call.set_once(first_token_ms=call.elapsed_ms())
+                yield {"type": "text", "delta": text}
+        return accumulator.message(), accumulator.usage
+    
+    def _data_version(self) -> int:
+        """Availability data version, for completion cache entries that depend on it"""
+        return self.db.get_data_version()
+    
+    def _route_turn(self, user_message: str) -> tuple:
+        """(booking to force, fast-path (tool, arguments)) for a message; at most one is set"""
+        forced_tool_call = self._detect_and_force_booking(user_message)
+        if forced_tool_call or not self.intent_router:
+            return forced_tool_call, None
+        return None, self.intent_router.route(user_message, self.today)
+    
+    def _run_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute one tool for a turn (the async agent runs it on the database executor)"""
+        return self._execute_tool(tool_name, arguments)
+    
+    def _llm_span(self, turn: Any, kwargs: Dict[str, Any], stream: bool) -> Any:
+        """Span for one completion request"""
+        return self.telemetry.span("llm", parent=turn, model=kwargs["model"], stream=stream,
+                                   with_tools="tools" in kwargs, messages=len(kwargs["messages"]))
+    
+    def _record_usage(self, call: Any, kwargs: Dict[str, Any], usage: Any, message: Any,
+                      cached: bool = False):
+        """Account a completion's tokens, cost and latency"""
+        entry = self.usage.record(kwargs["model"], usage, latency_ms=call.elapsed_ms(), cached=cached,
+                                  estimate=None if usage or cached else estimate_usage(kwargs["messages"], message))
+        self._count_tokens(entry)
+        call.set(prompt_tokens=entry["prompt_tokens"], completion_tokens=entry["completion_tokens"])
+    
+    def _count_tokens(self, entry: Dict[str, Any]):
+        """Export an accounted completion as token and cost counters"""
+        metrics = self.telemetry.metrics
+        metrics.inc("goodfoods_llm_tokens_total", entry["prompt_tokens"], model=entry["model"], kind="prompt")
+        metrics.inc("goodfoods_llm_tokens_total", entry["completion_tokens"], model=entry["model"],
+                    kind="completion")
+        metrics.inc("goodfoods_llm_cost_usd_total", entry["cost_usd"], model=entry["model"])
+    
+    def _count_llm_call(self, call: Any, cached: bool, stream: bool):
+        """Count a completion request, noting whether the cache answered it"""
+        call.set(cached=cached)
+        self.telemetry.metrics.inc("goodfoods_llm_calls_total", cached=str(cached).lower(),
+                                   stream=str(stream).lower())
+    
+    def _cache_key(self, kwargs: Dict[str, Any]) -> Optional[str]:
+        """Cache key for a completion request, or None when caching is off"""
+        if not self.response_cache:
+            return None
+        return ResponseCache.make_key(kwargs)
+    
+    def _cache_get(self, cache_key: Optional[str], data_version: Optional[int]) -> Optional[Any]:
+        """Cached assistant message for this request, if still valid"""
+        if not cache_key:
+            return None
+        cached = self.response_cache.get(cache_key, data_version)
+        return message_from_dict(cached) if cached else None
+    
+    def _cache_put(self, cache_key: Optional[str], message: Any, data_version: Optional[int]):
+        """Remember a completion; empty answers are never cached"""
+        if cache_key and (message.content or message.tool_calls):
+            self.response_cache.put(cache_key, message_to_dict(message), data_version)
+    
+    @classmethod
+    def _get_tool_executor(cls) -> ThreadPoolExecutor:
+        """Lazily create the shared tool worker pool"""
+        with cls._tool_executor_lock:
+            if cls._tool_executor is None:
+                cls._tool_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("TOOL_WORKERS", "4")),
+                    thread_name_prefix="goodfoods-tool"
+                )
+            return cls._tool_executor
+    
+    @classmethod
+    def _get_follow_up_executor(cls) -> ThreadPoolExecutor:
+        """Lazily create the shared follow-up completion pool"""
+        with cls._tool_executor_lock:
+            if cls._follow_up_executor is None:
+                cls._follow_up_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("FOLLOW_UP_WORKERS", "2")),
+                    thread_name_prefix="goodfoods-follow-up"
+                )
+            return cls._follow_up_executor
+    
+    def _parse_tool_call(self, tool_call: Any):
+        """Return (tool_call, arguments, error result or None)"""
+        try:
+            return tool_call, json.loads(tool_call.function.arguments or "{}"), None
+        except json.JSONDecodeError as e:
+            return tool_call, {}, {"success": False, "error": f"Invalid tool arguments: {e}"}
+    
+    def _tool_batches(self, tool_calls: List[Any]) -> List[List[tuple]]:
+        """Parse a round of tool calls into batches that may run concurrently
+        
+        Runs of read-only calls share a batch; every booking change is a batch
+        of its own, so writes happen one at a time and in call order.
+        """
+        batches = []
+        after_write = True
+        for tool_call in tool_calls:
+            writes = tool_call.function.name in self.WRITE_TOOLS
+            if writes or after_write:
+                batches.append([])
+            batches[-1].append(self._parse_tool_call(tool_call))
+            after_write = writes
+        return batches
+    
+    def _run_parsed_tool(self, item: tuple) -> tuple:
+        """(tool_call, arguments, result) for a parsed tool call"""
+        tool_call, function_args, error = item
+        if error:
+            return tool_call, function_args, error
+        return tool_call, function_args, self._execute_tool(tool_call.function.name, function_args)
+    
+    def _execute_tool_calls(self, tool_calls: List[Any]) -> List[tuple]:
+        """Execute one round of tool calls; read-only neighbours run concurrently"""
+        results = []
+        for batch in self._tool_batches(tool_calls):
+            if len(batch) == 1:
+                results.append(self._run_parsed_tool(batch[0]))
+                continue
+            # Each worker runs in a copy of this context so tool spans nest under the turn;
+            # map() yields results in submission order, i.e. tool_call_id order
+            contexts = [contextvars.copy_context() for _ in batch]
+            results.extend(self._get_tool_executor().map(
+                lambda context, item: context.run(self._run_parsed_tool, item), contexts, batch))
+        return results
+    
+    def _completion_kwargs(self, with_tools: bool) -> Dict[str, Any]:
+        """Arguments for chat.completions.create on the current history"""
+        if with_tools:
             return {
-                "response_text": error_msg,
-                "tool_calls": [],
-                "reservation_created": None
+                "model": self.model_name,
+                "messages": self.messages,
+                "tools": self.TOOLS,
+                "tool_choice": "auto",
+                "temperature": 0.7,
+                "max_tokens": 2000
             }
+        return {
+            "model": self.model_name,
+            "messages": self.messages,
+            "temperature": 0.7,
+            "max_tokens": 1000
+        }
+    
+    def _record_tool_calls(self, assistant_message: Any):
+        """Add assistant message with tool calls (convert to dict format)"""
+        self.messages.append({
+            "role": "assistant",
+            "content": assistant_message.content,
+            "tool_calls": [
+                {
+                    "id": tc.id,
+                    "type": "function",
+                    "function": {
+                        "name": tc.function.name,
+                        "arguments": tc.function.arguments
+                    }
+                } for tc in assistant_message.tool_calls
+            ]
+        })
+    
+    def _record_tool_result(self, tool_call: Any, function_args: Dict[str, Any],
+                            tool_result: Dict[str, Any], tool_calls_info: List[Dict]) -> Optional[Dict]:
+        """Add a tool result to the history; returns the reservation if one was created"""
+        function_name = tool_call.function.name
+        self.memory.observe_tool(function_name, function_args, tool_result)
+        
+        tool_calls_info.append({
+            "name": function_name,
+            "input": function_args,
+            "result": tool_result
+        })
+        
+        # Add tool result to messages (compact projection; the UI gets the full result)
+        self.messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call.id,
+            "content": encode_tool_result(function_name, tool_result)
+        })
+        
+        # Track if reservation was created
+        if function_name == "create_reservation" and tool_result.get("success"):
+            return tool_result.get("reservation")
+        return None
+    
+    def _check_hallucination(self, final_text: str, reservation_created: Optional[Dict]) -> str:
+        """Replace replies that claim a booking no tool actually made"""
+        hallucination_keywords = ["confirmation", "confirmed", "booked", "reservation is complete", "#CONF"]
+        if final_text and any(keyword.lower() in final_text.lower() for keyword in hallucination_keywords):
+            # Check if we actually have reservation details
+            if not reservation_created:
+                # AI is hallucinating! Override the response
+                final_text = "⚠️ I apologize, but I cannot complete the reservation without calling the proper booking system. Let me help you properly:\n\n" + \
+                           "To make a reservation, I need:\n" + \
+                           "1. Date and time\n" + \
+                           "2. Number of people\n" + \
+                           "3. Your name\n" + \
+                           "4. Your phone number\n\n" + \
+                           "Please provide these details so I can search for available restaurants and complete your booking using the official system."
+        return final_text
+    
+    def _forced_booking_response(self, forced_tool_call: Dict, tool_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the reply for a booking executed without the model"""
+        self.memory.observe_tool("create_reservation", forced_tool_call, tool_result)
+        final_text = RESPONSE_RENDERERS["create_reservation"].render(forced_tool_call, tool_result)
+        if tool_result.get("success"):
+            reservation = tool_result.get("reservation")
+            self.messages.append({"role": "assistant", "content": final_text})
+            
+            return {
+                "response_text": final_text,
+                "tool_calls": [{
+                    "name": "create_reservation",
+                    "input": forced_tool_call,
+                    "result": tool_result
+                }],
+                "reservation_created": reservation
+            }
+        
+        self.messages.append({"role": "assistant", "content": final_text})
+        return {
+            "response_text": final_text,
+            "tool_calls": [],
+            "reservation_created": None
+        }
+    
+    def _fast_path_response(self, tool_name: str, arguments: Dict[str, Any],
+                            tool_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a routed tool call in the history and render its templated reply"""
+        tool_call = SimpleNamespace(
+            id=f"fastpath_{len(self.messages)}",
+            type="function",
+            function=SimpleNamespace(name=tool_name, arguments=json.dumps(arguments))
+        )
+        self._record_tool_calls(SimpleNamespace(content=None, tool_calls=[tool_call]))
+        tool_calls_info = []
+        self._record_tool_result(tool_call, arguments, tool_result, tool_calls_info)
+        
+        final_text = RESPONSE_RENDERERS[tool_name].render(arguments, tool_result)
+        self.messages.append({"role": "assistant", "content": final_text})
+        
+        return {
+            "response_text": final_text,
+            "tool_calls": tool_calls_info,
+            "reservation_created": None
+        }
+    
+    def _templated_response(self, tool_calls_info: List[Dict], round_start: int,
+                            reservation_created: Optional[Dict]) -> Optional[Dict[str, Any]]:
+        """Answer the last tool round from templates, or None if the model should reply"""
+        round_calls = tool_calls_info[round_start:]
+        policy = choose_policy(round_calls, self.response_policy)
+        if policy == KEEP:
+            return None
+        
+        final_text = render_tool_reply(round_calls)
+        self.messages.append({"role": "assistant", "content": final_text})
+        if policy == BACKGROUND:
+            self._follow_ups.append(self._start_follow_up(self._follow_up_kwargs()))
+        
+        return {
+            "response_text": final_text,
+            "tool_calls": tool_calls_info,
+            "reservation_created": reservation_created
+        }
+    
+    def _follow_up_kwargs(self) -> Dict[str, Any]:
+        """Completion request asking the model to add to a templated reply"""
+        return {
+            "model": self.model_name,
+            "messages": self.messages + [{"role": "system", "content": FOLLOW_UP_PROMPT}],
+            "temperature": 0.7,
+            "max_tokens": 300
+        }
+    
+    def _start_follow_up(self, kwargs: Dict[str, Any]) -> Any:
+        """Run a follow-up completion on the shared follow-up pool"""
+        return self._get_follow_up_executor().submit(self.client.chat.completions.create, **kwargs)
+    
+    def collect_follow_ups(self) -> List[str]:
+        """Texts of finished background follow-ups, added to the history in order"""
+        texts = []
+        while self._follow_ups and self._follow_ups[0].done():
+            follow_up = self._follow_ups.pop(0)
+            if follow_up.cancelled() or follow_up.exception() is not None:
+                continue
+            result = follow_up.result()
+            message = result.choices[0].message
+            entry = self.usage.record(self.model_name, getattr(result, "usage", None), path="follow_up",
+                                      estimate=estimate_usage(self.messages, message))
+            self._count_tokens(entry)
+            text = (message.content or "").strip()
+            if text and text.upper() != "NONE":
+                self.messages.append({"role": "assistant", "content": text})
+                texts.append(text)
+        return texts
+    
+    def _error_response(self, error: Exception) -> Dict[str, Any]:
+        """Record and return a turn that failed with an exception"""
+        error_msg = f"I apologize, I encountered an error: {str(error)}"
+        self.messages.append({"role": "assistant", "content": error_msg})
+        return {
+            "response_text": error_msg,
+            "tool_calls": [],
+            "reservation_created": None
+        }
     
     def _execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a tool and return results"""
-        try:
-            if tool_name == "search_available_slots":
-                return self._search_available_slots(**arguments)
-            elif tool_name == "create_reservation":
-                result = self._create_reservation(**arguments)
-                print(f"DEBUG: create_reservation result: {result}")  # Debug log
-                return result
-            elif tool_name == "get_recommendations":
-                return self._get_recommendations(**arguments)
-            elif tool_name == "modify_reservation":
-                return self._modify_reservation(**arguments)
-            elif tool_name == "cancel_reservation":
-                return self._cancel_reservation(**arguments)
-            else:
-                return {"success": False, "error": f"Unknown tool: {tool_name}"}
-        except Exception as e:
-            print(f"DEBUG: Tool execution error: {str(e)}")  # Debug log
-            import traceback
-            traceback.print_exc()
-            return {"success": False, "error": str(e)}
+        with self.telemetry.span(f"tool.{tool_name}") as span:
+            try:
+                result = self._dispatch_tool(tool_name, arguments)
+            except Exception as e:
+                span.fail(e)
+                result = {"success": False, "error": str(e)}
+            success = bool(result.get("success"))
+            span.set(success=success, **({} if success else {"error": str(result.get("error"))}))
+            self.telemetry.metrics.inc("goodfoods_tool_calls_total", tool=tool_name, success=str(success).lower())
+            return result
+    
+    def _dispatch_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the method behind a tool"""
+        if tool_name == "search_available_slots":
+            return self._search_available_slots(**arguments)
+        elif tool_name == "search_availability_grid":
+            return self._search_availability_grid(**arguments)
+        elif tool_name == "search_restaurants":
+            return self._search_restaurants(**arguments)
+        elif tool_name == "search_nearby":
+            return self._search_nearby(**arguments)
+        elif tool_name == "create_reservation":
+            return self._create_reservation(**arguments)
+        elif tool_name == "get_recommendations":
+            return self._get_recommendations(**arguments)
+        elif tool_name == "modify_reservation":
+            return self._modify_reservation(**arguments)
+        elif tool_name == "cancel_reservation":
+            return self._cancel_reservation(**arguments)
+        else:
+            return {"success": False, "error": f"Unknown tool: {tool_name}"}
+    
+    def _canonical(self, city: Optional[str], cuisine: Optional[str]) -> tuple:
+        """City and cuisine as stored ("LA" -> "Los Angeles", "japanes" -> "Japanese"); unknown values pass through"""
+        if self.resolver is None:
+            return city, cuisine
+        return self.resolver.resolve_city(city) or city, self.resolver.resolve_cuisine(cuisine) or cuisine
     
     def _search_available_slots(self, date: str, time: str, party_size: int, 
                                 city: str, cuisine: Optional[str] = None) -> Dict[str, Any]:
         """Search for available reservation slots"""
         try:
+            city, cuisine = self._canonical(city, cuisine)
             slots = self.db.get_available_slots(date, time, party_size, None, cuisine, city)
             return {
                 "success": True,
@@ -374,6 +953,75 @@ REMEMBER: Always use the provided tools. Never make up responses."""
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def _search_restaurants(self, query: str, city: Optional[str] = None, cuisine: Optional[str] = None,
+                            party_size: Optional[int] = None) -> Dict[str, Any]:
+        """Free-text restaurant search"""
+        try:
+            city, cuisine = self._canonical(city, cuisine)
+            restaurants = self.db.search_restaurants(query, city=city, cuisine=cuisine, party_size=party_size)
+            return {
+                "success": True,
+                "restaurants": restaurants,
+                "count": len(restaurants)
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def set_user_location(self, latitude: float, longitude: float):
+        """Remember where the guest is, for "near me" searches"""
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("Coordinates must be a latitude in [-90, 90] and a longitude in [-180, 180]")
+        self.user_location = (latitude, longitude)
+    
+    def _search_nearby(self, near: Optional[str] = None, latitude: Optional[float] = None,
+                       longitude: Optional[float] = None, radius_km: Optional[float] = None,
+                       cuisine: Optional[str] = None, date: Optional[str] = None,
+                       time: Optional[str] = None, party_size: Optional[int] = None) -> Dict[str, Any]:
+        """Restaurants nearest a place, the guest, or given coordinates"""
+        try:
+            if latitude is not None and longitude is not None:
+                origin = f"{latitude}, {longitude}"
+            elif not near or near.strip().lower() in ("me", "my location", "here"):
+                if self.user_location is None:
+                    return {"success": False, "error": "The guest's location is unknown; ask which city or restaurant to search near"}
+                latitude, longitude = self.user_location
+                origin = "your location"
+            else:
+                point = self.resolver.resolve_point(near) if self.resolver is not None else None
+                if point is None:
+                    return {"success": False, "error": f"Could not place '{near}'; ask for a city or restaurant name"}
+                latitude, longitude, origin = point["latitude"], point["longitude"], point["label"]
+            _, cuisine = self._canonical(None, cuisine)
+            nearby = self.db.find_nearby(latitude, longitude, radius_km=radius_km, cuisine=cuisine,
+                                         date=date, time=time, party_size=party_size)
+            return {
+                "success": True,
+                "origin": origin,
+                "nearby": nearby,
+                "count": len(nearby)
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def _search_availability_grid(self, start_date: str, end_date: str, time_from: str,
+                                  time_to: str, party_size: int, city: Optional[str] = None,
+                                  cuisine: Optional[str] = None,
+                                  granularity_minutes: int = 30) -> Dict[str, Any]:
+        """Search availability over a date range and time window in one query"""
+        try:
+            city, cuisine = self._canonical(city, cuisine)
+            grid = self.db.get_availability_grid(
+                start_date, end_date, time_from, time_to, party_size,
+                granularity_minutes=granularity_minutes, cuisine=cuisine, city=city
+            )
+            return {
+                "success": True,
+                **grid,
+                "count": len(grid["locations"])
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
     def _create_reservation(self, location_id: str, date: str, time: str, 
                            party_size: int, customer_name: str, customer_phone: str,
                            customer_email: Optional[str] = None,
@@ -381,9 +1029,6 @@ REMEMBER: Always use the provided tools. Never make up responses."""
                            occasion: Optional[str] = None) -> Dict[str, Any]:
         """Create a new reservation"""
         try:
-            print(f"DEBUG: create_reservation called with: location_id={location_id}, date={date}, time={time}, "
-                  f"party_size={party_size}, name={customer_name}, phone={customer_phone}")
-            
             # Check for placeholder values
             placeholder_values = ["your name", "your phone", "your phone number", "customer name", "customer phone"]
             if any(placeholder.lower() in customer_name.lower() for placeholder in placeholder_values):
@@ -397,51 +1042,50 @@ REMEMBER: Always use the provided tools. Never make up responses."""
                     "error": "Invalid phone number - please provide the actual phone number, not placeholder text"
                 }
             
-            print(f"DEBUG: Validating inputs...")
             # Validate inputs
-            validation = self.validator.validate_reservation_request(
-                date, time, party_size, customer_phone, customer_email
-            )
-            print(f"DEBUG: Validation result: {validation}")
+            with self.telemetry.span("validate") as span:
+                validation = self.validator.validate_reservation_request(
+                    date, time, party_size, customer_phone, customer_email,
+                    location_id=location_id, resolver=self.resolver
+                )
+                span.set(valid=validation["valid"])
             if not validation["valid"]:
                 return {"success": False, "error": validation["errors"]}
+            location_id = validation["location_id"]
             
             # Predict no-show probability
             from datetime import datetime
             advance_days = (validation["parsed_date"].date() - datetime.now().date()).days
-            print(f"DEBUG: Predicting no-show risk...")
-            no_show_risk = self.no_show_predictor.predict_risk(
-                party_size=party_size,
-                advance_days=advance_days,
-                occasion=occasion or "casual",
-                customer_phone=customer_phone
-            )
-            print(f"DEBUG: No-show risk: {no_show_risk}")
+            with self.telemetry.span("predict_no_show") as span:
+                no_show_risk = self.no_show_predictor.predict_risk(
+                    party_size=party_size,
+                    advance_days=advance_days,
+                    occasion=occasion or "casual",
+                    customer_phone=customer_phone,
+                    date=date
+                )
+                span.set(risk=round(no_show_risk, 3))
             
             # Create reservation
-            print(f"DEBUG: Calling db.create_reservation...")
-            reservation = self.db.create_reservation(
-                location_id=location_id,
-                date=date,
-                time=time,
-                party_size=party_size,
-                customer_name=customer_name,
-                customer_phone=customer_phone,
-                customer_email=customer_email or "",
-                special_requests=special_requests or "",
-                occasion=occasion or ""
-            )
-            print(f"DEBUG: Reservation created: {reservation}")
+            with self.telemetry.span("db.create_reservation"):
+                reservation = self.db.create_reservation(
+                    location_id=location_id,
+                    date=date,
+                    time=time,
+                    party_size=party_size,
+                    customer_name=customer_name,
+                    customer_phone=customer_phone,
+                    customer_email=customer_email or "",
+                    special_requests=special_requests or "",
+                    occasion=occasion or ""
+                )
             
             return {
                 "success": True,
                 "reservation": reservation,
-                "no_show_risk": "high" if no_show_risk > 0.3 else "low"
+                "no_show_risk": "high" if no_show_risk > self.no_show_predictor.HIGH_RISK else "low"
             }
         except Exception as e:
-            print(f"DEBUG: Exception in create_reservation: {str(e)}")
-            import traceback
-            traceback.print_exc()
             return {"success": False, "error": str(e)}
     
     def _get_recommendations(self, party_size: int, occasion: str,
@@ -449,13 +1093,13 @@ REMEMBER: Always use the provided tools. Never make up responses."""
                             budget: Optional[str] = None) -> Dict[str, Any]:
         """Get personalized restaurant recommendations"""
         try:
-            preferences = {
-                "party_size": party_size,
-                "occasion": occasion,
-                "cuisine_preference": cuisine_preference,
-                "budget": budget
-            }
-            recommendations = self.recommendation_engine.get_recommendations(preferences)
+            _, cuisine_preference = self._canonical(None, cuisine_preference)
+            recommendations = self.recommendation_engine.get_recommendations(
+                party_size=party_size,
+                cuisine=cuisine_preference,
+                occasion=occasion,
+                budget=budget or "moderate"
+            )
             return {
                 "success": True,
                 "recommendations": recommendations,
@@ -470,9 +1114,14 @@ REMEMBER: Always use the provided tools. Never make up responses."""
                            new_party_size: Optional[int] = None) -> Dict[str, Any]:
         """Modify an existing reservation"""
         try:
-            success = self.db.modify_reservation(
-                confirmation_number, new_date, new_time, new_party_size
-            )
+            updates = {}
+            if new_date:
+                updates["date"] = new_date
+            if new_time:
+                updates["time"] = new_time
+            if new_party_size:
+                updates["party_size"] = new_party_size
+            success = self.db.modify_reservation(confirmation_number, updates)
             if success:
                 return {
                     "success": True,
@@ -512,7 +1161,7 @@ REMEMBER: Always use the provided tools. Never make up responses."""
         selected_restaurant = None
         customer_name = None
         customer_phone = None
-        party_size = 2  # default
+        party_size_found = None
         date = None
         time = None
         
@@ -538,17 +1187,16 @@ REMEMBER: Always use the provided tools. Never make up responses."""
                 if phone_match:
                     customer_phone = phone_match.group(1).strip()
             
-            # Look for restaurant mentions with location
-            if "japanese bar" in content.lower() and "los angeles" in content.lower():
-                selected_restaurant = "LOC081"  # Japanese Bar & Grill in LA
+            # Look for an unambiguous restaurant mention ("the Thai grill in SF"); only the
+            # guest's own words count, since replies and tool tables list many restaurants
+            if not selected_restaurant and self.resolver is not None and msg.get("role") == "user":
+                selected_restaurant = self.resolver.best_location(content)
             
-            # Look for date/time
-            if "tomorrow" in content.lower():
-                date = "2025-11-27"
-            if "7 pm" in content.lower() or "19:00" in content.lower():
-                time = "19:00"
-            if "8 pm" in content.lower() or "20:00" in content.lower():
-                time = "20:00"
+            # Look for date/time/party size (newest mention wins)
+            date = date or parse_date(content.lower(), self.today)
+            time = time or parse_time(content.lower())
+            if not party_size_found:
+                party_size_found = parse_party_size(content.lower())
         
         # If we have all required info, return forced booking data
         if selected_restaurant and customer_name and customer_phone and date and time:
@@ -558,7 +1206,7 @@ REMEMBER: Always use the provided tools. Never make up responses."""
                 "customer_phone": customer_phone,
                 "date": date,
                 "time": time,
-                "party_size": party_size
+                "party_size": party_size_found or 2  # default
             }
         
         return None
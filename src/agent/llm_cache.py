@@ -0,0 +1,235 @@
+"""
+Persistent LLM response cache
+In-memory LRU in front of a local sqlite file, keyed on a normalized hash of
+model, messages and tools; cache hits never write to the file
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
+
+
+def _normalize_text(text: Optional[str]) -> Optional[str]:
+    """Collapse whitespace so trivial variants share a key
+
+    Case is kept: a replayed answer repeats names and references from the
+    text verbatim in its tool arguments, so "ada" must not get Ada's answer.
+    """
+    if text is None:
+        return None
+    return " ".join(text.split())
+
+
+def _normalize_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the fields that affect the completion"""
+    normalized = {
+        "role": message["role"],
+        "content": _normalize_text(message.get("content")),
+    }
+    if message.get("tool_calls"):
+        normalized["tool_calls"] = [
+            [tc["function"]["name"], tc["function"]["arguments"]] for tc in message["tool_calls"]
+        ]
+    return normalized
+
+
+class ResponseCache:
+    """LRU + sqlite cache of assistant messages with TTLs and size bounds"""
+
+    _shared: Dict[str, "ResponseCache"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, max_memory_entries: Optional[int] = None,
+                 max_disk_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        """Open (or create) the cache; path=None keeps it in memory only"""
+        self.path = path
+        self.max_memory_entries = max_memory_entries or int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+        self.max_disk_entries = max_disk_entries or int(os.getenv("LLM_CACHE_DISK_ENTRIES", "20000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], Optional[int], float]]" = OrderedDict()
+        # key -> last hit time, written to the file with the next store (or on close)
+        self._accessed: Dict[str, float] = {}
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "stale": 0, "evictions": 0, "stores": 0}
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    data_version INTEGER,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_access ON llm_responses(last_access)"
+            )
+            self._conn.commit()
+
+    @classmethod
+    def shared(cls, path: str) -> "ResponseCache":
+        """One cache per file, shared by every agent in the process"""
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path)
+            return cls._shared[path]
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Hash the parts of a chat.completions request that determine the answer"""
+        payload = {
+            "model": request.get("model"),
+            "messages": [_normalize_message(m) for m in request.get("messages", [])],
+            "tools": request.get("tools"),
+            "tool_choice": request.get("tool_choice"),
+            "temperature": request.get("temperature"),
+            "max_tokens": request.get("max_tokens"),
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def depends_on_data(request: Dict[str, Any]) -> bool:
+        """Requests that include tool results go stale when availability changes"""
+        return any(m["role"] == "tool" for m in request.get("messages", []))
+
+    def get(self, key: str, data_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached message, or None on a miss, expiry or stale data"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, data_version, created_at FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = (json.loads(row[0]), row[1], row[2])
+
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+
+            value, stored_version, created_at = entry
+            reason = None
+            if now - created_at > self.ttl_seconds:
+                reason = "expired"
+            elif stored_version is not None and stored_version != data_version:
+                reason = "stale"
+
+            if reason:
+                self.counters[reason] += 1
+                self.counters["misses"] += 1
+                self._delete(key)
+                return None
+
+            self.counters["hits"] += 1
+            self._remember(key, entry)
+            if self._conn is not None:
+                self._accessed[key] = now
+            return value
+
+    def put(self, key: str, value: Dict[str, Any], data_version: Optional[int] = None):
+        """Store a message; data_version=None marks it as independent of availability"""
+        now = time.time()
+        entry = (value, data_version, now)
+        with self._lock:
+            self.counters["stores"] += 1
+            self._remember(key, entry)
+            if self._conn is not None:
+                self._conn.execute("""
+                    INSERT OR REPLACE INTO llm_responses (key, value, data_version, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (key, json.dumps(value), data_version, now, now))
+                self._accessed.pop(key, None)
+                # Recent hits count before the eviction below picks the least recently used
+                self._flush_accessed()
+                self._evict_disk()
+                self._conn.commit()
+
+    def _remember(self, key: str, entry: Tuple[Dict[str, Any], Optional[int], float]):
+        """Insert into the in-memory LRU, evicting the least recently used entry"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _flush_accessed(self):
+        """Write pending last_access times in one statement batch (caller commits)"""
+        if self._accessed:
+            self._conn.executemany("UPDATE llm_responses SET last_access = ? WHERE key = ?",
+                                   [(at, key) for key, at in self._accessed.items()])
+            self._accessed.clear()
+
+    def _delete(self, key: str):
+        """Drop an entry from both tiers"""
+        self._memory.pop(key, None)
+        self._accessed.pop(key, None)
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict_disk(self):
+        """Keep the sqlite tier under max_disk_entries, oldest access first"""
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            self._conn.execute("""
+                DELETE FROM llm_responses WHERE key IN (
+                    SELECT key FROM llm_responses ORDER BY last_access LIMIT ?
+                )
+            """, (excess,))
+            self.counters["evictions"] += excess
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "memory_entries": len(self._memory),
+                "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+    def close(self):
+        """Write pending access times and close the sqlite file"""
+        with self._lock:
+            if self._conn is not None:
+                self._flush_accessed()
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+
+def message_to_dict(message: Any) -> Dict[str, Any]:
+    """Serialize an assistant message (SDK object or SimpleNamespace)"""
+    return {
+        "content": message.content,
+        "tool_calls": [
+            {"id": tc.id, "name": tc.function.name, "arguments": tc.function.arguments}
+            for tc in (message.tool_calls or [])
+        ],
+    }
+
+
+def message_from_dict(data: Dict[str, Any]) -> Any:
+    """Rebuild an assistant message shaped like the SDK's"""
+    tool_calls = [
+        SimpleNamespace(
+            id=tc["id"], type="function",
+            function=SimpleNamespace(name=tc["name"], arguments=tc["arguments"])
+        )
+        for tc in data.get("tool_calls") or []
+    ]
+    return SimpleNamespace(content=data.get("content"), tool_calls=tool_calls or None)
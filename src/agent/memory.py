@@ -0,0 +1,179 @@
+"""
+Token-budgeted conversation memory for LlamaAgent
+Summarizes stale tool outputs, pins active booking details and evicts old
+turns so the history sent to the model stays under a fixed budget
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+# Marks the pinned booking-details system message so it can be replaced
+PINNED_PREFIX = "ACTIVE BOOKING DETAILS"
+
+# Fields that identify a row when a list is summarized
+IDENTITY_FIELDS = ("location_id", "restaurant_name", "name", "confirmation_number", "city")
+
+# Rows kept when a stale tool result is summarized
+SUMMARY_ROWS = 5
+
+# Row-count line of a tabular tool result (see tool_encoding)
+TABLE_COUNT = re.compile(r"count=(\d+)(?: showing=(\d+))?( summarized)?$")
+
+# Slot name -> tool argument / result keys that fill it
+SLOT_SOURCES = {
+    "location_id": ("location_id",),
+    "restaurant": ("restaurant_name",),
+    "date": ("date", "new_date", "start_date"),
+    "time": ("time", "new_time"),
+    "party_size": ("party_size", "new_party_size"),
+    "city": ("city",),
+    "cuisine": ("cuisine", "cuisine_preference"),
+    "customer_name": ("customer_name",),
+    "customer_phone": ("customer_phone",),
+    "confirmation_number": ("confirmation_number",),
+}
+
+
+def estimate_tokens(message: Dict[str, Any]) -> int:
+    """Cheap token estimate (~4 characters per token plus per-message overhead)"""
+    size = len(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        size += len(tool_call["function"]["name"]) + len(tool_call["function"]["arguments"])
+    return size // 4 + 4
+
+
+class ConversationMemory:
+    """Keeps a chat history under a token budget"""
+
+    def __init__(self, max_tokens: Optional[int] = None, keep_recent_turns: Optional[int] = None,
+                 tool_summary_chars: int = 400):
+        """Configure the budget (defaults from MEMORY_TOKEN_BUDGET / MEMORY_KEEP_TURNS)"""
+        self.max_tokens = max_tokens or int(os.getenv("MEMORY_TOKEN_BUDGET", "6000"))
+        self.keep_recent_turns = keep_recent_turns or int(os.getenv("MEMORY_KEEP_TURNS", "3"))
+        self.tool_summary_chars = tool_summary_chars
+        self.slots: Dict[str, Any] = {}
+
+    def reset(self):
+        """Forget pinned booking details"""
+        self.slots = {}
+
+    def observe_tool(self, tool_name: str, arguments: Dict[str, Any], result: Dict[str, Any]):
+        """Update pinned booking details from a tool call and its result"""
+        if not result.get("success"):
+            return
+
+        sources = [arguments, result.get("reservation") or {}]
+        for slot, keys in SLOT_SOURCES.items():
+            for source in sources:
+                for key in keys:
+                    if source.get(key) not in (None, ""):
+                        self.slots[slot] = source[key]
+
+        if tool_name == "cancel_reservation":
+            self.slots.pop("confirmation_number", None)
+
+    def pinned_message(self) -> Optional[Dict[str, Any]]:
+        """System message carrying the active booking details, if any"""
+        if not self.slots:
+            return None
+        details = ", ".join(f"{key}={value}" for key, value in self.slots.items())
+        return {"role": "system", "content": f"{PINNED_PREFIX} (from earlier in this conversation): {details}"}
+
+    def summarize_tool_content(self, content: str) -> str:
+        """Shrink a stale tool result to its outcome and identifying fields"""
+        table = self._summarize_table(content or "")
+        if table is not None:
+            return table
+
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            data = None
+
+        if not isinstance(data, dict):
+            text = content or ""
+            if len(text) <= self.tool_summary_chars:
+                return text
+            return text[:self.tool_summary_chars] + "…"
+
+        summary = {"summarized": True}
+        for key, value in data.items():
+            if isinstance(value, list):
+                summary[f"{key}_count"] = len(value)
+                summary[key] = [
+                    {field: item[field] for field in IDENTITY_FIELDS if field in item}
+                    if isinstance(item, dict) else item
+                    for item in value[:SUMMARY_ROWS]
+                ]
+            elif isinstance(value, dict):
+                summary[key] = {field: value[field] for field in IDENTITY_FIELDS if field in value}
+            else:
+                summary[key] = value
+        return json.dumps(summary)
+
+    def _summarize_table(self, content: str) -> Optional[str]:
+        """Summary of a pipe-table tool result, or None if content is not one
+
+        Keeps key=value context lines (origin=, party_size=), the total count
+        and the identity columns of the first rows; everything else goes.
+        """
+        lines = content.splitlines()
+        position = next((i for i, line in enumerate(lines) if TABLE_COUNT.match(line)), None)
+        if position is None:
+            return None
+        total, shown, summarized = TABLE_COUNT.match(lines[position]).groups()
+        if summarized:
+            return content
+
+        context = [line for line in lines[:position] if re.match(r"\w+=", line)]
+        header = lines[position + 1].split("|") if len(lines) > position + 1 else []
+        keep = [i for i, column in enumerate(header) if column in IDENTITY_FIELDS]
+        rows = [line.split("|") for line in lines[position + 2:position + 2 + SUMMARY_ROWS]]
+
+        count = f"count={total}" + (f" showing={len(rows)}" if len(rows) < int(total) else "") + " summarized"
+        summary = context + [count]
+        if keep and rows:
+            summary.append("|".join(header[i] for i in keep))
+            summary.extend("|".join(row[i] for i in keep if i < len(row)) for row in rows)
+        return "\n".join(summary)
+
+    def compact(self, messages: List[Dict[str, Any]], max_tokens: Optional[int] = None,
+                keep_recent_turns: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return a history that fits the budget (or the given overrides); the last turn is never touched"""
+        max_tokens = max_tokens or self.max_tokens
+        keep_recent_turns = keep_recent_turns or self.keep_recent_turns
+        system = [m for m in messages[:1] if m["role"] == "system"]
+        rest = [
+            m for m in messages[len(system):]
+            if not (m["role"] == "system" and (m.get("content") or "").startswith(PINNED_PREFIX))
+        ]
+
+        # Split into turns, each starting at a user message, so tool messages
+        # always stay with the assistant message that requested them
+        turns: List[List[Dict[str, Any]]] = []
+        for message in rest:
+            if message["role"] == "user" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+
+        # Stale tool outputs only need their outcome
+        for turn in turns[:-1]:
+            for i, message in enumerate(turn):
+                if message["role"] == "tool":
+                    turn[i] = {**message, "content": self.summarize_tool_content(message["content"])}
+
+        pinned = self.pinned_message()
+        head = system + ([pinned] if pinned else [])
+
+        def total(turn_list):
+            return sum(estimate_tokens(m) for m in head) + sum(
+                estimate_tokens(m) for turn in turn_list for m in turn
+            )
+
+        # Evict the oldest turns until under budget, keeping the recent ones
+        while len(turns) > keep_recent_turns and total(turns) > max_tokens:
+            turns.pop(0)
+
+        return head + [m for turn in turns for m in turn]
@@ -0,0 +1,128 @@
+"""
+Templated replies for tool results
+Per-tool renderers plus the policy deciding whether a tool round still needs
+the model to write the final reply, or can be answered from a template
+"""
+
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+# Final-reply policies
+SKIP = "skip"              # answer from the template, no second completion
+KEEP = "keep"              # let the model write the reply (original behaviour)
+BACKGROUND = "background"  # answer from the template, model adds a follow-up later
+POLICIES = (SKIP, KEEP, BACKGROUND)
+
+# Sent after a templated reply when the model runs in the background
+FOLLOW_UP_PROMPT = (
+    "The last assistant reply was generated from a template. If there is something useful "
+    "to add (a next step, a caveat, an answer to part of the request the template did not "
+    "cover), write it in one or two short sentences without repeating the reply. "
+    "Otherwise answer with exactly: NONE"
+)
+
+
+class ResponseRenderer(NamedTuple):
+    """Template for one tool and the policy used after model-driven calls"""
+    render: Callable[[Dict[str, Any], Dict[str, Any]], str]
+    policy: str
+
+
+def render_search_reply(arguments: Dict[str, Any], result: Dict[str, Any], max_rows: int = 5) -> str:
+    """Templated reply for a slot search"""
+    if not result.get("success"):
+        return f"❌ I couldn't search right now: {result.get('error')}"
+
+    slots = result.get("available_slots", [])
+    cuisine = ""
+    if arguments.get("cuisine"):
+        cuisine = f"{slots[0]['cuisine'] if slots else arguments['cuisine'].title()} "
+    city = slots[0]["city"] if slots else arguments["city"].title()
+    when = f"on {arguments['date']} at {arguments['time']}"
+
+    if not slots:
+        return (f"Sorry, I couldn't find any {cuisine}restaurants in {city} with room for "
+                f"{arguments['party_size']} {when}. Would you like to try another time or date?")
+
+    lines = [f"Here are {cuisine}restaurants in {city} with a table for {arguments['party_size']} {when}:\n"]
+    for i, slot in enumerate(slots[:max_rows], 1):
+        lines.append(f"{i}. **{slot['restaurant_name']}** ({slot['cuisine']}, ⭐ {slot['rating']}, "
+                     f"{slot['price_range']}) - {slot['address']}")
+    lines.append("\nWould you like me to book one? Just tell me which, plus your name and phone number.")
+    return "\n".join(lines)
+
+
+def render_create_reply(arguments: Dict[str, Any], result: Dict[str, Any]) -> str:
+    """Templated reply for a booking"""
+    if not result.get("success"):
+        return f"❌ Unable to complete reservation: {result.get('error')}"
+    reservation = result["reservation"]
+    return (f"✅ Reservation confirmed!\n\n"
+            f"📋 **Confirmation Number:** {reservation['confirmation_number']}\n"
+            f"🍽️ **Restaurant:** {reservation['restaurant_name']}\n"
+            f"📅 **Date:** {reservation['date']}\n"
+            f"🕐 **Time:** {reservation['time']}\n"
+            f"👥 **Party Size:** {reservation['party_size']}\n"
+            f"📞 **Contact:** {arguments['customer_phone']}\n\n"
+            f"See you there! 🎉")
+
+
+def render_modify_reply(arguments: Dict[str, Any], result: Dict[str, Any]) -> str:
+    """Templated reply for a modification"""
+    if not result.get("success"):
+        return f"❌ I couldn't update {arguments['confirmation_number']}: {result.get('error')}"
+    changes = [
+        f"{label} → {arguments[field]}"
+        for field, label in [("new_date", "date"), ("new_time", "time"), ("new_party_size", "party size")]
+        if arguments.get(field)
+    ]
+    details = f": {', '.join(changes)}" if changes else ""
+    return f"✅ Reservation {arguments['confirmation_number']} has been updated{details}."
+
+
+def render_cancel_reply(arguments: Dict[str, Any], result: Dict[str, Any]) -> str:
+    """Templated reply for a cancellation"""
+    if not result.get("success"):
+        return f"❌ I couldn't cancel {arguments['confirmation_number']}: {result.get('error')}"
+    return (f"✅ Reservation {arguments['confirmation_number']} has been cancelled.\n\n"
+            f"You can book again anytime!")
+
+
+# Transactional tools are fully described by their result; searches are left
+# to the model, which can weigh them against the user's stated preferences
+RESPONSE_RENDERERS: Dict[str, ResponseRenderer] = {
+    "search_available_slots": ResponseRenderer(render_search_reply, KEEP),
+    "create_reservation": ResponseRenderer(render_create_reply, SKIP),
+    "modify_reservation": ResponseRenderer(render_modify_reply, SKIP),
+    "cancel_reservation": ResponseRenderer(render_cancel_reply, SKIP),
+}
+
+
+def get_response_policy() -> Optional[str]:
+    """RESPONSE_POLICY override (skip/keep/background), or None for per-tool defaults"""
+    policy = os.getenv("RESPONSE_POLICY", "auto").lower()
+    return policy if policy in POLICIES else None
+
+
+def choose_policy(tool_calls: List[Dict[str, Any]], override: Optional[str] = None) -> str:
+    """Policy for a round of tool calls ({"name", "input", "result"} dicts)"""
+    if not tool_calls:
+        return KEEP
+    policies = set()
+    for call in tool_calls:
+        renderer = RESPONSE_RENDERERS.get(call["name"])
+        # Failures go to the model, which can explain them and suggest alternatives
+        if renderer is None or not call["result"].get("success"):
+            return KEEP
+        policies.add(override or renderer.policy)
+    for policy in (KEEP, BACKGROUND):
+        if policy in policies:
+            return policy
+    return SKIP
+
+
+def render_tool_reply(tool_calls: List[Dict[str, Any]]) -> str:
+    """Templated reply for a round of tool calls, one paragraph per call"""
+    return "\n\n".join(
+        RESPONSE_RENDERERS[call["name"]].render(call["input"], call["result"]) for call in tool_calls
+    )
@@ -0,0 +1,92 @@
+"""
+Compact encoding of tool results sent back to the model
+Per-tool projections rendered as pipe-separated tables with a row cap; the
+UI keeps the full result
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Tool name -> (list field, columns the model needs)
+TOOL_PROJECTIONS: Dict[str, Tuple[str, List[str]]] = {
+    "search_available_slots": (
+        "available_slots",
+        ["location_id", "restaurant_name", "cuisine", "city", "rating", "price_range", "available_capacity", "demand"],
+    ),
+    "get_recommendations": (
+        "recommendations",
+        ["location_id", "name", "cuisine", "city", "rating", "price_range", "match_score", "match_reason"],
+    ),
+    "search_restaurants": (
+        "restaurants",
+        ["location_id", "name", "cuisine", "city", "rating", "price_range", "special_features"],
+    ),
+    "search_nearby": (
+        "nearby",
+        ["location_id", "name", "cuisine", "city", "rating", "price_range", "distance_km", "available_capacity",
+         "demand"],
+    ),
+}
+
+GRID_COLUMNS = ["location_id", "restaurant_name", "cuisine", "city", "rating", "price_range"]
+
+
+def _cell(value: Any) -> str:
+    """Render one table cell on a single line without the separator"""
+    if value is None:
+        return ""
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _table(rows: List[Dict[str, Any]], columns: List[str], total: int) -> List[str]:
+    """Header line plus one line per row"""
+    lines = [f"count={total}" + (f" showing={len(rows)}" if len(rows) < total else "")]
+    if rows:
+        lines.append("|".join(columns))
+        lines.extend("|".join(_cell(row.get(col)) for col in columns) for row in rows)
+    return lines
+
+
+def _encode_grid(result: Dict[str, Any], max_rows: int) -> str:
+    """Grid results: one line per location, seats left per slot for each date"""
+    locations = result.get("locations", [])
+    shown = min(len(locations), max_rows)
+    lines = [
+        f"party_size={result.get('party_size')} times={' '.join(result.get('times', []))}",
+        "seats left per time slot, 0 = unavailable",
+        f"count={len(locations)}" + (f" showing={shown}" if shown < len(locations) else ""),
+    ]
+    if locations:
+        lines.append("|".join(GRID_COLUMNS + ["availability"]))
+    for location in locations[:max_rows]:
+        availability = ";".join(
+            f"{date}:{','.join(str(seats) for seats in cells)}"
+            for date, cells in location.get("availability", {}).items()
+        )
+        lines.append("|".join([_cell(location.get(col)) for col in GRID_COLUMNS] + [availability]))
+    return "\n".join(lines)
+
+
+def encode_tool_result(tool_name: str, result: Dict[str, Any], max_rows: Optional[int] = None) -> str:
+    """Encode a tool result for the model's context"""
+    max_rows = max_rows or int(os.getenv("TOOL_RESULT_MAX_ROWS", "8"))
+
+    if not result.get("success", True):
+        return f"error: {result.get('error')}"
+
+    if tool_name == "search_availability_grid":
+        return _encode_grid(result, max_rows)
+
+    if tool_name in TOOL_PROJECTIONS:
+        field, columns = TOOL_PROJECTIONS[tool_name]
+        rows = result.get(field) or []
+        lines = _table(rows[:max_rows], columns, len(rows))
+        if result.get("origin"):
+            # Distances mean little without the point they were measured from
+            lines.insert(0, f"origin={_cell(result['origin'])}")
+        return "\n".join(lines)
+
+    # Small transactional results: JSON without nulls or whitespace
+    compact = {key: value for key, value in result.items() if value not in (None, "")}
+    return json.dumps(compact, separators=(",", ":"))
@@ -0,0 +1,184 @@
+"""
+LLM token, cost and latency accounting
+Records the usage Groq reports for every completion and aggregates it per
+conversation, per tool path and per model, with soft and hard token budgets
+per session
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.agent.memory import estimate_tokens
+
+# USD per million tokens (prompt, completion), from Groq's price list
+MODEL_PRICES = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama3-70b-8192": (0.59, 0.79),
+    "llama3-8b-8192": (0.05, 0.08),
+}
+
+# Budget states, from least to most restrictive
+OK = "ok"
+SOFT = "soft"   # history is compacted harder before each completion
+HARD = "hard"   # turns that need the model are refused
+
+# Per-turn rows kept for the report
+MAX_TURNS_REPORTED = 50
+
+HARD_BUDGET_REPLY = (
+    "This conversation has used up its AI budget. I can still search with a clear request "
+    "(e.g. \"table for 2 in Boston tomorrow at 7pm\") or cancel a booking by its confirmation number, "
+    "or you can contact the restaurant directly."
+)
+
+
+def model_price(model: str) -> Tuple[float, float]:
+    """(prompt, completion) USD per million tokens; LLM_PRICE_PER_MTOK="0.59,0.79" overrides"""
+    override = os.getenv("LLM_PRICE_PER_MTOK")
+    if override:
+        prompt, completion = (float(part) for part in override.split(","))
+        return prompt, completion
+    return MODEL_PRICES.get(model, (0.0, 0.0))
+
+
+def usage_counts(usage: Any) -> Optional[Tuple[int, int]]:
+    """(prompt_tokens, completion_tokens) from an SDK usage object or dict, if present"""
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0)
+    return int(getattr(usage, "prompt_tokens", 0) or 0), int(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def estimate_usage(messages: List[Dict[str, Any]], message: Any) -> Tuple[int, int]:
+    """(prompt_tokens, completion_tokens) estimated from text, for responses without usage"""
+    completion = {
+        "content": message.content if message is not None else "",
+        "tool_calls": [{"function": {"name": tc.function.name, "arguments": tc.function.arguments or ""}}
+                       for tc in (getattr(message, "tool_calls", None) or [])],
+    }
+    return sum(estimate_tokens(m) for m in messages), estimate_tokens(completion)
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "total_tokens": 0, "cost_usd": 0.0, "latency_ms": 0.0}
+
+
+def _add(totals: Dict[str, Any], call: Dict[str, Any]):
+    totals["calls"] += 1
+    totals["cached_calls"] += call["cached"]
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens", "cost_usd"):
+        totals[key] += call[key]
+    totals["latency_ms"] += call["latency_ms"] or 0.0
+
+
+def _rounded(totals: Dict[str, Any]) -> Dict[str, Any]:
+    return {**totals, "cost_usd": round(totals["cost_usd"], 6), "latency_ms": round(totals["latency_ms"], 1)}
+
+
+class UsageLedger:
+    """Per-session record of every completion and what it cost"""
+
+    def __init__(self, soft_budget: Optional[int] = None, hard_budget: Optional[int] = None):
+        """Budgets are total tokens per session (defaults from TOKEN_BUDGET_SOFT / TOKEN_BUDGET_HARD, 0 = none)"""
+        self.soft_budget = soft_budget if soft_budget is not None else int(os.getenv("TOKEN_BUDGET_SOFT", "0"))
+        self.hard_budget = hard_budget if hard_budget is not None else int(os.getenv("TOKEN_BUDGET_HARD", "0"))
+        self._lock = threading.Lock()
+        self.calls: List[Dict[str, Any]] = []
+        self.turns: List[Dict[str, Any]] = []
+        self.conversation = 1
+        self._turn_calls: List[Dict[str, Any]] = []
+
+    def new_conversation(self):
+        """Start counting a new conversation (budgets still cover the whole session)"""
+        with self._lock:
+            self.conversation += 1
+
+    def record(self, model: str, usage: Any, latency_ms: Optional[float] = None, cached: bool = False,
+               estimate: Optional[Tuple[int, int]] = None, path: Optional[str] = None) -> Dict[str, Any]:
+        """Account one completion; estimate is used when the response carried no usage"""
+        counts = usage_counts(usage)
+        estimated = counts is None and not cached
+        if cached:
+            # Answered from the response cache: nothing was spent
+            counts = (0, 0)
+        elif counts is None:
+            counts = estimate or (0, 0)
+        prompt_price, completion_price = model_price(model)
+        call = {
+            "conversation": self.conversation,
+            "turn": len(self.turns) + 1,
+            "model": model,
+            "path": path,
+            "prompt_tokens": counts[0],
+            "completion_tokens": counts[1],
+            "total_tokens": counts[0] + counts[1],
+            "cost_usd": (counts[0] * prompt_price + counts[1] * completion_price) / 1_000_000,
+            "latency_ms": latency_ms,
+            "cached": cached,
+            "estimated": estimated,
+        }
+        with self._lock:
+            self.calls.append(call)
+            if path is None:
+                self._turn_calls.append(call)
+        return call
+
+    def end_turn(self, path: str, tools: List[str]) -> Dict[str, Any]:
+        """Close the current turn; its calls are attributed to the tools it ran"""
+        tool_path = "+".join(dict.fromkeys(tools)) or "chat"
+        with self._lock:
+            totals = _empty_totals()
+            for call in self._turn_calls:
+                call["path"] = tool_path
+                _add(totals, call)
+            self._turn_calls = []
+            turn = {"conversation": self.conversation, "turn": len(self.turns) + 1,
+                    "answered_by": path, "tool_path": tool_path, **_rounded(totals)}
+            self.turns.append(turn)
+        return turn
+
+    def total_tokens(self) -> int:
+        """Tokens spent so far this session"""
+        with self._lock:
+            return sum(call["total_tokens"] for call in self.calls)
+
+    def budget_state(self) -> str:
+        """OK, SOFT or HARD, depending on which budgets are used up"""
+        spent = self.total_tokens()
+        if self.hard_budget and spent >= self.hard_budget:
+            return HARD
+        if self.soft_budget and spent >= self.soft_budget:
+            return SOFT
+        return OK
+
+    def report(self) -> Dict[str, Any]:
+        """Totals plus breakdowns by conversation, tool path, model and turn"""
+        with self._lock:
+            calls = list(self.calls)
+            turns = list(self.turns)
+        totals = _empty_totals()
+        groups: Dict[str, Dict[Any, Dict[str, Any]]] = {"by_conversation": {}, "by_path": {}, "by_model": {}}
+        for call in calls:
+            _add(totals, call)
+            for group, key in (("by_conversation", call["conversation"]),
+                               ("by_path", call["path"] or "in_progress"), ("by_model", call["model"])):
+                _add(groups[group].setdefault(key, _empty_totals()), call)
+
+        answered_by: Dict[str, int] = {}
+        for turn in turns:
+            answered_by[turn["answered_by"]] = answered_by.get(turn["answered_by"], 0) + 1
+
+        return {
+            "totals": {**_rounded(totals), "turns": len(turns),
+                       "estimated_calls": sum(call["estimated"] for call in calls)},
+            **{group: {key: _rounded(value) for key, value in rows.items()} for group, rows in groups.items()},
+            "answered_by": answered_by,
+            "turns": turns[-MAX_TURNS_REPORTED:],
+            "budget": {"state": self.budget_state(), "spent_tokens": totals["total_tokens"],
+                       "soft_tokens": self.soft_budget or None, "hard_tokens": self.hard_budget or None},
+        }
@@ -0,0 +1,86 @@
+"""
+Async facade over RestaurantDatabase
+Runs blocking sqlite calls on a bounded thread pool so one event loop can
+serve many conversations
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from src.database.restaurant_db import RestaurantDatabase
+
+
+class AsyncRestaurantDatabase:
+    """Awaitable wrappers around RestaurantDatabase methods"""
+
+    def __init__(self, db: RestaurantDatabase, max_workers: Optional[int] = None):
+        """Wrap a database; max_workers bounds concurrent sqlite calls (and reader connections)"""
+        self.db = db
+        self.max_workers = max_workers or int(os.getenv("DB_MAX_WORKERS", "8"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="goodfoods-db"
+        )
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable on the database executor"""
+        loop = asyncio.get_running_loop()
+        # In a copy of the caller's context, so tracing spans keep their parent
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, func, *args, **kwargs))
+
+    async def get_available_slots(self, date: str, time: str, party_size: int,
+                                  location_id: Optional[str] = None,
+                                  cuisine: Optional[str] = None,
+                                  city: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get available reservation slots"""
+        return await self.run(self.db.get_available_slots, date, time, party_size,
+                              location_id, cuisine, city)
+
+    async def search_restaurants(self, query: str, **filters) -> List[Dict[str, Any]]:
+        """Free-text search over restaurants"""
+        return await self.run(self.db.search_restaurants, query, **filters)
+
+    async def find_nearby(self, latitude: float, longitude: float, **filters) -> List[Dict[str, Any]]:
+        """Restaurants nearest a point"""
+        return await self.run(self.db.find_nearby, latitude, longitude, **filters)
+
+    async def get_availability_grid(self, start_date: str, end_date: str, time_from: str,
+                                    time_to: str, party_size: int, **filters) -> Dict[str, Any]:
+        """Get a location x slot availability matrix"""
+        return await self.run(self.db.get_availability_grid, start_date, end_date,
+                              time_from, time_to, party_size, **filters)
+
+    async def create_reservation(self, **reservation) -> Dict[str, Any]:
+        """Create a new reservation"""
+        return await self.run(self.db.create_reservation, **reservation)
+
+    async def modify_reservation(self, confirmation_number: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Modify an existing reservation"""
+        return await self.run(self.db.modify_reservation, confirmation_number, updates)
+
+    async def cancel_reservation(self, confirmation_number: str, reason: str = "") -> Dict[str, Any]:
+        """Cancel a reservation"""
+        return await self.run(self.db.cancel_reservation, confirmation_number, reason)
+
+    async def get_location_details(self, location_id: str) -> Dict[str, Any]:
+        """Get location details"""
+        return await self.run(self.db.get_location_details, location_id)
+
+    async def predict_demand(self, location_id: str, date: str, time: str) -> Dict[str, Any]:
+        """Predict demand"""
+        return await self.run(self.db.predict_demand, location_id, date, time)
+
+    async def get_statistics(self) -> Dict[str, Any]:
+        """Get system statistics"""
+        return await self.run(self.db.get_statistics)
+
+    async def close(self):
+        """Drain the executor, then close the underlying database"""
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True)
+        )
+        self.db.close()
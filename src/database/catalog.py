@@ -0,0 +1,307 @@
+"""
+In-memory location catalog
+NumPy columns for every location (rating, price tier, capacity, city and
+cuisine codes, coordinates), refreshed incrementally from the location
+change log and published as immutable snapshots
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.database.migrations import normalize_key
+
+PRICE_TIERS = ["budget", "moderate", "upscale", "fine_dining"]
+
+# Refreshes remembered for changed_rows(); consumers further behind rebuild
+CHANGE_HISTORY = 64
+
+# Seconds a catalog may go without refreshing before the change log is pruned past it
+READER_TTL = 3600
+
+LOCATION_COLUMNS = ("location_id", "name", "address", "city", "phone", "cuisine", "seating_capacity",
+                    "avg_rating", "price_range", "special_features", "latitude", "longitude")
+
+
+class Vocabulary:
+    """Stable integer codes for normalized category values"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> int:
+        """Code for value, allocating a new one the first time it is seen"""
+        key = normalize_key(value)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.values)
+            self.values.append(key)
+        return code
+
+    def get(self, value: Optional[str]) -> Optional[int]:
+        """Code for value, or None if no location has it"""
+        return self.codes.get(normalize_key(value))
+
+    def copy(self) -> "Vocabulary":
+        """Independent copy, extended without affecting this one"""
+        vocabulary = Vocabulary()
+        vocabulary.values = list(self.values)
+        vocabulary.codes = dict(self.codes)
+        return vocabulary
+
+
+# Column dtypes of a snapshot
+COLUMN_TYPES = {
+    "active": bool, "rating": float, "price_tier": np.int8, "capacity": np.int32,
+    "city_code": np.int32, "cuisine_code": np.int32, "latitude": float, "longitude": float,
+}
+
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+class CatalogSnapshot:
+    """Every column of the catalog at one change-log version; never modified once published
+
+    Row i of every array is rows[i]. Rows are only ever appended (deleted
+    locations become inactive), so a row index from an older snapshot means
+    the same location in every newer one.
+    """
+
+    __slots__ = ("version", "rows", "index", "cities", "cuisines", "active", "rating", "price_tier",
+                 "capacity", "city_code", "cuisine_code", "latitude", "longitude")
+
+    def __init__(self, version: Optional[int], rows: Sequence[Optional[Dict[str, Any]]], index: Dict[str, int],
+                 cities: Vocabulary, cuisines: Vocabulary, columns: Dict[str, np.ndarray]):
+        self.version = version
+        self.rows = tuple(rows)
+        self.index = index
+        self.cities = cities
+        self.cuisines = cuisines
+        self.active = _frozen(columns["active"])
+        self.rating = _frozen(columns["rating"])
+        self.price_tier = _frozen(columns["price_tier"])
+        self.capacity = _frozen(columns["capacity"])
+        self.city_code = _frozen(columns["city_code"])
+        self.cuisine_code = _frozen(columns["cuisine_code"])
+        # NaN where a location has no coordinates
+        self.latitude = _frozen(columns["latitude"])
+        self.longitude = _frozen(columns["longitude"])
+
+    def __len__(self) -> int:
+        return int(self.active.sum())
+
+    @classmethod
+    def empty(cls) -> "CatalogSnapshot":
+        return cls(None, [], {}, Vocabulary(), Vocabulary(), {
+            name: np.zeros(0, dtype=dtype) for name, dtype in COLUMN_TYPES.items()
+        })
+
+
+class LocationCatalog:
+    """The current CatalogSnapshot of all locations, kept up to date from the change log
+
+    Column attributes (rating, capacity, ...) read the current snapshot; code
+    that reads several should take .snapshot once so they all come from the
+    same version.
+    """
+
+    def __init__(self, db, refresh_seconds: Optional[float] = None):
+        """Bind to a RestaurantDatabase; nothing is loaded until refresh()"""
+        self.db = db
+        # How stale current() may be to writes made through other pools or processes;
+        # writes through this pool are followed as they commit
+        self.refresh_seconds = (refresh_seconds if refresh_seconds is not None
+                                else float(os.getenv("CATALOG_REFRESH_SECONDS", "5")))
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        # Replaced whole on every refresh, never modified in place
+        self.snapshot = CatalogSnapshot.empty()
+        # (from version, to version, changed row indices) per incremental refresh
+        self._history = deque(maxlen=CHANGE_HISTORY)
+        # This catalog's entry in change_log_readers, once it has read the log
+        self.reader_id = uuid.uuid4().hex
+        # (version, time) last written to change_log_readers
+        self._reported: Optional[tuple] = None
+        self._closed = False
+
+    def __getattr__(self, name: str) -> Any:
+        if name in CatalogSnapshot.__slots__:
+            return getattr(self.snapshot, name)
+        raise AttributeError(name)
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def _latest(self, conn) -> int:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM location_changes").fetchone()[0]
+
+    def current(self) -> CatalogSnapshot:
+        """The published snapshot, loading it on first use and otherwise checking the
+        change log at most every refresh_seconds"""
+        if self.snapshot.version is None or time.monotonic() - self._checked_at >= self.refresh_seconds:
+            self.refresh()
+        return self.snapshot
+
+    def refresh(self) -> bool:
+        """Apply location changes made since the last refresh; returns whether any were"""
+        conn = self.db.conn
+        self._checked_at = time.monotonic()
+        if self._latest(conn) == self.snapshot.version:
+            return False
+        with self._lock:
+            # Another refresh may have published a newer snapshot while this one waited
+            latest = self._latest(conn)
+            current = self.snapshot
+            if latest == current.version:
+                return False
+            oldest = conn.execute("SELECT MIN(seq) FROM location_changes").fetchone()[0]
+            if current.version is None:
+                self.db.pool.add_commit_hooks(before=self._record_position, after=self._follow_write)
+            if current.version is None or (oldest is not None and oldest > current.version + 1):
+                # First load, or the log was pruned past this catalog: read everything
+                rows = conn.execute(f"""
+                    SELECT {", ".join(LOCATION_COLUMNS)} FROM locations ORDER BY location_id
+                """).fetchall()
+                self.snapshot = self._extend(CatalogSnapshot.empty(), latest, [dict(row) for row in rows])
+                self._history.clear()
+            else:
+                changed = [row[0] for row in conn.execute("""
+                    SELECT DISTINCT location_id FROM location_changes WHERE seq > ?
+                """, (current.version,))]
+                self.snapshot, rows = self._apply(conn, current, latest, changed)
+                self._history.append((current.version, latest, rows))
+        return True
+
+    def _follow_write(self):
+        """After-commit hook: pick up location changes the write just made"""
+        if self._closed:
+            return
+        try:
+            self.refresh()
+        except sqlite3.Error:
+            # The write itself committed; the next current() call retries
+            self._checked_at = 0.0
+
+    def _record_position(self, conn):
+        """Before-commit hook: record how far this catalog has read, and drop log entries
+        every live reader has seen, inside a write that is happening anyway"""
+        version = self.snapshot.version
+        now = time.time()
+        reported = self._reported
+        if self._closed or version is None or (
+                reported is not None and reported[0] == version and now - reported[1] < READER_TTL / 2):
+            return
+        conn.execute("""
+            INSERT INTO change_log_readers (reader, seq, seen_at) VALUES (?, ?, ?)
+            ON CONFLICT(reader) DO UPDATE SET seq = excluded.seq, seen_at = excluded.seen_at
+        """, (self.reader_id, version, now))
+        conn.execute("DELETE FROM change_log_readers WHERE seen_at < ?", (now - READER_TTL,))
+        # The entry at the oldest reader's version stays, so MAX(seq) never goes back
+        conn.execute("""
+            DELETE FROM location_changes WHERE seq < (SELECT MIN(seq) FROM change_log_readers)
+        """)
+        self._reported = (version, now)
+
+    def close(self):
+        """Stop following writes and holding back change log pruning"""
+        self._closed = True
+        if self._reported is not None:
+            with self.db.pool.write() as conn:
+                conn.execute("DELETE FROM change_log_readers WHERE reader = ?", (self.reader_id,))
+            self._reported = None
+
+    def changed_rows(self, since: Optional[int], until: Optional[int] = None) -> Optional[List[int]]:
+        """Row indices changed after version since (up to version until, default the latest),
+        or None if a full rebuild is needed"""
+        if until is None:
+            until = self.snapshot.version
+        if since is not None and since == until:
+            return []
+        history = list(self._history)
+        if since is None or not any(start == since for start, _, _ in history):
+            return None
+        changed = set()
+        for start, end, rows in history:
+            if start >= since and end <= until:
+                changed.update(rows)
+        return sorted(changed)
+
+    def _apply(self, conn, current: CatalogSnapshot, version: int, location_ids: List[str]) -> tuple:
+        """(new snapshot, changed row indices) after re-reading changed locations
+
+        Changed rows are updated, new locations appended and deleted ones retired,
+        all in copies of current's columns.
+        """
+        fresh = {}
+        for start in range(0, len(location_ids), 500):
+            chunk = location_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            for row in conn.execute(f"""
+                SELECT {", ".join(LOCATION_COLUMNS)} FROM locations WHERE location_id IN ({placeholders})
+            """, chunk):
+                fresh[row["location_id"]] = dict(row)
+
+        rows = list(current.rows)
+        cities, cuisines = current.cities.copy(), current.cuisines.copy()
+        columns = {name: getattr(current, name).copy() for name in COLUMN_TYPES}
+        added, changed = [], []
+        for location_id in location_ids:
+            row = fresh.get(location_id)
+            i = current.index.get(location_id)
+            if i is None:
+                if row is not None:
+                    added.append(row)
+                continue
+            rows[i] = row
+            columns["active"][i] = row is not None
+            if row is not None:
+                (columns["rating"][i], columns["price_tier"][i], columns["capacity"][i], columns["city_code"][i],
+                 columns["cuisine_code"][i], columns["latitude"][i], columns["longitude"][i]
+                 ) = _features(row, cities, cuisines)
+            changed.append(i)
+        changed.extend(range(len(rows), len(rows) + len(added)))
+        updated = CatalogSnapshot(version, rows, current.index, cities, cuisines, columns)
+        return self._extend(updated, version, added), changed
+
+    def _extend(self, current: CatalogSnapshot, version: int, rows: List[Dict[str, Any]]) -> CatalogSnapshot:
+        """current with rows appended, as a new snapshot at version"""
+        if not rows:
+            return CatalogSnapshot(version, current.rows, current.index, current.cities, current.cuisines,
+                                   {name: getattr(current, name) for name in COLUMN_TYPES})
+        cities, cuisines = current.cities.copy(), current.cuisines.copy()
+        features = list(zip(*(_features(row, cities, cuisines) for row in rows)))
+        added = {"active": np.ones(len(rows), dtype=bool)}
+        added.update(zip(("rating", "price_tier", "capacity", "city_code", "cuisine_code", "latitude", "longitude"),
+                         features))
+        index = dict(current.index)
+        for i, row in enumerate(rows, start=len(current.rows)):
+            index[row["location_id"]] = i
+        columns = {
+            name: np.concatenate([getattr(current, name), np.asarray(added[name], dtype=dtype)])
+            for name, dtype in COLUMN_TYPES.items()
+        }
+        return CatalogSnapshot(version, list(current.rows) + rows, index, cities, cuisines, columns)
+
+
+def _features(row: Dict[str, Any], cities: Vocabulary, cuisines: Vocabulary) -> tuple:
+    """(rating, price tier, capacity, city code, cuisine code, latitude, longitude) of a location row"""
+    price = row["price_range"]
+    return (
+        float(row["avg_rating"] or 0.0),
+        PRICE_TIERS.index(price) if price in PRICE_TIERS else 1,
+        int(row["seating_capacity"] or 0),
+        cities.add(row["city"]),
+        cuisines.add(row["cuisine"]),
+        np.nan if row["latitude"] is None else float(row["latitude"]),
+        np.nan if row["longitude"] is None else float(row["longitude"]),
+    )
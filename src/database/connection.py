@@ -0,0 +1,243 @@
+"""
+SQLite connection pool
+Per-thread read connections plus one serialized writer, in WAL mode
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+def _pragmas_from_env() -> Dict[str, Any]:
+    """Read PRAGMA overrides from the environment"""
+    env_map = {
+        "cache_size": "SQLITE_CACHE_SIZE",
+        "mmap_size": "SQLITE_MMAP_SIZE",
+        "synchronous": "SQLITE_SYNCHRONOUS",
+        "temp_store": "SQLITE_TEMP_STORE",
+        "busy_timeout": "SQLITE_BUSY_TIMEOUT",
+    }
+    return {pragma: os.environ[var] for pragma, var in env_map.items() if os.environ.get(var)}
+
+
+class _Reader:
+    """Holds one thread's read connection; dropped with the thread's locals when it exits"""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _close_reader(connections: List[sqlite3.Connection], lock: threading.RLock, conn: sqlite3.Connection):
+    """Close a finished thread's reader and forget it"""
+    with lock:
+        if conn in connections:
+            connections.remove(conn)
+    conn.close()
+
+
+class _BufferedCursor:
+    """Cursor over the shared :memory: connection that fetches each result under the lock"""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock):
+        self._conn = conn
+        self._lock = lock
+        self._rows: Iterator[Any] = iter(())
+        self.description = None
+
+    def execute(self, sql: str, parameters=()) -> "_BufferedCursor":
+        with self._lock:
+            cursor = self._conn.execute(sql, parameters)
+            self.description = cursor.description
+            self._rows = iter(cursor.fetchall())
+        return self
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        return list(itertools.islice(self._rows, size))
+
+    def fetchall(self) -> List[Any]:
+        return list(self._rows)
+
+    def __iter__(self):
+        return self._rows
+
+
+class _SharedReader:
+    """Read access to the :memory: writer connection, one statement at a time"""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock):
+        self._conn = conn
+        self._lock = lock
+
+    def cursor(self) -> _BufferedCursor:
+        return _BufferedCursor(self._conn, self._lock)
+
+    def execute(self, sql: str, parameters=()) -> _BufferedCursor:
+        return self.cursor().execute(sql, parameters)
+
+    def __getattr__(self, name: str):
+        return getattr(self._conn, name)
+
+
+class ConnectionPool:
+    """Thread-local reader connections and a single locked writer connection"""
+
+    DEFAULT_PRAGMAS = {
+        "cache_size": -65536,       # KiB when negative - 64 MB per connection
+        "mmap_size": 268435456,     # 256 MB memory-mapped reads
+        "synchronous": "NORMAL",    # safe with WAL, one fsync per checkpoint
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,       # ms to wait for a competing writer
+    }
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Any]] = None):
+        """Open the writer connection and switch the database to WAL mode"""
+        self.db_path = db_path
+        self.pragmas = {**self.DEFAULT_PRAGMAS, **_pragmas_from_env(), **(pragmas or {})}
+        self.in_memory = db_path == ":memory:"
+
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # :memory: readers share the writer, so they wait out its open transactions
+        self._shared_lock = threading.RLock()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.RLock()
+        self._trace: Optional[Callable[[str], None]] = None
+        self._write_stats = {"transactions": 0, "contended": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+        # Weakly held, so a dropped catalog stops hooking into every commit
+        self._before_commit: List[weakref.WeakMethod] = []
+        self._after_commit: List[weakref.WeakMethod] = []
+
+        self._writer = self._connect()
+        self._shared_reader = _SharedReader(self._writer, self._shared_lock)
+        if not self.in_memory:
+            # WAL lets readers keep reading while a booking commits
+            self._writer.execute("PRAGMA journal_mode = WAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a configured connection and register it for close()"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if self._trace:
+            conn.set_trace_callback(self._trace)
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        """Return this thread's read connection, opening it on first use
+
+        The connection is closed once the thread exits, so short-lived
+        threads do not pile up open connections and their page caches.
+        """
+        if self.in_memory:
+            # Every :memory: connection is a separate database
+            return self._shared_reader
+        holder = getattr(self._local, "reader", None)
+        if holder is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = 1")
+            holder = _Reader(conn)
+            weakref.finalize(holder, _close_reader, self._connections, self._connections_lock, conn)
+            self._local.reader = holder
+        return holder.conn
+
+    def open_connections(self) -> int:
+        """Connections currently open: the writer plus one reader per live thread that read"""
+        with self._connections_lock:
+            return len(self._connections)
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Run a write transaction on the serialized writer connection"""
+        started = time.perf_counter()
+        contended = not self._write_lock.acquire(blocking=False)
+        if contended:
+            self._write_lock.acquire()
+        if self.in_memory:
+            self._shared_lock.acquire()
+        committed = False
+        try:
+            conn = self._writer
+            # Also waits (up to busy_timeout) for writers in other processes
+            conn.execute("BEGIN IMMEDIATE")
+            self._record_wait(time.perf_counter() - started, contended)
+            try:
+                yield conn
+                for hook in self._live(self._before_commit):
+                    hook(conn)
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+            committed = True
+        finally:
+            if self.in_memory:
+                self._shared_lock.release()
+            try:
+                # Still holding the write lock, so hooks see commits one at a time and in order
+                if committed:
+                    for hook in self._live(self._after_commit):
+                        hook()
+            finally:
+                self._write_lock.release()
+
+    def add_commit_hooks(self, before: Optional[Callable[[sqlite3.Connection], None]] = None,
+                         after: Optional[Callable[[], None]] = None):
+        """Register bound methods to run inside each write transaction and after it commits"""
+        with self._connections_lock:
+            if before is not None:
+                self._before_commit.append(weakref.WeakMethod(before))
+            if after is not None:
+                self._after_commit.append(weakref.WeakMethod(after))
+
+    def _live(self, hooks: List[weakref.WeakMethod]) -> List[Callable]:
+        """Resolve registered hooks, dropping those whose owner is gone"""
+        with self._connections_lock:
+            live = [(ref, ref()) for ref in hooks]
+            hooks[:] = [ref for ref, hook in live if hook is not None]
+        return [hook for _, hook in live if hook is not None]
+
+    def _record_wait(self, waited: float, contended: bool):
+        """Account time spent getting the write lock (called while holding it)"""
+        stats = self._write_stats
+        stats["transactions"] += 1
+        stats["contended"] += contended
+        stats["wait_seconds"] += waited
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+    def write_stats(self) -> Dict[str, Any]:
+        """Write transactions so far and how long they waited for the lock"""
+        with self._write_lock:
+            return dict(self._write_stats)
+
+    @property
+    def writer_connection(self) -> sqlite3.Connection:
+        """The writer connection, for schema setup under external locking"""
+        return self._writer
+
+    def set_trace_callback(self, callback: Optional[Callable[[str], None]]):
+        """Install a SQL trace callback on every current and future connection"""
+        self._trace = callback
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.set_trace_callback(callback)
+
+    def close(self):
+        """Close every connection opened by the pool"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,313 @@
+"""
+Fuzzy entity resolver for restaurant names, cities and cuisines
+Maps free text ("the Japanese bar place in LA") to ranked location_id
+candidates using a trigram index over location names, city aliases and
+bounded edit distance, kept in step with the LocationCatalog
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.database.catalog import CatalogSnapshot, LocationCatalog
+from src.database.geo import city_center
+from src.database.migrations import normalize_key
+
+# Common names for cities, by normalized city key; unused ones are ignored
+CITY_ALIASES = {
+    "los angeles": ["la", "l a"],
+    "san francisco": ["sf", "san fran", "frisco"],
+    "new york": ["nyc", "ny", "new york city", "manhattan"],
+    "chicago": ["chi town", "chitown"],
+    "austin": ["atx"],
+}
+
+# Words that never name a restaurant
+NAME_STOPWORDS = {"a", "an", "and", "at", "book", "for", "i", "in", "me", "my", "of", "on", "one", "place",
+                  "please", "reserve", "restaurant", "the", "to", "want", "with"}
+
+LOCATION_ID_PATTERN = re.compile(r"\bloc[- ]?(\d{1,6})\b")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Name similarity a candidate needs, and the lead the best one needs to be unambiguous
+MIN_NAME_SIMILARITY = 0.5
+UNAMBIGUOUS_MARGIN = 0.1
+
+# Shortest part of a city or cuisine name that resolves to the whole name
+MIN_PARTIAL_LENGTH = 3
+
+# Typo lookups remembered per matcher
+MAX_REMEMBERED_PHRASES = 4096
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return WORD_PATTERN.findall((text or "").lower().replace(".", " ").replace("'", ""))
+
+
+def trigrams(text: Optional[str]) -> Set[str]:
+    """Padded word trigrams ("bar" -> "  b", " ba", "bar", "ar "), stopwords skipped"""
+    grams = set()
+    for word in _words(text):
+        if word in NAME_STOPWORDS:
+            continue
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _typo_limit(word: str) -> int:
+    """Edits tolerated for a word of this length"""
+    return 0 if len(word) < 5 else 1 if len(word) < 9 else 2
+
+
+class _PhraseMatcher:
+    """Finds known phrases (and their aliases or near-misses) in free text"""
+
+    def __init__(self, phrases: Dict[str, str]):
+        """phrases: surface form -> canonical key"""
+        self.exact = phrases
+        self.max_words = max((len(p.split()) for p in phrases), default=1)
+        # Typo candidates by (first letter, word count); typos rarely change the first
+        # letter, which also keeps "justin" away from "austin". Short aliases are exact only
+        self.fuzzy: Dict[Tuple[str, int], List[Tuple[str, str]]] = {}
+        for phrase, key in phrases.items():
+            if len(phrase) >= 5:
+                self.fuzzy.setdefault((phrase[0], len(phrase.split())), []).append((phrase, key))
+        self._seen: Dict[str, Optional[str]] = {}
+
+    def _lookup(self, phrase: str) -> Optional[str]:
+        key = self.exact.get(phrase)
+        if key is not None or len(phrase) < 5:
+            return key
+        if phrase in self._seen:
+            return self._seen[phrase]
+        limit = _typo_limit(phrase)
+        for candidate, key in self.fuzzy.get((phrase[0], phrase.count(" ") + 1), ()):
+            if abs(len(candidate) - len(phrase)) <= limit and edit_distance(phrase, candidate, limit) <= limit:
+                break
+        else:
+            key = None
+        if len(self._seen) >= MAX_REMEMBERED_PHRASES:
+            self._seen.clear()
+        self._seen[phrase] = key
+        return key
+
+    def find(self, text: str) -> Tuple[List[str], str]:
+        """Canonical keys mentioned in text, and the text with the mentions blanked out"""
+        tokens = [(m.group(), m.start(), m.end()) for m in WORD_PATTERN.finditer(text)]
+        found, spans = [], []
+        i = 0
+        while i < len(tokens):
+            for size in range(min(self.max_words, len(tokens) - i), 0, -1):
+                phrase = " ".join(token for token, _, _ in tokens[i:i + size])
+                key = self._lookup(phrase)
+                if key is not None:
+                    if key not in found:
+                        found.append(key)
+                    spans.append((tokens[i][1], tokens[i + size - 1][2]))
+                    i += size
+                    break
+            else:
+                i += 1
+        for start, end in reversed(spans):
+            text = text[:start] + " " + text[end:]
+        return found, text
+
+
+def _resolve(matcher: _PhraseMatcher, names: Dict[str, str], value: Optional[str]) -> Optional[str]:
+    """Display name for value: a name, alias or typo it mentions, else the one name it is part of"""
+    if not value:
+        return None
+    keys, _ = matcher.find(value.lower())
+    if not keys:
+        # Part of a name ("york", "chica"), as LIKE '%...%' filters used to match
+        part = " ".join(_words(value))
+        keys = [key for key in names if part in key] if len(part) >= MIN_PARTIAL_LENGTH else []
+    return names[keys[0]] if len(keys) == 1 else None
+
+
+class _Snapshot:
+    """Name trigram index and phrase matchers for one catalog version"""
+
+    def __init__(self, catalog: CatalogSnapshot):
+        self.catalog = catalog
+        self.version = catalog.version
+        self.city_names: Dict[str, str] = {}
+        self.cuisine_names: Dict[str, str] = {}
+        names: Dict[str, List[int]] = {}
+        for i, row in enumerate(catalog.rows):
+            if row is None:
+                continue
+            self.city_names.setdefault(normalize_key(row["city"]), row["city"])
+            self.cuisine_names.setdefault(normalize_key(row["cuisine"]), row["cuisine"])
+            names.setdefault(" ".join(_words(row["name"])), []).append(i)
+
+        self.names = list(names)
+        self.name_rows = [np.asarray(rows) for rows in names.values()]
+        self.name_grams = [len(trigrams(name)) for name in self.names]
+        self.postings: Dict[str, List[int]] = {}
+        for n, name in enumerate(self.names):
+            for gram in trigrams(name):
+                self.postings.setdefault(gram, []).append(n)
+
+        city_phrases = {key: key for key in self.city_names}
+        for key, aliases in CITY_ALIASES.items():
+            if key in self.city_names:
+                city_phrases.update((alias, key) for alias in aliases)
+        self.cities = _PhraseMatcher(city_phrases)
+        self.cuisines = _PhraseMatcher({key: key for key in self.cuisine_names})
+
+
+class EntityResolver:
+    """Resolve free-text mentions to cities, cuisines and location_id candidates"""
+
+    def __init__(self, catalog: LocationCatalog):
+        """Index a catalog; built on first use and rebuilt when its version changes"""
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    def refresh(self) -> bool:
+        """Pick up location writes; rebuilds only when the catalog version changed"""
+        catalog = self.catalog.current()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == catalog.version:
+            return False
+        with self._lock:
+            # A concurrent refresh may already have built from a newer catalog
+            if self._snapshot is None or self._snapshot.version < catalog.version:
+                self._snapshot = _Snapshot(catalog)
+        return True
+
+    def _current(self) -> _Snapshot:
+        self.refresh()
+        return self._snapshot
+
+    def match_cities(self, text: str) -> Tuple[List[str], str]:
+        """City keys mentioned in text (names, aliases like LA/SF/NYC, typos) and the text without them"""
+        return self._current().cities.find(text.lower())
+
+    def match_cuisines(self, text: str) -> Tuple[List[str], str]:
+        """Cuisine keys mentioned in text (typos included) and the text without them"""
+        return self._current().cuisines.find(text.lower())
+
+    def resolve_city(self, value: Optional[str]) -> Optional[str]:
+        """Display name of the city value refers to ("LA" -> "Los Angeles", "york" -> "New York");
+        None if unknown or ambiguous"""
+        snapshot = self._current()
+        return _resolve(snapshot.cities, snapshot.city_names, value)
+
+    def resolve_cuisine(self, value: Optional[str]) -> Optional[str]:
+        """Display name of the cuisine value refers to ("japanes" -> "Japanese"); None if unknown or ambiguous"""
+        snapshot = self._current()
+        return _resolve(snapshot.cuisines, snapshot.cuisine_names, value)
+
+    def resolve_location(self, text: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Ranked location candidates for text: explicit ids, then name similarity within any city/cuisine named"""
+        snapshot = self._current()
+        catalog = snapshot.catalog
+        lowered = text.lower()
+
+        ids = [catalog.index.get(f"LOC{int(number):03d}") for number in LOCATION_ID_PATTERN.findall(lowered)]
+        ids = [i for i in dict.fromkeys(ids) if i is not None and catalog.active[i]]
+        if ids:
+            return self._ranked(catalog, np.asarray(ids), np.ones(len(ids)), np.zeros(len(ids)), limit)
+
+        cities, rest = snapshot.cities.find(lowered)
+        cuisines, _ = snapshot.cuisines.find(rest)
+        allowed = catalog.active
+        if len(cities) == 1:
+            allowed = allowed & (catalog.city_code == catalog.cities.get(cities[0]))
+
+        # Share of each name's trigrams found in the text
+        shared = Counter(n for gram in trigrams(rest) for n in snapshot.postings.get(gram, ()))
+        rows, scores, counts = [], [], []
+        for n, count in shared.items():
+            similarity = count / snapshot.name_grams[n]
+            if similarity >= MIN_NAME_SIMILARITY:
+                matched = snapshot.name_rows[n][allowed[snapshot.name_rows[n]]]
+                rows.append(matched)
+                scores.append(np.full(len(matched), similarity))
+                counts.append(np.full(len(matched), count))
+        if rows:
+            return self._ranked(catalog, np.concatenate(rows), np.concatenate(scores), np.concatenate(counts),
+                                limit)
+
+        if len(cuisines) == 1:
+            # "the Japanese place in LA": no name, but city and cuisine may narrow it down
+            rows = np.flatnonzero(allowed & (catalog.cuisine_code == catalog.cuisines.get(cuisines[0])))
+            return self._ranked(catalog, rows, np.full(len(rows), MIN_NAME_SIMILARITY), np.zeros(len(rows)), limit)
+        return []
+
+    def best_location(self, text: str) -> Optional[str]:
+        """location_id text unambiguously refers to, or None"""
+        candidates = self.resolve_location(text, limit=2)
+        if not candidates:
+            return None
+        if len(candidates) > 1:
+            first, second = candidates
+            # Only a clear lead counts: a text naming several places fully matches each of them,
+            # and the longer name matching more trigrams says nothing about which one was meant
+            if first["score"] - second["score"] < UNAMBIGUOUS_MARGIN:
+                return None
+        return candidates[0]["location_id"]
+
+    def resolve_point(self, text: str) -> Optional[Dict[str, Any]]:
+        """Coordinates text points at: a named location, else a city's center; None if neither"""
+        location_id = self.best_location(text)
+        catalog = self._snapshot.catalog
+        if location_id is not None:
+            i = catalog.index[location_id]
+            if not np.isnan(catalog.latitude[i]):
+                return {"latitude": float(catalog.latitude[i]), "longitude": float(catalog.longitude[i]),
+                        "label": catalog.rows[i]["name"], "location_id": location_id}
+        cities, _ = self.match_cities(text)
+        if len(cities) != 1:
+            return None
+        label = self._snapshot.city_names[cities[0]]
+        center = city_center(cities[0])
+        if center is None:
+            # Cities without a known center sit at the middle of their locations
+            rows = np.flatnonzero(catalog.active & (catalog.city_code == catalog.cities.get(cities[0])))
+            rows = rows[~np.isnan(catalog.latitude[rows])]
+            if not len(rows):
+                return None
+            center = (float(catalog.latitude[rows].mean()), float(catalog.longitude[rows].mean()))
+        return {"latitude": center[0], "longitude": center[1], "label": label, "location_id": None}
+
+    def _ranked(self, catalog: CatalogSnapshot, rows: np.ndarray, scores: np.ndarray, matched: np.ndarray,
+                limit: int) -> List[Dict[str, Any]]:
+        """Best scores first, then the more specific name, then the higher rating"""
+        if not len(rows):
+            return []
+        order = np.lexsort((rows, -catalog.rating[rows], -matched, -scores))[:limit]
+        results = []
+        for i, score, count in zip(rows[order], scores[order], matched[order]):
+            row = catalog.rows[i]
+            results.append({
+                "location_id": row["location_id"],
+                "name": row["name"],
+                "city": row["city"],
+                "cuisine": row["cuisine"],
+                "score": round(float(score), 3),
+                "matched": int(count),
+            })
+        return results
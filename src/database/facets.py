@@ -0,0 +1,105 @@
+"""
+In-memory facet index over locations
+Rating-ordered posting lists per cuisine, city and price tier, built from the
+LocationCatalog and rebuilt whenever its change-log version moves
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.database.catalog import PRICE_TIERS, CatalogSnapshot, LocationCatalog
+
+FACETS = ("cuisine", "city", "price_range")
+
+
+def _postings(codes: np.ndarray) -> Dict[int, np.ndarray]:
+    """Ascending ranks per code; ranks are positions in rating order"""
+    by_code = np.argsort(codes, kind="stable")
+    values, starts = np.unique(codes[by_code], return_index=True)
+    bounds = list(starts[1:]) + [len(codes)]
+    return {int(value): by_code[start:end] for value, start, end in zip(values, starts, bounds)}
+
+
+class _Snapshot:
+    """One immutable build of the index; swapped in whole on rebuild"""
+
+    def __init__(self, catalog: CatalogSnapshot):
+        self.catalog = catalog
+        self.version = catalog.version
+        live = np.flatnonzero(catalog.active)
+        # Best rated first, ties in catalog order
+        self.order = live[np.lexsort((live, -catalog.rating[live]))]
+        self.postings = {
+            "cuisine": _postings(catalog.cuisine_code[self.order]),
+            "city": _postings(catalog.city_code[self.order]),
+            "price_range": _postings(catalog.price_tier[self.order].astype(np.int32)),
+        }
+        self.resolved: Dict[Tuple, np.ndarray] = {}
+
+
+class FacetIndex:
+    """Filter locations by cuisine, city and price range without touching SQLite"""
+
+    def __init__(self, catalog: LocationCatalog):
+        """Index a catalog; built on the first lookup"""
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    @property
+    def version(self) -> Optional[int]:
+        """Catalog version the index was built from"""
+        return self._snapshot.version if self._snapshot else None
+
+    def refresh(self) -> bool:
+        """Pick up location writes; rebuilds only when the catalog version changed"""
+        catalog = self.catalog.current()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == catalog.version:
+            return False
+        with self._lock:
+            # A concurrent refresh may already have built from a newer catalog
+            if self._snapshot is None or self._snapshot.version < catalog.version:
+                self._snapshot = _Snapshot(catalog)
+        return True
+
+    def _code(self, snapshot: _Snapshot, facet: str, value: str) -> Optional[int]:
+        if facet == "price_range":
+            tier = value.strip().lower().replace(" ", "_").replace("-", "_")
+            return PRICE_TIERS.index(tier) if tier in PRICE_TIERS else None
+        vocabulary = snapshot.catalog.cuisines if facet == "cuisine" else snapshot.catalog.cities
+        return vocabulary.get(value)
+
+    def lookup(self, cuisine: Optional[str] = None, city: Optional[str] = None,
+               price_range: Optional[str] = None, refresh: bool = True) -> np.ndarray:
+        """Catalog row indices matching every given facet, best rated first"""
+        if refresh or self._snapshot is None:
+            self.refresh()
+        snapshot = self._snapshot
+        filters = tuple((facet, value) for facet, value in zip(FACETS, (cuisine, city, price_range)) if value)
+        if not filters:
+            return snapshot.order
+
+        key = tuple((facet, self._code(snapshot, facet, value)) for facet, value in filters)
+        rows = snapshot.resolved.get(key)
+        if rows is None:
+            lists: List[np.ndarray] = []
+            for facet, code in key:
+                posting = snapshot.postings[facet].get(code) if code is not None else None
+                if posting is None:
+                    lists = []
+                    break
+                lists.append(posting)
+            if lists:
+                # Intersect smallest first; ranks stay ascending, so rating order survives
+                lists.sort(key=len)
+                ranks = lists[0]
+                for posting in lists[1:]:
+                    ranks = np.intersect1d(ranks, posting, assume_unique=True)
+                rows = snapshot.order[ranks]
+            else:
+                rows = snapshot.order[:0]
+            snapshot.resolved[key] = rows
+        return rows
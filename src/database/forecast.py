@@ -0,0 +1,253 @@
+"""
+Demand forecasting from materialized reservation aggregates
+A weekly seasonal baseline (average covers per location x weekday x time
+slot) scaled by each location's recent trend, held in NumPy arrays that
+follow the demand change log location by location
+"""
+
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.database.catalog import CatalogSnapshot, LocationCatalog
+
+# Full weeks before a location's latest week that make up its recent trend
+RECENT_WEEKS = 4
+# The trend multiplier never leaves this range
+TREND_BOUNDS = (0.5, 2.0)
+# Covers of "as usual" evidence every trend starts from
+TREND_PRIOR_COVERS = 50.0
+# Horizons kept per aggregate version
+MAX_CACHED_HORIZONS = 8
+
+# (minimum expected occupancy, level, advice), busiest first
+DEMAND_LEVELS = [
+    (0.85, "very high", "Nearly full - book now"),
+    (0.6, "high", "Busy - book soon"),
+    (0.3, "moderate", "Moderately busy - book soon"),
+    (0.0, "low", "Quiet - tables should be easy to get"),
+]
+
+
+def demand_level(occupancy: float) -> Tuple[str, str]:
+    """(level, advice) for an expected occupancy between 0 and 1"""
+    for threshold, level, advice in DEMAND_LEVELS:
+        if occupancy >= threshold:
+            return level, advice
+    return DEMAND_LEVELS[-1][1:]
+
+
+class _Demand:
+    """Profile and trend for one aggregate version and catalog snapshot; never modified once published"""
+
+    def __init__(self, version: Optional[int], catalog: CatalogSnapshot, times: Dict[str, int],
+                 profile: np.ndarray, trend: np.ndarray):
+        self.version = version
+        self.catalog = catalog
+        self.times = times
+        # Average covers per week, by catalog row x weekday x time slot
+        self.profile = profile
+        self.trend = trend
+        self.horizons: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+
+class DemandForecaster:
+    """Expected covers per location, date and time slot"""
+
+    def __init__(self, db, catalog: Optional[LocationCatalog] = None):
+        """Forecast from db's demand aggregates; loaded on first use"""
+        self.db = db
+        self.catalog = catalog if catalog is not None else LocationCatalog(db)
+        self._lock = threading.Lock()
+        self._state = _Demand(None, self.catalog.snapshot, {}, np.zeros((0, 7, 0), dtype=np.float32),
+                              np.ones(0, dtype=np.float32))
+
+    @property
+    def version(self) -> Optional[int]:
+        """demand_changes version the forecast was loaded from"""
+        return self._state.version
+
+    @property
+    def times(self) -> Dict[str, int]:
+        return self._state.times
+
+    @property
+    def profile(self) -> np.ndarray:
+        return self._state.profile
+
+    @property
+    def trend(self) -> np.ndarray:
+        return self._state.trend
+
+    def _latest(self, conn) -> int:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM demand_changes").fetchone()[0]
+
+    def refresh(self) -> bool:
+        """Pick up aggregate changes: reload changed locations, or everything after a rebuild"""
+        catalog = self.catalog.current()
+        conn = self.db.conn
+        state = self._state
+        if self._latest(conn) == state.version and state.catalog is catalog:
+            return False
+        with self._lock:
+            # Another refresh may have published this version while this one waited
+            state = self._state
+            catalog = self.catalog.snapshot
+            latest = self._latest(conn)
+            if latest == state.version and state.catalog is catalog:
+                return False
+            if state.version is None:
+                changed = None
+            else:
+                changed = [row[0] for row in conn.execute(
+                    "SELECT DISTINCT location_id FROM demand_changes WHERE seq > ?", (state.version,))]
+                if "*" in changed:
+                    changed = None
+            # Copies, so readers of the published state never see a half-applied load
+            times = dict(state.times)
+            profile, trend = self._resized(state.profile, state.trend, len(catalog.rows), len(times))
+            profile, trend = self._load(conn, catalog, changed, times, profile, trend)
+            self._state = _Demand(latest, catalog, times, profile, trend)
+        return True
+
+    @staticmethod
+    def _resized(profile: np.ndarray, trend: np.ndarray, rows: int, times: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of profile and trend grown to at least rows x times"""
+        grown = np.zeros((max(rows, profile.shape[0]), 7, max(times, profile.shape[2])), dtype=np.float32)
+        grown[:profile.shape[0], :, :profile.shape[2]] = profile
+        return grown, np.concatenate([trend, np.ones(max(rows - len(trend), 0), dtype=np.float32)])
+
+    def _select(self, conn, sql: str, location_ids: Optional[List[str]]) -> List[tuple]:
+        """Run sql ({} is the location filter) for every location, or for the given ones in chunks"""
+        if location_ids is None:
+            # Aggregates of deleted locations are skipped, and each location is a key range
+            return conn.execute(sql.format("WHERE location_id IN (SELECT location_id FROM locations)")).fetchall()
+        rows = []
+        for start in range(0, len(location_ids), 500):
+            chunk = location_ids[start:start + 500]
+            rows.extend(conn.execute(sql.format(f"WHERE location_id IN ({', '.join('?' * len(chunk))})"),
+                                     chunk).fetchall())
+        return rows
+
+    def _load(self, conn, catalog: CatalogSnapshot, location_ids: Optional[List[str]], times: Dict[str, int],
+              profile: np.ndarray, trend: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Recompute profile and trend rows for location_ids (None: all); may grow profile for new times"""
+        index = catalog.index
+        if location_ids is None:
+            profile[:] = 0
+            trend[:] = 1
+        else:
+            targets = np.asarray([index[i] for i in location_ids if i in index], dtype=np.int64)
+            profile[targets] = 0
+            trend[targets] = 1
+
+        weekly = self._select(conn, "SELECT location_id, week, covers FROM demand_weekly {}", location_ids)
+        weekly = [(index[l], week, covers) for l, week, covers in weekly if l in index and covers]
+        if not weekly:
+            return profile, trend
+        rows, weeks, covers = (np.asarray(column) for column in zip(*weekly))
+        span = len(trend)
+        first = np.full(span, np.iinfo(np.int64).max)
+        last = np.full(span, np.iinfo(np.int64).min)
+        np.minimum.at(first, rows, weeks)
+        np.maximum.at(last, rows, weeks)
+        total = np.bincount(rows, weights=covers, minlength=span)
+        # The latest week is usually partial, so the trend uses the full weeks before it
+        recent = (weeks < last[rows]) & (weeks >= last[rows] - RECENT_WEEKS)
+        recent_total = np.bincount(rows[recent], weights=covers[recent], minlength=span)
+
+        located = np.unique(rows)
+        n_weeks = (last[located] - first[located] + 1).astype(float)
+        recent_weeks = np.minimum(RECENT_WEEKS, n_weeks - 1)
+        weekly_mean = total[located] / n_weeks
+        # Recent covers against what the long-run mean predicts, both padded with
+        # TREND_PRIOR_COVERS so quiet locations barely move off 1
+        expected = weekly_mean * recent_weeks
+        factor = (recent_total[located] + TREND_PRIOR_COVERS) / (expected + TREND_PRIOR_COVERS)
+        # Too little history for a trend: trust the baseline alone
+        factor = np.where(recent_weeks >= RECENT_WEEKS, factor, 1.0)
+        trend[located] = np.clip(factor, *TREND_BOUNDS)
+        weeks_seen = np.ones(span)
+        weeks_seen[located] = n_weeks
+
+        cells = self._select(conn, "SELECT location_id, weekday, time, covers FROM demand_profile {}",
+                             location_ids)
+        cells = [(index[l], weekday, time, covers) for l, weekday, time, covers in cells if l in index]
+        for _, _, time, _ in cells:
+            if time not in times:
+                times[time] = len(times)
+        if profile.shape[2] < len(times):
+            profile, trend = self._resized(profile, trend, span, len(times))
+        if cells:
+            rows, weekdays, slots, covers = zip(*cells)
+            rows = np.asarray(rows)
+            slots = np.asarray([times[t] for t in slots])
+            profile[rows, np.asarray(weekdays), slots] = np.asarray(covers) / weeks_seen[rows]
+        return profile, trend
+
+    def expected_covers(self, rows: Sequence[int], date_value: str, time: str) -> np.ndarray:
+        """Expected covers for catalog rows at one date and time (0 without history)"""
+        self.refresh()
+        state = self._state
+        rows = np.asarray(rows, dtype=np.int64)
+        slot = state.times.get(time)
+        if slot is None or not len(rows):
+            return np.zeros(len(rows))
+        weekday = date.fromisoformat(date_value).weekday()
+        return state.profile[rows, weekday, slot] * state.trend[rows]
+
+    def forecast(self, start_date: str, days: int = 7, location_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Expected covers for every location (or location_ids) x date x time slot over a horizon
+
+        Returns dates, times, location_ids and covers/occupancy arrays shaped
+        (locations, dates, times); the network-wide result is cached until
+        the aggregates change.
+        """
+        if days < 1:
+            raise ValueError("Forecast horizon must be at least one day")
+        first = date.fromisoformat(start_date)
+        self.refresh()
+        state = self._state
+        catalog = state.catalog
+        key = (first.isoformat(), days)
+        horizon = state.horizons.get(key)
+        if horizon is None:
+            rows = np.flatnonzero(catalog.active)
+            dates = [first + timedelta(days=i) for i in range(days)]
+            weekdays = np.asarray([d.weekday() for d in dates])
+            times = sorted(state.times, key=state.times.get)
+            slots = np.asarray([state.times[t] for t in times], dtype=np.int64)
+            covers = (state.profile[rows][:, weekdays][:, :, slots]
+                      * state.trend[rows][:, None, None])
+            capacity = np.maximum(catalog.capacity[rows], 1)[:, None, None]
+            horizon = {
+                "dates": [d.isoformat() for d in dates],
+                "times": times,
+                "rows": rows,
+                "covers": covers,
+                "occupancy": np.minimum(covers / capacity, 1.0),
+            }
+            if len(state.horizons) >= MAX_CACHED_HORIZONS:
+                state.horizons.clear()
+            state.horizons[key] = horizon
+
+        rows = horizon["rows"]
+        if location_ids is not None and len(rows):
+            wanted = [catalog.index[i] for i in location_ids if i in catalog.index]
+            positions = np.searchsorted(rows, wanted)
+            keep = (positions < len(rows)) & (rows[np.minimum(positions, len(rows) - 1)] == wanted)
+            positions = positions[keep]
+        elif location_ids is not None:
+            positions = slice(0)
+        else:
+            positions = slice(None)
+        selected = rows[positions]
+        return {
+            "dates": horizon["dates"],
+            "times": horizon["times"],
+            "location_ids": [catalog.rows[i]["location_id"] for i in selected],
+            "covers": horizon["covers"][positions],
+            "occupancy": horizon["occupancy"][positions],
+        }
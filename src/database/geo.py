@@ -0,0 +1,55 @@
+"""
+Geographic helpers
+City centers, great-circle distances and the deterministic scatter used to
+place locations that predate the latitude/longitude columns
+"""
+
+import hashlib
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# (latitude, longitude) by lower-cased city name
+CITY_CENTERS = {
+    "san francisco": (37.7749, -122.4194),
+    "new york": (40.7128, -74.0060),
+    "los angeles": (34.0522, -118.2437),
+    "chicago": (41.8781, -87.6298),
+    "austin": (30.2672, -97.7431),
+    "seattle": (47.6062, -122.3321),
+    "miami": (25.7617, -80.1918),
+    "boston": (42.3601, -71.0589),
+}
+
+# Locations spread around their city center with this standard deviation (~6 km)
+METRO_SPREAD_DEGREES = 0.055
+
+
+def city_center(city: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Center of a known city, else None"""
+    return CITY_CENTERS.get((city or "").strip().lower())
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; NumPy arrays broadcast"""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def scatter_coordinates(location_id: str, city: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """Stable point near the city center, derived from the location id; (None, None) for unknown cities"""
+    center = city_center(city)
+    if center is None:
+        return None, None
+    digest = hashlib.blake2b(location_id.encode(), digest_size=8).digest()
+    u1 = (int.from_bytes(digest[:4], "big") + 1) / 2 ** 32
+    u2 = int.from_bytes(digest[4:], "big") / 2 ** 32
+    # Box-Muller: the same normal spread the generator uses
+    radius = math.sqrt(-2 * math.log(u1)) * METRO_SPREAD_DEGREES
+    return (round(center[0] + radius * math.cos(2 * math.pi * u2), 6),
+            round(center[1] + radius * math.sin(2 * math.pi * u2) / math.cos(math.radians(center[0])), 6))
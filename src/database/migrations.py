@@ -0,0 +1,341 @@
+"""
+Versioned schema migrations for the restaurant database
+Upgrades existing goodfoods.db files in place using PRAGMA user_version
+"""
+
+import sqlite3
+import string
+from typing import Callable, List, Optional, Tuple
+
+from src.database.geo import scatter_coordinates
+
+
+# SQLite's lower() folds ASCII letters only; str.lower() would also fold "É" and "Ü"
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def normalize_key(value: Optional[str]) -> str:
+    """Normalize a city/cuisine value the same way the *_key columns do"""
+    return (value or "").strip(" ").translate(_ASCII_LOWER)
+
+
+def _v1_base_schema(cursor: sqlite3.Cursor):
+    """Core tables plus the slot occupancy ledger"""
+    # Locations table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS locations (
+            location_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            address TEXT NOT NULL,
+            city TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            cuisine TEXT NOT NULL,
+            seating_capacity INTEGER NOT NULL,
+            avg_rating REAL DEFAULT 4.5,
+            price_range TEXT DEFAULT 'moderate',
+            hours_open TEXT DEFAULT '11:00',
+            hours_close TEXT DEFAULT '23:00',
+            special_features TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Reservations table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reservations (
+            confirmation_number TEXT PRIMARY KEY,
+            location_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            party_size INTEGER NOT NULL,
+            customer_name TEXT NOT NULL,
+            customer_phone TEXT NOT NULL,
+            customer_email TEXT,
+            special_requests TEXT,
+            occasion TEXT,
+            status TEXT DEFAULT 'confirmed',
+            table_number TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(location_id) REFERENCES locations(location_id)
+        )
+    """)
+
+    # Slot occupancy ledger - booked covers per (location, date, time),
+    # maintained in the same transaction as every reservation write
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS slot_occupancy (
+            location_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            booked_covers INTEGER NOT NULL DEFAULT 0,
+            reservation_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (location_id, date, time)
+        ) WITHOUT ROWID
+    """)
+
+    # Backfill the ledger for databases created before it existed
+    cursor.execute("DELETE FROM slot_occupancy")
+    cursor.execute("""
+        INSERT INTO slot_occupancy (location_id, date, time, booked_covers, reservation_count)
+        SELECT location_id, date, time, SUM(party_size), COUNT(*)
+        FROM reservations
+        WHERE status = 'confirmed'
+        GROUP BY location_id, date, time
+    """)
+
+
+def _v2_lookup_keys_and_indexes(cursor: sqlite3.Cursor):
+    """Case-folded city/cuisine lookup columns and the secondary index set"""
+    # Generated columns stay correct for every insert path without triggers;
+    # they must match normalize_key() so equality lookups hit the indexes
+    cursor.execute("""
+        ALTER TABLE locations ADD COLUMN city_key TEXT
+        GENERATED ALWAYS AS (lower(trim(city, ' '))) VIRTUAL
+    """)
+    cursor.execute("""
+        ALTER TABLE locations ADD COLUMN cuisine_key TEXT
+        GENERATED ALWAYS AS (lower(trim(cuisine, ' '))) VIRTUAL
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_locations_city_cuisine
+        ON locations(city_key, cuisine_key, avg_rating DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_locations_city
+        ON locations(city_key, avg_rating DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_locations_cuisine
+        ON locations(cuisine_key, avg_rating DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_locations_rating
+        ON locations(avg_rating DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_slot
+        ON reservations(location_id, date, time, status, party_size)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_status
+        ON reservations(status, party_size)
+    """)
+
+
+def _v3_data_version(cursor: sqlite3.Cursor):
+    """Counter bumped by every availability-changing write, for cache invalidation"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+
+
+def _v4_location_change_log(cursor: sqlite3.Cursor):
+    """Append-only log of changed location ids, so in-memory catalogs refresh incrementally"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS location_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            location_id TEXT NOT NULL
+        )
+    """)
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_locations_{event.lower()}
+            AFTER {event} ON locations
+            BEGIN
+                INSERT INTO location_changes (location_id) VALUES ({row}.location_id);
+            END
+        """)
+    # An id change on UPDATE must also refresh the old id
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_locations_rename
+        AFTER UPDATE OF location_id ON locations
+        WHEN OLD.location_id <> NEW.location_id
+        BEGIN
+            INSERT INTO location_changes (location_id) VALUES (OLD.location_id);
+        END
+    """)
+
+
+def _v5_coordinates(cursor: sqlite3.Cursor):
+    """Latitude/longitude per location; existing rows are placed near their city center"""
+    cursor.execute("ALTER TABLE locations ADD COLUMN latitude REAL")
+    cursor.execute("ALTER TABLE locations ADD COLUMN longitude REAL")
+    rows = cursor.execute("SELECT location_id, city FROM locations").fetchall()
+    cursor.executemany(
+        "UPDATE locations SET latitude = ?, longitude = ? WHERE location_id = ?",
+        [(*scatter_coordinates(location_id, city), location_id) for location_id, city in rows],
+    )
+
+
+def _v6_guest_history_index(cursor: sqlite3.Cursor):
+    """Per-guest booking history lookups for no-show scoring"""
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_guest
+        ON reservations(customer_phone, status)
+    """)
+
+
+# Reservations that count as realized demand: held through their date, shown up or not
+DEMAND_STATUSES = "('completed', 'no_show')"
+
+
+def _weekday_sql(column: str) -> str:
+    """Monday=0 .. Sunday=6 of a YYYY-MM-DD column"""
+    return f"((CAST(strftime('%w', {column}) AS INTEGER) + 6) % 7)"
+
+
+def _week_sql(column: str) -> str:
+    """Monday-based week number since 1970 of a YYYY-MM-DD column"""
+    return f"CAST((julianday({column}) - 2440587.5 + 3) / 7 AS INTEGER)"
+
+
+def _demand_delta_sql(row: str, sign: str) -> str:
+    """Trigger body adding (sign "+") or removing (sign "-") one reservation from the demand aggregates"""
+    return f"""
+        INSERT INTO demand_profile (location_id, weekday, time, covers, reservations)
+        VALUES ({row}.location_id, {_weekday_sql(row + ".date")}, {row}.time,
+                {sign}{row}.party_size, {sign}1)
+        ON CONFLICT(location_id, weekday, time) DO UPDATE SET
+            covers = covers + excluded.covers, reservations = reservations + excluded.reservations;
+        INSERT INTO demand_weekly (location_id, week, covers)
+        VALUES ({row}.location_id, {_week_sql(row + ".date")}, {sign}{row}.party_size)
+        ON CONFLICT(location_id, week) DO UPDATE SET covers = covers + excluded.covers;
+        INSERT INTO demand_changes (location_id) VALUES ({row}.location_id);
+    """
+
+
+def rebuild_demand_aggregates(cursor: sqlite3.Cursor):
+    """Recompute the demand aggregates from reservations; logs a full-refresh marker ("*")"""
+    cursor.execute("DELETE FROM demand_profile")
+    cursor.execute("DELETE FROM demand_weekly")
+    cursor.execute(f"""
+        INSERT INTO demand_profile (location_id, weekday, time, covers, reservations)
+        SELECT location_id, {_weekday_sql("date")}, time, SUM(party_size), COUNT(*)
+        FROM reservations WHERE status IN {DEMAND_STATUSES}
+        GROUP BY 1, 2, 3
+    """)
+    cursor.execute(f"""
+        INSERT INTO demand_weekly (location_id, week, covers)
+        SELECT location_id, {_week_sql("date")}, SUM(party_size)
+        FROM reservations WHERE status IN {DEMAND_STATUSES}
+        GROUP BY 1, 2
+    """)
+    cursor.execute("INSERT INTO demand_changes (location_id) VALUES ('*')")
+
+
+def _v7_demand_aggregates(cursor: sqlite3.Cursor):
+    """Covers per location x weekday x time and per location x week, kept current by triggers"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS demand_profile (
+            location_id TEXT NOT NULL,
+            weekday INTEGER NOT NULL,
+            time TEXT NOT NULL,
+            covers INTEGER NOT NULL DEFAULT 0,
+            reservations INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (location_id, weekday, time)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS demand_weekly (
+            location_id TEXT NOT NULL,
+            week INTEGER NOT NULL,
+            covers INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (location_id, week)
+        ) WITHOUT ROWID
+    """)
+    # Locations whose aggregates changed, so forecasters reload only those
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS demand_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            location_id TEXT NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_demand_insert
+        AFTER INSERT ON reservations WHEN NEW.status IN {DEMAND_STATUSES}
+        BEGIN {_demand_delta_sql("NEW", "+")} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_demand_delete
+        AFTER DELETE ON reservations WHEN OLD.status IN {DEMAND_STATUSES}
+        BEGIN {_demand_delta_sql("OLD", "-")} END
+    """)
+    # An update moves the reservation: out of its old cell, into its new one
+    for name, row, sign in (("trg_demand_update_old", "OLD", "-"), ("trg_demand_update_new", "NEW", "+")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}
+            AFTER UPDATE OF location_id, date, time, party_size, status ON reservations
+            WHEN {row}.status IN {DEMAND_STATUSES}
+            BEGIN {_demand_delta_sql(row, sign)} END
+        """)
+    rebuild_demand_aggregates(cursor)
+
+
+def _v8_change_log_readers(cursor: sqlite3.Cursor):
+    """How far each location catalog has read the change log, so read entries can be pruned"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_log_readers (
+            reader TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            seen_at REAL NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_readers_seq ON change_log_readers(seq)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_readers_seen ON change_log_readers(seen_at)")
+
+
+# Ordered (version, description, upgrade) entries - append only, never edit
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "base schema and slot occupancy ledger", _v1_base_schema),
+    (2, "lookup keys and secondary indexes", _v2_lookup_keys_and_indexes),
+    (3, "data version counter", _v3_data_version),
+    (4, "location change log", _v4_location_change_log),
+    (5, "location coordinates", _v5_coordinates),
+    (6, "guest history index", _v6_guest_history_index),
+    (7, "demand aggregates", _v7_demand_aggregates),
+    (8, "change log readers", _v8_change_log_readers),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the schema version recorded in the database file"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply every pending migration, each in its own transaction"""
+    current = get_schema_version(conn)
+
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {current} is newer than this code supports ({SCHEMA_VERSION})"
+        )
+
+    for version, _description, upgrade in MIGRATIONS:
+        if version <= current:
+            continue
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            # Another process may have applied it while we waited for the lock
+            current = get_schema_version(conn)
+            if version <= current:
+                conn.rollback()
+                continue
+            upgrade(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+
+    return current
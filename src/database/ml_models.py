@@ -2,48 +2,132 @@
 ML Models for recommendations and predictions
 """
 
-import random
-from typing import Dict, List, Any, Optional
+import os
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.database.catalog import PRICE_TIERS, CatalogSnapshot, LocationCatalog
+from src.database.facets import FacetIndex
+from src.database.no_show import NoShowModel, customer_history, upcoming_reservations, weekdays
+
+
+def _weights_from_env() -> Dict[str, float]:
+    """RECOMMENDATION_WEIGHTS="rating=0.4,price_match=0.1" overrides"""
+    pairs = [item.split("=", 1) for item in os.getenv("RECOMMENDATION_WEIGHTS", "").split(",") if "=" in item]
+    return {name.strip(): float(value) for name, value in pairs}
 
 
 class NoShowPredictor:
     """Predicts probability of reservation no-show"""
     
+    # Risk above which a booking is flagged
+    HIGH_RISK = 0.3
+    
+    def __init__(self, db=None, model: Optional[NoShowModel] = None, model_path: Optional[str] = None):
+        """db supplies guest history; the fitted model is read from model_path / NO_SHOW_MODEL_PATH if present"""
+        self.db = db
+        if model is None:
+            path = model_path or self.default_model_path()
+            if os.path.exists(path):
+                model = NoShowModel.load(path)
+        # Without a fitted model the hand-tuned rules apply
+        self.model = model
+    
+    @staticmethod
+    def default_model_path() -> str:
+        """Where the fitted artifact lives (see python -m src.database.no_show)"""
+        return os.getenv("NO_SHOW_MODEL_PATH", "no_show_model.json")
+    
     def predict_risk(
         self,
         party_size: int,
         advance_days: int,
         occasion: str = "casual",
-        customer_phone: Optional[str] = None
+        customer_phone: Optional[str] = None,
+        date: Optional[str] = None
     ) -> float:
         """Predict no-show probability (0-1)"""
-        risk_score = 0.20  # Base 20% no-show rate
-        
-        # Adjust based on factors
-        if party_size <= 2:
-            risk_score -= 0.05
-        elif party_size >= 8:
-            risk_score += 0.15
-        
-        if advance_days <= 1:
-            risk_score += 0.20
-        elif advance_days >= 14:
-            risk_score -= 0.10
-        
-        if "romantic" in occasion.lower() or "anniversary" in occasion.lower():
-            risk_score -= 0.15
-        elif "business" in occasion.lower():
-            risk_score -= 0.05
-        
-        return max(0.0, min(1.0, risk_score))
+        return float(self.predict_risk_batch(
+            [party_size], [advance_days], [occasion],
+            weekday=weekdays([date]) if date else None,
+            customer_phone=[customer_phone] if customer_phone else None
+        )[0])
+    
+    def predict_risk_batch(
+        self,
+        party_size: Sequence[int],
+        advance_days: Sequence[int],
+        occasion: Optional[Sequence[Optional[str]]] = None,
+        weekday: Optional[Sequence[int]] = None,
+        customer_phone: Optional[Sequence[Optional[str]]] = None,
+        history: Optional[Tuple[Sequence[int], Sequence[int]]] = None
+    ) -> np.ndarray:
+        """No-show probabilities for arrays of reservations in one pass
+        
+        weekday is Monday=0..Sunday=6 (-1 if unknown). Guest history is looked up
+        for customer_phone when the predictor has a database, unless history
+        gives (no-shows, finished visits) per reservation directly.
+        """
+        if self.model is None:
+            return self._rule_risk(party_size, advance_days, occasion)
+        
+        no_shows = visits = None
+        if history is not None:
+            no_shows, visits = history
+        elif customer_phone is not None and self.db is not None:
+            known = customer_history(self.db.conn, customer_phone)
+            no_shows = [known.get(phone, (0, 0))[0] for phone in customer_phone]
+            visits = [known.get(phone, (0, 0))[1] for phone in customer_phone]
+        return self.model.predict(party_size, advance_days, occasion, weekday, no_shows, visits)
+    
+    def score_upcoming(self, today: Optional[str] = None) -> Dict[str, float]:
+        """Risk of every confirmed reservation from today (YYYY-MM-DD) on, by confirmation number"""
+        if self.db is None:
+            raise ValueError("Scoring upcoming reservations needs a database")
+        upcoming = upcoming_reservations(self.db.conn, today)
+        risks = self.predict_risk_batch(
+            upcoming["party_size"], upcoming["advance_days"], upcoming["occasion"], upcoming["weekday"],
+            history=(upcoming["no_shows"], upcoming["visits"])
+        )
+        return dict(zip(upcoming["confirmation_numbers"], risks.tolist()))
+    
+    @staticmethod
+    def _rule_risk(party_size, advance_days, occasion) -> np.ndarray:
+        """Hand-tuned fallback: 20% base rate adjusted for party size, lead time and occasion"""
+        party = np.atleast_1d(np.asarray(party_size))
+        lead = np.broadcast_to(np.asarray(advance_days), party.shape)
+        if occasion is None or isinstance(occasion, str):
+            occasion = [occasion] * len(party)
+        occasion = [(o or "casual").lower() for o in occasion]
+        
+        risk = np.full(len(party), 0.20)
+        risk += np.select([party <= 2, party >= 8], [-0.05, 0.15], 0.0)
+        risk += np.select([lead <= 1, lead >= 14], [0.20, -0.10], 0.0)
+        risk += [-0.15 if "romantic" in o or "anniversary" in o else -0.05 if "business" in o else 0.0
+                 for o in occasion]
+        return np.clip(risk, 0.0, 1.0)
 
 
 class RecommendationEngine:
     """Generates personalized restaurant recommendations"""
     
-    def __init__(self, db):
-        """Initialize with database"""
+    # Score = base + rating/5 * rating weight + price weight if the price tier matches
+    DEFAULT_WEIGHTS = {"base": 0.5, "rating": 0.3, "price_match": 0.2}
+    
+    def __init__(self, db, weights: Optional[Dict[str, float]] = None):
+        """Initialize with database (weights override DEFAULT_WEIGHTS / RECOMMENDATION_WEIGHTS)"""
         self.db = db
+        self.weights = {**self.DEFAULT_WEIGHTS, **_weights_from_env(), **(weights or {})}
+        # Share the database's catalog and facet index when it has them
+        self.catalog = getattr(db, "catalog", None)
+        if self.catalog is None:
+            self.catalog = LocationCatalog(db)
+        self.facets = getattr(db, "facets", None)
+        if self.facets is None:
+            self.facets = FacetIndex(self.catalog)
+        # (catalog snapshot, its tier scores)
+        self._scored = None
     
     def get_recommendations(
         self,
@@ -51,27 +135,18 @@ class RecommendationEngine:
         cuisine: Optional[str] = None,
         occasion: str = "casual",
         budget: str = "moderate",
-        date: Optional[str] = None
+        date: Optional[str] = None,
+        city: Optional[str] = None,
+        limit: int = 5
     ) -> List[Dict[str, Any]]:
-        """Get personalized restaurant recommendations"""
-        cursor = self.db.conn.cursor()
-        
-        query = "SELECT * FROM locations WHERE 1=1"
-        params = []
-        
-        if cuisine:
-            query += " AND cuisine LIKE ?"
-            params.append(f"%{cuisine}%")
-        
-        query += " ORDER BY avg_rating DESC LIMIT 10"
-        
-        cursor.execute(query, params)
-        locations = cursor.fetchall()
+        """Get personalized restaurant recommendations from the whole catalog"""
+        self.facets.refresh()
         
+        # Rows are read from the snapshot they were ranked in, never a newer one
+        catalog, ranked = self._ranked(party_size, cuisine, budget, city, limit)
         recommendations = []
-        for location in locations:
-            score = self._calculate_score(location, party_size, occasion, budget)
-            
+        for i, score in ranked:
+            location = catalog.rows[i]
             recommendations.append({
                 "location_id": location["location_id"],
                 "name": location["name"],
@@ -83,23 +158,77 @@ class RecommendationEngine:
                 "match_score": round(score, 3),
                 "match_reason": self._get_match_reason(location, cuisine, occasion)
             })
-        
-        recommendations.sort(key=lambda x: x["match_score"], reverse=True)
-        return recommendations[:5]
+        return recommendations
     
-    def _calculate_score(self, location: Dict, party_size: int, occasion: str, budget: str) -> float:
-        """Calculate recommendation score"""
-        score = 0.5
-        
-        # Rating factor
-        score += (location["avg_rating"] / 5.0) * 0.3
-        
-        # Price match
-        budget_map = {"budget": "budget", "moderate": "moderate", "upscale": "upscale"}
-        if location["price_range"] == budget_map.get(budget, "moderate"):
-            score += 0.2
-        
-        return min(1.0, score)
+    def _tier_scores(self, catalog: CatalogSnapshot) -> np.ndarray:
+        """Scores of every row of a catalog snapshot for each budget tier (PRICE_TIERS x rows)"""
+        scored = self._scored
+        if scored is None or scored[0] is not catalog:
+            weights = self.weights
+            base = weights["base"] + catalog.rating * (weights["rating"] / 5.0)
+            matches = catalog.price_tier[None, :] == np.arange(len(PRICE_TIERS))[:, None]
+            scored = (catalog, np.minimum(base[None, :] + matches * weights["price_match"], 1.0))
+            # Published as one pair, so a concurrent caller never pairs scores with another snapshot
+            self._scored = scored
+        return scored[1]
+    
+    def _tier(self, budget: Optional[str]) -> int:
+        """Row of _tier_scores for a budget ("fine dining" and "Fine-Dining" included); default moderate"""
+        budget = (budget or "").strip().lower().replace(" ", "_").replace("-", "_")
+        return PRICE_TIERS.index(budget) if budget in PRICE_TIERS else PRICE_TIERS.index("moderate")
+    
+    def _eligible(self, catalog: CatalogSnapshot, party_size: int, matching: Optional[np.ndarray]) -> np.ndarray:
+        """Hard constraints: live rows that seat the party, among the facet matches if any"""
+        if matching is not None:
+            eligible = np.zeros(len(catalog.rows), dtype=bool)
+            eligible[matching] = True
+            # The lookup may predate the snapshot, so a row it returned can since have closed
+            return eligible & catalog.active & (catalog.capacity >= party_size)
+        return catalog.active & (catalog.capacity >= party_size)
+    
+    def score_catalog(self, party_size: int, cuisine: Optional[str] = None, budget: Optional[str] = "moderate",
+                      city: Optional[str] = None) -> np.ndarray:
+        """Score every catalog row in one pass; rows that cannot match score -inf"""
+        matching = self.facets.lookup(cuisine=cuisine, city=city, refresh=False) if cuisine or city else None
+        # Taken after the lookup, so it covers every row the lookup returned
+        catalog = self.catalog.snapshot
+        scores = self._tier_scores(catalog)[self._tier(budget)].copy()
+        scores[~self._eligible(catalog, party_size, matching)] = -np.inf
+        return scores
+    
+    def top_k(self, party_size: int, cuisine: Optional[str] = None, budget: Optional[str] = "moderate",
+              city: Optional[str] = None, k: int = 5) -> List[tuple]:
+        """(row index, score) of the k best rows, best first; ties go to the higher rating"""
+        return self._ranked(party_size, cuisine, budget, city, k)[1]
+    
+    def _ranked(self, party_size: int, cuisine: Optional[str], budget: Optional[str], city: Optional[str],
+                k: int) -> Tuple[CatalogSnapshot, List[tuple]]:
+        """top_k, with the catalog snapshot its row indices refer to"""
+        if cuisine or city:
+            # Facet lists are short: score just the matching rows
+            rows = self.facets.lookup(cuisine=cuisine, city=city, refresh=False)
+        # Taken after the lookup, so it covers every row the lookup returned
+        catalog = self.catalog.snapshot
+        scores = self._tier_scores(catalog)[self._tier(budget)]
+        if cuisine or city:
+            rows = rows[catalog.active[rows] & (catalog.capacity[rows] >= party_size)]
+            pool = scores[rows]
+        else:
+            eligible = catalog.active & (catalog.capacity >= party_size)
+            if eligible.all():
+                rows, pool = None, scores
+            else:
+                rows = np.flatnonzero(eligible)
+                pool = scores[rows]
+        k = min(k, len(pool))
+        if k <= 0:
+            return catalog, []
+        # Partial sort: only the k winners get fully ordered
+        candidates = np.argpartition(pool, len(pool) - k)[len(pool) - k:]
+        if rows is not None:
+            candidates = rows[candidates]
+        order = np.lexsort((candidates, -catalog.rating[candidates], -scores[candidates]))
+        return catalog, [(int(i), float(scores[i])) for i in candidates[order]]
     
     def _get_match_reason(self, location: Dict, cuisine: Optional[str], occasion: str) -> str:
         """Generate match reason"""
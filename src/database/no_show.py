@@ -0,0 +1,284 @@
+"""
+No-show model fitted from reservation history
+Logistic regression over party size, lead time, occasion, day of week and
+the guest's own no-show record, fitted with NumPy (Newton steps with an L2
+penalty) and saved as a small versioned JSON artifact. Scoring is one
+matrix product for any number of reservations.
+
+    python -m src.database.no_show --db goodfoods.db --out no_show_model.json
+    python -m src.database.no_show --db goodfoods.db --score-upcoming
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Bumped whenever the artifact layout or feature definitions change
+MODEL_FORMAT = 1
+
+# Occasions seen fewer times than this while fitting share the "other" coefficient
+MIN_OCCASION_ROWS = 50
+# Pseudo-visits at the network rate that a guest's own record is blended with
+HISTORY_PRIOR_VISITS = 2.0
+# Parameters bound to the IN (...) list of one history query
+HISTORY_CHUNK = 500
+
+
+def _logit(p):
+    return np.log(p / (1 - p))
+
+
+def weekdays(dates: Sequence[str]) -> np.ndarray:
+    """Monday=0 .. Sunday=6 for YYYY-MM-DD strings (longer timestamps are cut to the date)"""
+    days = np.asarray(dates, dtype="U10").astype("datetime64[D]").astype(np.int64)
+    # 1970-01-01 was a Thursday
+    return (days + 3) % 7
+
+
+def lead_days(dates: Sequence[str], created_at: Sequence[str]) -> np.ndarray:
+    """Whole days between booking and the reservation date, never negative"""
+    booked = np.asarray(created_at, dtype="U10").astype("datetime64[D]")
+    return np.maximum((np.asarray(dates, dtype="U10").astype("datetime64[D]") - booked).astype(np.int64), 0)
+
+
+def _occasion_key(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+@dataclass
+class NoShowModel:
+    """Fitted coefficients plus what is needed to rebuild the feature matrix"""
+    coefficients: Dict[str, float]
+    occasions: List[str]
+    base_rate: float
+    format: int = MODEL_FORMAT
+    trained_rows: int = 0
+    trained_at: Optional[str] = None
+    data_version: Optional[int] = None
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+    @staticmethod
+    def feature_names(occasions: Sequence[str]) -> List[str]:
+        """Columns of the design matrix, in order"""
+        return (["intercept", "party_size", "large_party", "lead_log", "same_day", "lead_month",
+                 "history_rate", "history_visits"]
+                + [f"weekday_{d}" for d in range(7)]
+                + [f"occasion_{o}" for o in occasions] + ["occasion_other"])
+
+    def features(self, party_size, advance_days, occasion=None, weekday=None,
+                 no_shows=None, visits=None) -> np.ndarray:
+        """Design matrix; weekday -1/None and missing history count as unknown"""
+        return build_features(self.occasions, self.base_rate, party_size, advance_days,
+                              occasion, weekday, no_shows, visits)
+
+    def predict(self, *args, **kwargs) -> np.ndarray:
+        """No-show probabilities; arguments as for features()"""
+        names = self.feature_names(self.occasions)
+        weights = np.asarray([self.coefficients.get(name, 0.0) for name in names])
+        X = self.features(*args, **kwargs)
+        # An unknown day of the week gets the average day
+        unknown_day = ~X[:, names.index("weekday_0"):names.index("weekday_6") + 1].any(axis=1)
+        day_weights = weights[names.index("weekday_0"):names.index("weekday_6") + 1]
+        return 1 / (1 + np.exp(-(X @ weights + unknown_day * day_weights.mean())))
+
+    def save(self, path: str):
+        """Write the artifact as JSON"""
+        with open(path, "w") as f:
+            json.dump(asdict(self), f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> "NoShowModel":
+        """Read an artifact written by save(); other formats are rejected"""
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("format") != MODEL_FORMAT:
+            raise ValueError(f"{path} is a format {data.get('format')} no-show model; expected {MODEL_FORMAT}")
+        return cls(**data)
+
+
+def build_features(occasions: Sequence[str], base_rate: float, party_size, advance_days, occasion=None,
+                   weekday=None, no_shows=None, visits=None) -> np.ndarray:
+    """Design matrix for arrays of reservations (see NoShowModel.feature_names)"""
+    party = np.atleast_1d(np.asarray(party_size, dtype=float))
+    n = len(party)
+    lead = np.broadcast_to(np.asarray(advance_days, dtype=float), (n,)).clip(min=0)
+    no_shows = np.zeros(n) if no_shows is None else np.broadcast_to(np.asarray(no_shows, dtype=float), (n,))
+    visits = np.zeros(n) if visits is None else np.broadcast_to(np.asarray(visits, dtype=float), (n,))
+    # The guest's record shrunk towards the network rate, as a log-odds shift
+    rate = (no_shows + HISTORY_PRIOR_VISITS * base_rate) / (visits + HISTORY_PRIOR_VISITS)
+
+    X = np.zeros((n, len(occasions) + 16))
+    X[:, 0] = 1.0
+    X[:, 1] = party - 3
+    X[:, 2] = party >= 8
+    X[:, 3] = np.log1p(lead)
+    X[:, 4] = lead <= 1
+    X[:, 5] = lead >= 30
+    X[:, 6] = _logit(rate) - _logit(base_rate)
+    X[:, 7] = np.log1p(visits)
+
+    if weekday is not None:
+        days = np.broadcast_to(np.asarray(weekday, dtype=np.int64), (n,))
+        known = (days >= 0) & (days < 7)
+        X[np.flatnonzero(known), 8 + days[known]] = 1.0
+
+    if occasion is None or isinstance(occasion, str):
+        occasion = [occasion] * n
+    # Normalize each distinct raw value once, then map codes to columns in one step
+    codes: Dict[Optional[str], int] = {}
+    raw = np.fromiter((codes.setdefault(o, len(codes)) for o in occasion), dtype=np.int64, count=n)
+    column = {name: 15 + i for i, name in enumerate(occasions)}
+    columns = np.asarray([column.get(_occasion_key(o), 15 + len(occasions)) for o in codes], dtype=np.int64)
+    X[np.arange(n), columns[raw]] = 1.0
+    return X
+
+
+def fit_logistic(X: np.ndarray, y: np.ndarray, l2: float = 1.0, iterations: int = 25,
+                 tolerance: float = 1e-6) -> np.ndarray:
+    """L2-penalized logistic regression by Newton's method; the intercept (column 0) is not penalized"""
+    penalty = np.full(X.shape[1], l2)
+    penalty[0] = 0.0
+    weights = np.zeros(X.shape[1])
+    weights[0] = _logit(np.clip(y.mean(), 1e-4, 1 - 1e-4))
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-(X @ weights)))
+        gradient = X.T @ (y - p) - penalty * weights
+        hessian = (X * (p * (1 - p))[:, None]).T @ X + np.diag(penalty) + 1e-9 * np.eye(X.shape[1])
+        step = np.linalg.solve(hessian, gradient)
+        weights += step
+        if np.abs(step).max() < tolerance:
+            break
+    return weights
+
+
+def prior_history(phones: np.ndarray, dates: np.ndarray, no_show: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(no-shows, finished visits) each guest had before each reservation, so fitting never sees the future"""
+    _, guest = np.unique(phones, return_inverse=True)
+    order = np.lexsort((dates, guest))
+    sorted_guest = guest[order]
+    starts = np.r_[True, sorted_guest[1:] != sorted_guest[:-1]]
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+    # Exclusive running totals, restarted at each guest
+    before = np.cumsum(no_show[order]) - no_show[order]
+    no_shows, visits = np.empty(len(order)), np.empty(len(order))
+    no_shows[order] = before - before[first]
+    visits[order] = np.arange(len(order)) - first
+    return no_shows, visits
+
+
+def customer_history(conn: sqlite3.Connection, phones: Iterable[Optional[str]]) -> Dict[str, Tuple[int, int]]:
+    """phone -> (no-shows, finished visits) for the given guests"""
+    phones = list(dict.fromkeys(p for p in phones if p))
+    history = {}
+    for start in range(0, len(phones), HISTORY_CHUNK):
+        chunk = phones[start:start + HISTORY_CHUNK]
+        history.update((phone, (int(n), int(v))) for phone, n, v in conn.execute(f"""
+            SELECT customer_phone, SUM(status = 'no_show'), COUNT(*) FROM reservations
+            WHERE customer_phone IN ({", ".join("?" * len(chunk))}) AND status IN ('completed', 'no_show')
+            GROUP BY customer_phone
+        """, chunk))
+    return history
+
+
+def fit_no_show_model(conn: sqlite3.Connection, l2: float = 1.0,
+                      data_version: Optional[int] = None) -> NoShowModel:
+    """Fit on every completed or no-show reservation; raises ValueError without enough history"""
+    rows = conn.execute("""
+        SELECT customer_phone, date, COALESCE(created_at, date), party_size, occasion, status
+        FROM reservations WHERE status IN ('completed', 'no_show')
+    """).fetchall()
+    if not rows:
+        raise ValueError("No finished reservations to fit a no-show model on")
+    phones, dates, created, party, occasion, status = zip(*rows)
+    y = (np.asarray(status) == "no_show").astype(float)
+    if y.min() == y.max():
+        raise ValueError("Reservation history needs both completed reservations and no-shows")
+
+    dates = np.asarray(dates, dtype="U10")
+    counts: Counter = Counter()
+    for value, count in Counter(occasion).items():
+        counts[_occasion_key(value)] += count
+    occasions = sorted(key for key, count in counts.items() if count >= MIN_OCCASION_ROWS)
+    base_rate = float(y.mean())
+    no_shows, visits = prior_history(np.asarray(phones), dates, y)
+
+    X = build_features(occasions, base_rate, party, lead_days(dates, created), occasion, weekdays(dates),
+                       no_shows, visits)
+    weights = fit_logistic(X, y, l2=l2)
+    p = 1 / (1 + np.exp(-(X @ weights)))
+    log_loss = -np.mean(y * np.log(p) + (1 - y) * np.log(1 - p))
+    baseline = -(base_rate * math.log(base_rate) + (1 - base_rate) * math.log(1 - base_rate))
+    return NoShowModel(
+        coefficients={name: round(float(w), 6) for name, w in zip(NoShowModel.feature_names(occasions), weights)},
+        occasions=occasions,
+        base_rate=round(base_rate, 6),
+        trained_rows=len(y),
+        trained_at=datetime.now().isoformat(timespec="seconds"),
+        data_version=data_version,
+        metrics={"log_loss": round(float(log_loss), 5), "baseline_log_loss": round(baseline, 5)},
+    )
+
+
+def upcoming_reservations(conn: sqlite3.Connection, today: Optional[str] = None) -> Dict[str, Any]:
+    """Columns of every confirmed reservation from today (YYYY-MM-DD) on, with each guest's history"""
+    rows = conn.execute("""
+        SELECT u.confirmation_number, u.date, COALESCE(u.created_at, u.date), u.party_size, u.occasion,
+               (SELECT COUNT(*) FROM reservations h
+                WHERE h.customer_phone = u.customer_phone AND h.status = 'no_show'),
+               (SELECT COUNT(*) FROM reservations h
+                WHERE h.customer_phone = u.customer_phone AND h.status IN ('completed', 'no_show'))
+        FROM reservations u
+        WHERE u.status = 'confirmed' AND u.date >= ?
+    """, (today or date.today().isoformat(),)).fetchall()
+    numbers, dates, created, party, occasion, no_shows, visits = zip(*rows) if rows else [()] * 7
+    return {
+        "confirmation_numbers": list(numbers),
+        "party_size": np.asarray(party, dtype=float),
+        "advance_days": lead_days(dates, created),
+        "occasion": list(occasion),
+        "weekday": weekdays(dates),
+        "no_shows": np.asarray(no_shows, dtype=float),
+        "visits": np.asarray(visits, dtype=float),
+    }
+
+
+def main():
+    """Command-line entry point"""
+    from src.database.ml_models import NoShowPredictor
+    from src.database.restaurant_db import RestaurantDatabase
+
+    parser = argparse.ArgumentParser(description="Fit the no-show model from reservation history")
+    parser.add_argument("--db", required=True, help="database to read")
+    parser.add_argument("--out", help="artifact path (default: NO_SHOW_MODEL_PATH)")
+    parser.add_argument("--l2", type=float, default=1.0, help="L2 penalty on non-intercept coefficients")
+    parser.add_argument("--score-upcoming", action="store_true",
+                        help="score every upcoming reservation with the saved model instead of fitting")
+    parser.add_argument("--today", help="first date to score, YYYY-MM-DD (default: today)")
+    args = parser.parse_args()
+
+    db = RestaurantDatabase(args.db)
+    started = time.perf_counter()
+    if args.score_upcoming:
+        predictor = NoShowPredictor(db, model_path=args.out)
+        scores = predictor.score_upcoming(args.today)
+        high = sum(risk > NoShowPredictor.HIGH_RISK for risk in scores.values())
+        print(f"Scored {len(scores):,} upcoming reservations in {time.perf_counter() - started:.2f}s; "
+              f"{high:,} high risk")
+        return
+    model = fit_no_show_model(db.conn, l2=args.l2, data_version=db.get_data_version())
+    path = args.out or NoShowPredictor.default_model_path()
+    model.save(path)
+    print(f"Fitted on {model.trained_rows:,} reservations in {time.perf_counter() - started:.2f}s "
+          f"(log loss {model.metrics['log_loss']} vs {model.metrics['baseline_log_loss']} baseline) -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,118 +3,128 @@ Restaurant Database - SQLite implementation
 Manages 87+ restaurant locations and reservations
 """
 
+import os
 import sqlite3
 import random
 import string
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+import numpy as np
+
+from src.database.catalog import LocationCatalog
+from src.database.connection import ConnectionPool
+from src.database.entity_resolver import EntityResolver
+from src.database.facets import FacetIndex
+from src.database.forecast import DemandForecaster, demand_level
+from src.database.generator import GeneratorConfig, generate_locations, insert_locations
+from src.database.migrations import migrate, normalize_key
+from src.database.spatial import SpatialIndex
+from src.database.text_search import BM25Index
+
 
 class RestaurantDatabase:
     """SQLite database for restaurant reservation system"""
     
-    def __init__(self, db_path: str = "goodfoods.db"):
+    def __init__(self, db_path: str = "goodfoods.db", pragmas: Optional[Dict[str, Any]] = None):
         """Initialize database"""
         self.db_path = db_path
-        self.conn = None
+        self.pragmas = pragmas
+        self.pool = None
         self.init_database()
     
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Read connection for the calling thread"""
+        return self.pool.reader()
+    
     def init_database(self):
         """Initialize database tables and populate data"""
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        cursor = self.conn.cursor()
-        
-        # Locations table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS locations (
-                location_id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                address TEXT NOT NULL,
-                city TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                cuisine TEXT NOT NULL,
-                seating_capacity INTEGER NOT NULL,
-                avg_rating REAL DEFAULT 4.5,
-                price_range TEXT DEFAULT 'moderate',
-                hours_open TEXT DEFAULT '11:00',
-                hours_close TEXT DEFAULT '23:00',
-                special_features TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        self.pool = ConnectionPool(self.db_path, self.pragmas)
         
-        # Reservations table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS reservations (
-                confirmation_number TEXT PRIMARY KEY,
-                location_id TEXT NOT NULL,
-                date TEXT NOT NULL,
-                time TEXT NOT NULL,
-                party_size INTEGER NOT NULL,
-                customer_name TEXT NOT NULL,
-                customer_phone TEXT NOT NULL,
-                customer_email TEXT,
-                special_requests TEXT,
-                occasion TEXT,
-                status TEXT DEFAULT 'confirmed',
-                table_number TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(location_id) REFERENCES locations(location_id)
-            )
-        """)
-        
-        self.conn.commit()
+        # Create or upgrade the schema in place
+        migrate(self.pool.writer_connection)
         
         # Populate if empty
-        cursor.execute("SELECT COUNT(*) as count FROM locations")
-        if cursor.fetchone()["count"] == 0:
-            self._populate_locations()
+        self._populate_locations()
+        
+        # In-memory location columns and facet lists, refreshed from the change log
+        self.catalog = LocationCatalog(self)
+        self.facets = FacetIndex(self.catalog)
+        self.text_index = BM25Index(self.catalog)
+        self.resolver = EntityResolver(self.catalog)
+        self.spatial = SpatialIndex(self.catalog)
+        self.demand = DemandForecaster(self, self.catalog)
     
     def _populate_locations(self):
         """Populate 87 restaurant locations"""
+        with self.pool.write() as conn:
+            # Checked under the write lock so concurrent starts insert once
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) as count FROM locations")
+            if cursor.fetchone()["count"] == 0:
+                self._insert_sample_locations(cursor)
+    
+    def _insert_sample_locations(self, cursor):
+        """Insert the 87 seeded sample locations (caller owns the transaction)"""
+        config = GeneratorConfig(locations=87, seed=int(os.getenv("SAMPLE_DATA_SEED", "0")))
+        insert_locations(cursor, generate_locations(config))
+    
+    def rebuild_slot_occupancy(self):
+        """Recompute the slot occupancy ledger from confirmed reservations"""
+        with self.pool.write() as conn:
+            conn.execute("DELETE FROM slot_occupancy")
+            conn.execute("""
+                INSERT INTO slot_occupancy (location_id, date, time, booked_covers, reservation_count)
+                SELECT location_id, date, time, SUM(party_size), COUNT(*)
+                FROM reservations
+                WHERE status = 'confirmed'
+                GROUP BY location_id, date, time
+            """)
+            self._bump_data_version(conn.cursor())
+    
+    def get_data_version(self) -> int:
+        """Counter that changes whenever availability data changes"""
         cursor = self.conn.cursor()
-        
-        # Base restaurant data
-        cuisines = ["Italian", "Japanese", "French", "Indian", "Chinese", "Mexican", "Thai", 
-                   "Korean", "Spanish", "American", "Mediterranean", "Turkish", "Vietnamese",
-                   "Greek", "Brazilian", "Lebanese", "Malaysian", "Moroccan"]
-        
-        # Real US cities
-        cities = ["San Francisco", "New York", "Los Angeles", "Chicago", "Austin", 
-                 "Seattle", "Miami", "Boston"]
-        
-        restaurant_types = ["Kitchen", "Bistro", "Table", "House", "Restaurant", "Grill",
-                          "Tavern", "Lounge", "Bar & Grill", "Eatery"]
-        
-        price_ranges = ["budget", "moderate", "upscale", "fine_dining"]
-        
-        for i in range(1, 88):
-            location_id = f"LOC{i:03d}"
-            cuisine = random.choice(cuisines)
-            city = random.choice(cities)
-            restaurant_type = random.choice(restaurant_types)
-            
-            name = f"{cuisine} {restaurant_type}"
-            if i <= 10:
-                # Premium locations
-                name = f"The {cuisine} {restaurant_type}"
-            
-            address = f"{random.randint(100, 9999)} {random.choice(['Main', 'Oak', 'Elm', 'Market', 'Grand'])} St"
-            phone = f"555-{random.randint(1000, 9999)}"
-            capacity = random.randint(40, 150)
-            rating = round(3.5 + random.random() * 1.5, 1)
-            price = random.choice(price_ranges)
-            
-            cursor.execute("""
-                INSERT INTO locations (
-                    location_id, name, address, city, phone, cuisine, seating_capacity,
-                    avg_rating, price_range, special_features
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (location_id, name, address, city, phone, cuisine, capacity, rating, price, ""))
-        
-        self.conn.commit()
+        cursor.execute("SELECT version FROM data_version WHERE id = 1")
+        return cursor.fetchone()["version"]
+    
+    def _bump_data_version(self, cursor):
+        """Mark availability data as changed (caller owns the transaction)"""
+        cursor.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+    
+    def _adjust_occupancy(self, cursor, location_id: str, date: str, time: str,
+                          covers: int, count: int):
+        """Apply a delta to one ledger slot (caller owns the transaction)"""
+        self._bump_data_version(cursor)
+        cursor.execute("""
+            INSERT INTO slot_occupancy (location_id, date, time, booked_covers, reservation_count)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(location_id, date, time) DO UPDATE SET
+                booked_covers = booked_covers + excluded.booked_covers,
+                reservation_count = reservation_count + excluded.reservation_count
+        """, (location_id, date, time, covers, count))
+    
+    def _check_capacity(self, cursor, location_id: str, date: str, time: str, party_size: int):
+        """Raise if the slot cannot seat another party of this size"""
+        cursor.execute("""
+            SELECT l.seating_capacity - COALESCE(o.booked_covers, 0) as available
+            FROM locations l
+            LEFT JOIN slot_occupancy o ON o.location_id = l.location_id
+                AND o.date = ? AND o.time = ?
+            WHERE l.location_id = ?
+        """, (date, time, location_id))
+        row = cursor.fetchone()
+        if not row:
+            raise ValueError(f"Location {location_id} not found")
+        if row["available"] < party_size:
+            raise ValueError(
+                f"Location {location_id} has only {row['available']} seats left on {date} at {time}"
+            )
+    
+    # Slots returned per search, best rated first
+    SLOT_LIMIT = 20
     
     def get_available_slots(
         self,
@@ -126,53 +136,322 @@ class RestaurantDatabase:
         city: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """Get available reservation slots"""
+        # Location filters resolve in memory; SQLite is only asked for the ledger
+        cuisine, city = self._facet_filters(cuisine, city)
+        candidates = self.facets.lookup(cuisine=cuisine, city=city)
+        # Taken after the lookup, so it covers every row the lookup returned
+        catalog = self.catalog.snapshot
+        if location_id:
+            row = catalog.index.get(location_id)
+            candidates = candidates[candidates == row] if row is not None else candidates[:0]
+        
+        found = []
+        for i, available in self._open_rows(catalog, candidates, date, time, party_size):
+            found.append((i, available))
+            if len(found) == self.SLOT_LIMIT:
+                break
+        
+        slots = []
+        for (i, available), demand in zip(found, self._demand_levels(catalog, found, date, time)):
+            row = catalog.rows[i]
+            slots.append({
+                "location_id": row["location_id"],
+                "restaurant_name": row["name"],
+                "cuisine": row["cuisine"],
+                "address": row["address"],
+                "city": row["city"],
+                "rating": row["avg_rating"],
+                "price_range": row["price_range"],
+                "available_capacity": available,
+                "demand": demand
+            })
+        return slots
+    
+    def _facet_filters(self, cuisine: Optional[str], city: Optional[str]) -> tuple:
+        """cuisine and city as filters match them: exact keys as given, anything else as the
+        resolver reads it (alias, typo, or part of one name such as "york")"""
+        catalog = self.catalog.current()
+        if cuisine and catalog.cuisines.get(cuisine) is None:
+            cuisine = self.resolver.resolve_cuisine(cuisine) or cuisine
+        if city and catalog.cities.get(city) is None:
+            city = self.resolver.resolve_city(city) or city
+        return cuisine, city
+    
+    def _demand_levels(self, catalog, found, date: str, time: str) -> List[str]:
+        """Expected demand level for (catalog row, available covers) pairs at one slot"""
+        if not found:
+            return []
+        rows = np.asarray([i for i, _ in found])
+        capacity = np.maximum(catalog.capacity[rows], 1)
+        booked = capacity - np.asarray([available for _, available in found])
+        occupancy = np.maximum(self.demand.expected_covers(rows, date, time), booked) / capacity
+        return [demand_level(value)[0] for value in occupancy.tolist()]
+    
+    def _open_rows(self, catalog, candidates, date: str, time: str, party_size: int):
+        """Yield (catalog row index, available covers) for candidates that fit party_size, in candidate order"""
         cursor = self.conn.cursor()
+        chunk_size = self.SLOT_LIMIT * 2
+        for start in range(0, len(candidates), chunk_size):
+            # Callers stop early, so usually only the first chunk reaches the ledger
+            chunk = candidates[start:start + chunk_size]
+            chunk = chunk[catalog.capacity[chunk] >= party_size]
+            if not len(chunk):
+                continue
+            ids = [catalog.rows[i]["location_id"] for i in chunk]
+            cursor.execute(f"""
+                SELECT location_id, booked_covers FROM slot_occupancy
+                WHERE location_id IN ({", ".join("?" * len(ids))}) AND date = ? AND time = ?
+            """, ids + [date, time])
+            booked = dict(cursor.fetchall())
+            
+            for i, location_id in zip(chunk, ids):
+                available = catalog.rows[i]["seating_capacity"] - booked.get(location_id, 0)
+                if available >= party_size:
+                    yield i, available
+    
+    def search_restaurants(
+        self,
+        query: str,
+        city: Optional[str] = None,
+        cuisine: Optional[str] = None,
+        party_size: Optional[int] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Free-text search over name, cuisine, city, price range and features, BM25-ranked"""
+        if not query or not query.strip():
+            raise ValueError("Search query must not be empty")
+        
+        candidates = None
+        if city or cuisine or party_size:
+            cuisine, city = self._facet_filters(cuisine, city)
+            candidates = self.facets.lookup(cuisine=cuisine, city=city)
+            if party_size:
+                candidates = candidates[self.catalog.snapshot.capacity[candidates] >= party_size]
+        
+        results = []
+        for i, score in self.text_index.search(query, candidates, limit):
+            row = self.catalog.snapshot.rows[i]
+            results.append({
+                "location_id": row["location_id"],
+                "name": row["name"],
+                "cuisine": row["cuisine"],
+                "address": row["address"],
+                "city": row["city"],
+                "rating": row["avg_rating"],
+                "price_range": row["price_range"],
+                "special_features": row["special_features"] or "",
+                "score": round(score, 3)
+            })
+        return results
+    
+    def find_nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: Optional[float] = None,
+        limit: int = 10,
+        cuisine: Optional[str] = None,
+        date: Optional[str] = None,
+        time: Optional[str] = None,
+        party_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Locations nearest a point, optionally within radius_km and with a free table at date/time"""
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError("Coordinates must be a latitude in [-90, 90] and a longitude in [-180, 180]")
+        if radius_km is not None and radius_km <= 0:
+            raise ValueError("Search radius must be positive")
+        if bool(date) != bool(time):
+            raise ValueError("Availability needs both a date and a time")
+        if limit < 1:
+            return []
+        
+        cuisine, _ = self._facet_filters(cuisine, None)
+        matching = self.facets.lookup(cuisine=cuisine) if cuisine else None
+        # Taken after the lookup, so it covers every row the lookup returned
+        catalog = self.catalog.current()
+        eligible = None
+        if cuisine:
+            eligible = np.zeros(len(catalog.rows), dtype=bool)
+            eligible[matching] = True
+        if party_size:
+            fits = catalog.capacity >= party_size
+            eligible = fits if eligible is None else eligible & fits
+        
+        if radius_km is not None:
+            rows, distances = self.spatial.within(latitude, longitude, radius_km, eligible)
+            found = self._nearby_open(catalog, rows, distances, date, time, party_size, limit)
+        else:
+            # Some of the nearest may be fully booked, so widen k until the page fills
+            k, found = limit, []
+            while True:
+                rows, distances = self.spatial.nearest(latitude, longitude, k, eligible)
+                found = self._nearby_open(catalog, rows, distances, date, time, party_size, limit)
+                if len(found) >= limit or len(rows) < k:
+                    break
+                k *= 4
+        
+        demand = self._demand_levels(catalog, [(i, available) for i, _, available in found], date, time) \
+            if date else []
+        results = []
+        for n, (i, distance, available) in enumerate(found):
+            row = catalog.rows[i]
+            result = {
+                "location_id": row["location_id"],
+                "name": row["name"],
+                "cuisine": row["cuisine"],
+                "address": row["address"],
+                "city": row["city"],
+                "rating": row["avg_rating"],
+                "price_range": row["price_range"],
+                "distance_km": round(float(distance), 2)
+            }
+            if available is not None:
+                result["available_capacity"] = available
+                result["demand"] = demand[n]
+            results.append(result)
+        return results
+    
+    def _nearby_open(self, catalog, rows, distances, date, time, party_size, limit):
+        """Up to limit (row, distance, available covers) in distance order; availability only when date is set"""
+        if not date:
+            return [(i, d, None) for i, d in zip(rows[:limit], distances[:limit])]
+        distance_of = dict(zip(rows.tolist(), distances.tolist()))
+        found = []
+        for i, available in self._open_rows(catalog, rows, date, time, party_size or 1):
+            found.append((i, distance_of[i], available))
+            if len(found) == limit:
+                break
+        return found
+    
+    # Bounds that keep one grid query (and its tool payload) small
+    MAX_GRID_DAYS = 14
+    MAX_GRID_CELLS = 400
+    MIN_GRID_GRANULARITY = 15
+    
+    def get_availability_grid(
+        self,
+        start_date: str,
+        end_date: str,
+        time_from: str,
+        time_to: str,
+        party_size: int,
+        granularity_minutes: int = 30,
+        location_id: Optional[str] = None,
+        cuisine: Optional[str] = None,
+        city: Optional[str] = None,
+        limit: int = 10
+    ) -> Dict[str, Any]:
+        """Get a location x slot availability matrix for a date range and time window"""
+        first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+        last_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+        window_start = datetime.strptime(time_from, "%H:%M")
+        window_end = datetime.strptime(time_to, "%H:%M")
+        
+        if last_day < first_day:
+            raise ValueError("end_date must not be before start_date")
+        if window_end < window_start:
+            raise ValueError("time_to must not be before time_from")
+        if granularity_minutes < self.MIN_GRID_GRANULARITY:
+            raise ValueError(f"granularity_minutes must be at least {self.MIN_GRID_GRANULARITY}")
+        
+        days = (last_day - first_day).days + 1
+        if days > self.MAX_GRID_DAYS:
+            raise ValueError(f"Date range is limited to {self.MAX_GRID_DAYS} days")
+        
+        dates = [(first_day + timedelta(days=i)).isoformat() for i in range(days)]
+        times = []
+        slot = window_start
+        while slot <= window_end:
+            times.append(slot.strftime("%H:%M"))
+            slot += timedelta(minutes=granularity_minutes)
+        
+        if len(dates) * len(times) > self.MAX_GRID_CELLS:
+            raise ValueError(
+                f"Grid of {len(dates)} days x {len(times)} slots exceeds {self.MAX_GRID_CELLS} cells"
+            )
         
+        # One pass: candidate locations in rating order, each joined to its
+        # ledger rows for the whole window (keyed range read on the ledger)
         query = """
             SELECT 
-                l.location_id, l.name, l.cuisine, l.address, l.city,
-                l.avg_rating, l.seating_capacity, l.price_range,
-                COUNT(r.confirmation_number) as reserved_count
+                l.location_id, l.name, l.cuisine, l.city, l.avg_rating,
+                l.price_range, l.seating_capacity, l.hours_open, l.hours_close,
+                o.date, o.time, o.booked_covers
             FROM locations l
-            LEFT JOIN reservations r ON l.location_id = r.location_id 
-                AND r.date = ? AND r.time = ? AND r.status = 'confirmed'
-            WHERE 1=1
+            LEFT JOIN slot_occupancy o ON o.location_id = l.location_id
+                AND o.date BETWEEN ? AND ? AND o.time BETWEEN ? AND ?
+            WHERE l.seating_capacity >= ?
         """
-        params = [date, time]
+        params = [dates[0], dates[-1], times[0], times[-1], party_size]
+        cuisine, city = self._facet_filters(cuisine, city)
         
         if location_id:
             query += " AND l.location_id = ?"
             params.append(location_id)
         
         if cuisine:
-            query += " AND l.cuisine LIKE ?"
-            params.append(f"%{cuisine}%")
+            query += " AND l.cuisine_key = ?"
+            params.append(normalize_key(cuisine))
         
         if city:
-            query += " AND l.city LIKE ?"
-            params.append(f"%{city}%")
+            query += " AND l.city_key = ?"
+            params.append(normalize_key(city))
         
-        query += " GROUP BY l.location_id ORDER BY l.avg_rating DESC LIMIT 20"
+        query += " ORDER BY l.avg_rating DESC, l.location_id"
         
+        cursor = self.conn.cursor()
         cursor.execute(query, params)
-        rows = cursor.fetchall()
         
-        slots = []
-        for row in rows:
-            available = row["seating_capacity"] - (row["reserved_count"] * 4)  # Rough estimate
-            if available >= party_size:
-                slots.append({
+        locations = []
+        current = None
+        booked = {}
+        
+        def finish(row, booked):
+            # Seats left per cell; 0 when closed or too full for the party
+            matrix = {}
+            has_availability = False
+            for date in dates:
+                cells = []
+                for time in times:
+                    available = 0
+                    if row["hours_open"] <= time < row["hours_close"]:
+                        available = row["seating_capacity"] - booked.get((date, time), 0)
+                        if available < party_size:
+                            available = 0
+                    has_availability = has_availability or available > 0
+                    cells.append(available)
+                matrix[date] = cells
+            if has_availability:
+                locations.append({
                     "location_id": row["location_id"],
                     "restaurant_name": row["name"],
                     "cuisine": row["cuisine"],
-                    "address": row["address"],
                     "city": row["city"],
                     "rating": row["avg_rating"],
                     "price_range": row["price_range"],
-                    "available_capacity": available
+                    "availability": matrix
                 })
         
-        return slots
+        for row in cursor:
+            if current is None or row["location_id"] != current["location_id"]:
+                if current is not None:
+                    finish(current, booked)
+                    if len(locations) >= limit:
+                        break
+                current = row
+                booked = {}
+            if row["date"] is not None:
+                booked[(row["date"], row["time"])] = row["booked_covers"]
+        else:
+            if current is not None:
+                finish(current, booked)
+        
+        return {
+            "dates": dates,
+            "times": times,
+            "party_size": party_size,
+            "locations": locations[:limit]
+        }
     
     def create_reservation(
         self,
@@ -187,32 +466,36 @@ class RestaurantDatabase:
         occasion: str = ""
     ) -> Dict[str, Any]:
         """Create a new reservation"""
-        cursor = self.conn.cursor()
-        
         # Generate confirmation number
         confirmation_number = f"GF-{''.join(random.choices(string.ascii_uppercase + string.digits, k=8))}"
+        table_number = f"T{random.randint(1, 30)}"
         
-        # Get location details
-        cursor.execute("SELECT name, address FROM locations WHERE location_id = ?", (location_id,))
-        location = cursor.fetchone()
-        
-        if not location:
-            raise ValueError(f"Location {location_id} not found")
-        
-        # Insert reservation
-        cursor.execute("""
-            INSERT INTO reservations (
+        with self.pool.write() as conn:
+            cursor = conn.cursor()
+            
+            # Get location details
+            cursor.execute("SELECT name, address FROM locations WHERE location_id = ?", (location_id,))
+            location = cursor.fetchone()
+            
+            if not location:
+                raise ValueError(f"Location {location_id} not found")
+            
+            self._check_capacity(cursor, location_id, date, time, party_size)
+            
+            # Insert reservation
+            cursor.execute("""
+                INSERT INTO reservations (
+                    confirmation_number, location_id, date, time, party_size,
+                    customer_name, customer_phone, customer_email,
+                    special_requests, occasion, table_number
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
                 confirmation_number, location_id, date, time, party_size,
                 customer_name, customer_phone, customer_email,
                 special_requests, occasion, table_number
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            confirmation_number, location_id, date, time, party_size,
-            customer_name, customer_phone, customer_email,
-            special_requests, occasion, f"T{random.randint(1, 30)}"
-        ))
-        
-        self.conn.commit()
+            ))
+            
+            self._adjust_occupancy(cursor, location_id, date, time, party_size, 1)
         
         return {
             "confirmation_number": confirmation_number,
@@ -222,32 +505,75 @@ class RestaurantDatabase:
             "time": time,
             "party_size": party_size,
             "customer_name": customer_name,
-            "table_number": f"T{random.randint(1, 30)}"
+            "table_number": table_number
         }
     
+    # Columns callers may change through modify_reservation
+    MODIFIABLE_FIELDS = {
+        "date", "time", "party_size", "customer_name", "customer_phone",
+        "customer_email", "special_requests", "occasion", "table_number", "status"
+    }
+    
     def modify_reservation(self, confirmation_number: str, updates: Dict[str, Any]) -> Dict[str, Any]:
         """Modify an existing reservation"""
-        cursor = self.conn.cursor()
-        
-        set_clause = ", ".join([f"{key} = ?" for key in updates.keys()])
-        query = f"UPDATE reservations SET {set_clause} WHERE confirmation_number = ?"
-        params = list(updates.values()) + [confirmation_number]
+        unknown = set(updates) - self.MODIFIABLE_FIELDS
+        if unknown:
+            raise ValueError(f"Cannot modify fields: {', '.join(sorted(unknown))}")
         
-        cursor.execute(query, params)
-        self.conn.commit()
+        with self.pool.write() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT location_id, date, time, party_size, status
+                FROM reservations WHERE confirmation_number = ?
+            """, (confirmation_number,))
+            old = cursor.fetchone()
+            
+            if not old:
+                raise ValueError(f"Reservation {confirmation_number} not found")
+            
+            new = dict(old)
+            new.update(updates)
+            
+            # Move the booked covers from the old slot to the new one
+            if old["status"] == "confirmed":
+                self._adjust_occupancy(cursor, old["location_id"], old["date"], old["time"],
+                                       -old["party_size"], -1)
+            if new["status"] == "confirmed":
+                self._check_capacity(cursor, new["location_id"], new["date"], new["time"],
+                                     new["party_size"])
+                self._adjust_occupancy(cursor, new["location_id"], new["date"], new["time"],
+                                       new["party_size"], 1)
+            
+            if updates:
+                set_clause = ", ".join([f"{key} = ?" for key in updates.keys()])
+                query = f"UPDATE reservations SET {set_clause} WHERE confirmation_number = ?"
+                params = list(updates.values()) + [confirmation_number]
+                cursor.execute(query, params)
         
         return {"success": True, "confirmation_number": confirmation_number}
     
     def cancel_reservation(self, confirmation_number: str, reason: str = "") -> Dict[str, Any]:
         """Cancel a reservation"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE reservations 
-            SET status = 'cancelled'
-            WHERE confirmation_number = ?
-        """, (confirmation_number,))
+        with self.pool.write() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT location_id, date, time, party_size, status
+                FROM reservations WHERE confirmation_number = ?
+            """, (confirmation_number,))
+            reservation = cursor.fetchone()
+            
+            if not reservation:
+                raise ValueError(f"Reservation {confirmation_number} not found")
+            
+            if reservation["status"] == "confirmed":
+                cursor.execute("""
+                    UPDATE reservations 
+                    SET status = 'cancelled'
+                    WHERE confirmation_number = ?
+                """, (confirmation_number,))
+                self._adjust_occupancy(cursor, reservation["location_id"], reservation["date"],
+                                       reservation["time"], -reservation["party_size"], -1)
         
-        self.conn.commit()
         return {"success": True, "confirmation_number": confirmation_number}
     
     def get_location_details(self, location_id: str) -> Dict[str, Any]:
@@ -262,14 +588,49 @@ class RestaurantDatabase:
         return dict(location)
     
     def predict_demand(self, location_id: str, date: str, time: str) -> Dict[str, Any]:
-        """Predict demand (simplified)"""
+        """Expected covers and occupancy for one slot: the seasonal forecast, or the bookings if already higher"""
+        catalog = self.catalog.current()
+        row = catalog.index.get(location_id)
+        if row is None or not catalog.active[row]:
+            raise ValueError(f"Location {location_id} not found")
+        forecast = float(self.demand.expected_covers([row], date, time)[0])
+        
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT booked_covers FROM slot_occupancy WHERE location_id = ? AND date = ? AND time = ?
+        """, (location_id, date, time))
+        booked = cursor.fetchone()
+        booked = booked["booked_covers"] if booked else 0
+        
+        capacity = int(catalog.capacity[row])
+        predicted = max(forecast, booked)
+        occupancy = min(predicted / capacity, 1.0) if capacity else 1.0
+        level, advice = demand_level(occupancy)
         return {
             "location_id": location_id,
-            "occupancy_percent": random.random() * 0.5 + 0.3,
-            "predicted_covers": random.randint(30, 80),
-            "recommendation": "Moderately busy - book soon"
+            "date": date,
+            "time": time,
+            "predicted_covers": round(predicted),
+            "forecast_covers": round(forecast, 1),
+            "booked_covers": booked,
+            "seating_capacity": capacity,
+            "occupancy_percent": round(occupancy, 3),
+            "demand": level,
+            "recommendation": advice
         }
     
+    def get_lookup_values(self) -> Dict[str, List[str]]:
+        """Distinct normalized city and cuisine keys (served from the lookup indexes)"""
+        cursor = self.conn.cursor()
+        
+        cursor.execute("SELECT DISTINCT city_key FROM locations")
+        cities = [row["city_key"] for row in cursor.fetchall()]
+        
+        cursor.execute("SELECT DISTINCT cuisine_key FROM locations")
+        cuisines = [row["cuisine_key"] for row in cursor.fetchall()]
+        
+        return {"cities": cities, "cuisines": cuisines}
+    
     def get_statistics(self) -> Dict[str, Any]:
         """Get system statistics"""
         cursor = self.conn.cursor()
@@ -287,6 +648,8 @@ class RestaurantDatabase:
         }
     
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        """Close database connections"""
+        if self.pool:
+            if getattr(self, "catalog", None) is not None:
+                self.catalog.close()
+            self.pool.close()
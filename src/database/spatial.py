@@ -0,0 +1,101 @@
+"""
+In-memory spatial index over locations
+A uniform latitude/longitude grid with cell keys kept sorted, so a radius
+query reads only the cells its bounding box touches; k-nearest queries widen
+the radius until enough locations fall inside it
+"""
+
+import math
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.database.catalog import CatalogSnapshot, LocationCatalog
+from src.database.geo import KM_PER_DEGREE, haversine_km
+
+# Beyond this radius a query scans every located row instead of the grid
+FULL_SCAN_KM = 500.0
+
+
+class _Grid:
+    """Sorted cell keys for one catalog version"""
+
+    def __init__(self, catalog: CatalogSnapshot, cell_degrees: float):
+        self.catalog = catalog
+        self.version = catalog.version
+        self.cell_degrees = cell_degrees
+        self.lon_cells = int(math.ceil(360 / cell_degrees)) + 1
+        located = np.flatnonzero(catalog.active & ~np.isnan(catalog.latitude) & ~np.isnan(catalog.longitude))
+        keys = self.key(catalog.latitude[located], catalog.longitude[located])
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.rows = located[order]
+
+    def cell(self, degrees, offset: float):
+        return np.floor((np.asarray(degrees) + offset) / self.cell_degrees).astype(np.int64)
+
+    def key(self, latitude, longitude):
+        return self.cell(latitude, 90.0) * self.lon_cells + self.cell(longitude, 180.0)
+
+
+class SpatialIndex:
+    """Radius and k-nearest queries over catalog rows with coordinates"""
+
+    def __init__(self, catalog: LocationCatalog, cell_km: float = 2.0):
+        """Index a catalog on a grid of roughly cell_km cells; built on first use"""
+        self.catalog = catalog
+        self.cell_degrees = cell_km / KM_PER_DEGREE
+        self._lock = threading.Lock()
+        self._grid: Optional[_Grid] = None
+
+    def refresh(self) -> bool:
+        """Pick up location writes; rebuilds only when the catalog version changed"""
+        catalog = self.catalog.current()
+        grid = self._grid
+        if grid is not None and grid.version == catalog.version:
+            return False
+        with self._lock:
+            # A concurrent refresh may already have built from a newer catalog
+            if self._grid is None or self._grid.version < catalog.version:
+                self._grid = _Grid(catalog, self.cell_degrees)
+        return True
+
+    def within(self, latitude: float, longitude: float, radius_km: float,
+               eligible: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, distances in km) within radius_km, nearest first; eligible masks catalog rows"""
+        self.refresh()
+        grid = self._grid
+        catalog = grid.catalog
+        if radius_km >= FULL_SCAN_KM:
+            candidates = grid.rows
+        else:
+            lat_span = radius_km / KM_PER_DEGREE
+            lon_span = lat_span / max(math.cos(math.radians(min(abs(latitude) + lat_span, 90.0))), 1e-6)
+            lat_cells = np.arange(grid.cell(latitude - lat_span, 90.0), grid.cell(latitude + lat_span, 90.0) + 1)
+            first_lon, last_lon = grid.cell(longitude - lon_span, 180.0), grid.cell(longitude + lon_span, 180.0)
+            # One contiguous key range per grid row the bounding box crosses
+            starts = np.searchsorted(grid.keys, lat_cells * grid.lon_cells + first_lon, side="left")
+            ends = np.searchsorted(grid.keys, lat_cells * grid.lon_cells + last_lon, side="right")
+            candidates = np.concatenate([grid.rows[s:e] for s, e in zip(starts, ends)] or [grid.rows[:0]])
+        if eligible is not None:
+            # Rows appended after the mask was built are not eligible
+            candidates = candidates[candidates < len(eligible)]
+            candidates = candidates[eligible[candidates]]
+        distances = haversine_km(latitude, longitude, catalog.latitude[candidates], catalog.longitude[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.lexsort((candidates, distances))
+        return candidates[order], distances[order]
+
+    def nearest(self, latitude: float, longitude: float, k: int,
+                eligible: Optional[np.ndarray] = None, max_km: float = FULL_SCAN_KM) -> Tuple[np.ndarray, np.ndarray]:
+        """The k nearest (rows, distances in km) within max_km, nearest first"""
+        radius = self.cell_degrees * KM_PER_DEGREE
+        while True:
+            radius = min(radius, max_km)
+            rows, distances = self.within(latitude, longitude, radius, eligible)
+            # Everything inside the radius is found, so its k nearest are the true k nearest
+            if len(rows) >= k or radius >= max_km:
+                return rows[:k], distances[:k]
+            radius *= 2
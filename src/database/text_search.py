@@ -0,0 +1,145 @@
+"""
+Local free-text search over locations
+BM25-ranked inverted index over name, cuisine, city, price range and special
+features, kept in step with the LocationCatalog change log
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.database.catalog import LocationCatalog
+
+TEXT_FIELDS = ("name", "cuisine", "city", "price_range", "special_features")
+
+STOPWORDS = {"a", "an", "and", "at", "for", "in", "of", "on", "or", "place", "restaurant", "somewhere",
+             "the", "to", "with"}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-cased terms without stopwords; plural "s" is dropped so options matches option"""
+    terms = []
+    for word in TOKEN_PATTERN.findall((text or "").lower().replace("'", "")):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring over catalog rows"""
+
+    def __init__(self, catalog: LocationCatalog, k1: float = 1.2, b: float = 0.75):
+        """Index a catalog; built on the first search"""
+        self.catalog = catalog
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.version: Optional[int] = None
+        self._reset()
+
+    def _reset(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_terms: Dict[int, Counter] = {}
+        self.doc_len = np.zeros(0)
+        self.total_len = 0
+        # term -> (rows, BM25 weights), computed on first use; any change clears it, since
+        # document counts and the average length feed every weight
+        self._weights: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def refresh(self) -> bool:
+        """Pick up location writes: re-index changed rows, or everything after a long gap"""
+        if self.version == self.catalog.current().version:
+            return False
+        with self._lock:
+            catalog = self.catalog.snapshot
+            # A concurrent refresh may already have indexed this version or a newer one
+            if self.version is not None and self.version >= catalog.version:
+                return False
+            changed = self.catalog.changed_rows(self.version, catalog.version)
+            if changed is None:
+                self._reset()
+                changed = range(len(catalog.rows))
+            if len(self.doc_len) < len(catalog.rows):
+                self.doc_len = np.concatenate([self.doc_len, np.zeros(len(catalog.rows) - len(self.doc_len))])
+            for i in changed:
+                self._remove(i)
+                row = catalog.rows[i]
+                if row is not None:
+                    self._add(i, Counter(tokenize(" ".join(str(row[field] or "") for field in TEXT_FIELDS))))
+            self._weights = {}
+            self.version = catalog.version
+        return True
+
+    def _add(self, i: int, terms: Counter):
+        self.doc_terms[i] = terms
+        length = sum(terms.values())
+        self.doc_len[i] = length
+        self.total_len += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[i] = tf
+
+    def _remove(self, i: int):
+        terms = self.doc_terms.pop(i, None)
+        if not terms:
+            return
+        self.total_len -= int(self.doc_len[i])
+        self.doc_len[i] = 0
+        for term in terms:
+            posting = self.postings[term]
+            del posting[i]
+            if not posting:
+                del self.postings[term]
+
+    def _term_weights(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Rows containing term and the BM25 score each gets for it"""
+        weights = self._weights.get(term)
+        if weights is None:
+            posting = self.postings.get(term)
+            if not posting:
+                return None
+            rows = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+            tf = np.fromiter(posting.values(), dtype=float, count=len(posting))
+            docs = len(self.doc_terms)
+            idf = math.log(1 + (docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[rows] * docs / self.total_len)
+            weights = self._weights[term] = (rows, idf * tf * (self.k1 + 1) / norm)
+        return weights
+
+    def search(self, query: str, rows: Optional[np.ndarray] = None, limit: int = 10) -> List[Tuple[int, float]]:
+        """(row index, score) of the best matches, best first; rows restricts the candidates"""
+        self.refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not terms or not self.doc_terms:
+                return []
+            scores = np.zeros(len(self.doc_len))
+            matched = []
+            for term in terms:
+                weights = self._term_weights(term)
+                if weights is not None:
+                    scores[weights[0]] += weights[1]
+                    matched.append(weights[0])
+
+        if rows is not None:
+            candidates = rows[scores[rows] > 0]
+        elif len(matched) == 1:
+            candidates = matched[0]
+        else:
+            # A boolean scan is several times faster than nonzero() on the float scores
+            candidates = np.flatnonzero(scores > 0)
+        limit = min(limit, len(candidates))
+        if limit <= 0:
+            return []
+        top = candidates[np.argpartition(scores[candidates], len(candidates) - limit)[len(candidates) - limit:]]
+        # Ties go to the higher rating
+        order = np.lexsort((top, -self.catalog.rating[top], -scores[top]))
+        return [(int(i), float(scores[i])) for i in top[order]]
@@ -0,0 +1,374 @@
+"""
+Tracing spans and metrics
+Nested timing spans for each user turn (sampled, exported as JSON lines) plus
+counters and histograms (always on, exported in Prometheus text format)
+
+    TRACE_PATH=traces.jsonl TRACE_SAMPLE_RATE=0.1 METRICS_PORT=9464 streamlit run app.py
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the duration histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    "goodfoods_span_seconds": "Duration of traced operations",
+    "goodfoods_turns_total": "User turns by how they were answered",
+    "goodfoods_llm_calls_total": "Completion requests",
+    "goodfoods_llm_tokens_total": "Completion tokens billed, by model and kind (prompt or completion)",
+    "goodfoods_llm_cost_usd_total": "Estimated completion cost in USD",
+    "goodfoods_tool_calls_total": "Tool executions",
+    "goodfoods_traces_sampled_total": "Turns whose spans were exported",
+}
+
+# Longest SQL text kept on a span
+MAX_STATEMENT_CHARS = 200
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("goodfoods_span", default=None)
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    if len(labels) == 1:
+        # The common case (span durations) needs no sorting
+        (name, value), = labels.items()
+        return ((name, str(value)),)
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """Thread-safe counters and fixed-bucket histograms"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+        # name -> label key -> [per-bucket counts..., +Inf bucket count, sum]
+        self._histograms: Dict[str, Dict[tuple, List[float]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one histogram observation"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * (len(self.buckets) + 2)
+            # Counts are cumulated when rendering
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and histogram counts/sums as plain dictionaries"""
+        with self._lock:
+            counters = {name: {_format_labels(key): value for key, value in series.items()}
+                        for name, series in self._counters.items()}
+            histograms = {name: {_format_labels(key): {"count": sum(state[:-1]), "sum": state[-1]}
+                                 for key, state in series.items()}
+                          for name, series in self._histograms.items()}
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self) -> str:
+        """Everything recorded so far in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in sorted(series.items()):
+                    count = 0
+                    for bound, bucket in zip(self.buckets, state):
+                        count += bucket
+                        le = 'le="%g"' % bound
+                        lines.append(f"{name}_bucket{_format_labels(key, le)} {count}")
+                    count += state[-2]
+                    le = 'le="+Inf"'
+                    lines.append(f"{name}_bucket{_format_labels(key, le)} {count}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {state[-1]:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    """One timed operation; only sampled spans are kept and exported"""
+
+    __slots__ = ("telemetry", "name", "attributes", "parent", "trace", "span_id", "start_time",
+                 "started", "duration", "error", "_token")
+
+    def __init__(self, telemetry: "Telemetry", name: str, parent: Optional["Span"], trace: Optional[list],
+                 attributes: Dict[str, Any]):
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        # Spans of the whole trace, shared with the root; None when not sampled
+        self.trace = trace
+        self.span_id = os.urandom(8).hex() if trace is not None else None
+        self.start_time = time.time()
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def sampled(self) -> bool:
+        return self.trace is not None
+
+    def set(self, **attributes):
+        """Attach attributes (kept only when sampled)"""
+        if self.trace is not None:
+            self.attributes.update(attributes)
+
+    def set_once(self, **attributes):
+        """Attach attributes that are not set yet"""
+        if self.trace is not None:
+            for name, value in attributes.items():
+                self.attributes.setdefault(name, value)
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the span started"""
+        return round((time.perf_counter() - self.started) * 1000, 3)
+
+    def fail(self, error: BaseException):
+        """Mark the span as failed (it still has to be ended)"""
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self, error: Optional[BaseException] = None):
+        """Stop the clock, record the duration metric and, for a root, export the trace"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.started
+        # A generator closed early by its consumer is not a failure
+        if error is not None and not isinstance(error, GeneratorExit):
+            self.fail(error)
+        self.telemetry._finish(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-lines record for this span"""
+        root = self.trace[0]
+        return {
+            "trace_id": root.span_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start": round(self.start_time, 6),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "status": "error" if self.error else "ok",
+            **({"error": self.error} if self.error else {}),
+            "attributes": self.attributes,
+        }
+
+
+class Telemetry:
+    """Span factory plus the metrics registry and their exporters"""
+
+    _shared: Optional["Telemetry"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, trace_path: Optional[str] = None, sample_rate: float = 1.0,
+                 metrics_path: Optional[str] = None, metrics_flush_seconds: float = 10.0,
+                 enabled: bool = True):
+        """Spans are exported only when trace_path is set; metrics are kept while enabled"""
+        self.trace_path = trace_path
+        self.sample_rate = sample_rate if trace_path else 0.0
+        self.metrics_path = metrics_path
+        self.metrics_flush_seconds = metrics_flush_seconds
+        self.enabled = enabled
+        self.metrics = Metrics()
+        self._export_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._sql = threading.local()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @classmethod
+    def from_env(cls) -> "Telemetry":
+        """Configure from TRACE_* and METRICS_* environment variables"""
+        telemetry = cls(
+            trace_path=os.getenv("TRACE_PATH") or None,
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+            metrics_path=os.getenv("METRICS_PATH") or None,
+            metrics_flush_seconds=float(os.getenv("METRICS_FLUSH_SECONDS", "10")),
+            enabled=os.getenv("METRICS_ENABLED", "true").lower() != "false",
+        )
+        if os.getenv("METRICS_PORT"):
+            telemetry.serve_metrics(int(os.getenv("METRICS_PORT")))
+        return telemetry
+
+    @classmethod
+    def shared(cls) -> "Telemetry":
+        """One telemetry instance per process, configured from the environment"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls.from_env()
+            return cls._shared
+
+    @property
+    def tracing(self) -> bool:
+        """Whether any spans can be sampled"""
+        return self.enabled and self.sample_rate > 0
+
+    # --- Spans ---------------------------------------------------------------
+
+    def span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """New span, child of parent or of the current span; use as a context manager or call end()"""
+        if parent is None:
+            parent = _current_span.get()
+        if parent is not None:
+            trace = parent.trace
+        else:
+            # Sampling is decided once per trace, at its root
+            trace = [] if self.tracing and random.random() < self.sample_rate else None
+        span = Span(self, name, parent, trace, attributes)
+        if trace is not None:
+            trace.append(span)
+        return span
+
+    @staticmethod
+    def activate(span: Span):
+        """Make span the current parent for a block (without ending it)"""
+        return _Activation(span)
+
+    def trace_sql(self, statement: str):
+        """sqlite trace callback: one span per statement, lasting until the next one or its parent ends"""
+        parent = _current_span.get()
+        self._end_sql()
+        if parent is None or parent.trace is None:
+            return
+        self._sql.span = self.span("sql", parent, statement=" ".join(statement.split())[:MAX_STATEMENT_CHARS])
+
+    def _end_sql(self, parent: Optional[Span] = None):
+        """End this thread's open SQL span (only if it belongs to parent, when given)"""
+        open_span = getattr(self._sql, "span", None)
+        if open_span is not None and (parent is None or open_span.parent is parent):
+            self._sql.span = None
+            open_span.end()
+
+    def _finish(self, span: Span):
+        """Record a finished span; export the trace when its root finishes"""
+        if not self.enabled:
+            return
+        self._end_sql(span)
+        self.metrics.observe("goodfoods_span_seconds", span.duration, span=span.name)
+        if span.parent is None:
+            if span.trace is not None:
+                self.metrics.inc("goodfoods_traces_sampled_total")
+                self._export_trace(span.trace)
+            self._maybe_flush_metrics()
+
+    # --- Exporters -----------------------------------------------------------
+
+    def _export_trace(self, spans: List[Span]):
+        """Append every finished span of a trace to the JSON-lines file"""
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans
+                        if span.duration is not None)
+        with self._export_lock:
+            with open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    def _maybe_flush_metrics(self):
+        """Rewrite the metrics file at most every metrics_flush_seconds"""
+        if not self.metrics_path:
+            return
+        now = time.monotonic()
+        if now - self._last_flush < self.metrics_flush_seconds:
+            return
+        self._last_flush = now
+        self.write_metrics(self.metrics_path)
+
+    def write_metrics(self, path: str):
+        """Write the Prometheus text file atomically (for node_exporter's textfile collector)"""
+        text = self.metrics.render_prometheus()
+        with self._export_lock:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+    def serve_metrics(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Serve GET /metrics from a daemon thread"""
+        if self._server is not None:
+            return self._server
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="goodfoods-metrics", daemon=True).start()
+        return self._server
+
+    def close(self):
+        """Stop the metrics endpoint and write a final metrics file"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.metrics_path:
+            self.write_metrics(self.metrics_path)
+
+
+class _Activation:
+    """Context manager behind Telemetry.activate"""
+
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: Span):
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        # Statements run during the block are over once it is
+        self.span.telemetry._end_sql(self.span)
+        return False
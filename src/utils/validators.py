@@ -4,7 +4,7 @@ Input validation utilities
 
 import re
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
 class ReservationValidator:
@@ -53,12 +53,30 @@ class ReservationValidator:
         pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         return bool(re.match(pattern, str(email)))
     
+    @staticmethod
+    def validate_location(reference: str, resolver: Any) -> Dict[str, Any]:
+        """Resolve a location id or description ("the Thai grill in SF") to one location_id"""
+        location_id = resolver.best_location(str(reference or ""))
+        candidates = [] if location_id else resolver.resolve_location(str(reference or ""), limit=3)
+        return {"valid": location_id is not None, "location_id": location_id, "candidates": candidates}
+    
     @staticmethod
     def validate_reservation_request(date: str, time: str, party_size: int, 
-                                     phone: str, email: Optional[str] = None) -> dict:
-        """Validate all reservation request fields"""
+                                     phone: str, email: Optional[str] = None,
+                                     location_id: Optional[str] = None, resolver: Any = None) -> dict:
+        """Validate all reservation request fields (location_id is resolved when a resolver is given)"""
         errors = []
         
+        if resolver is not None and location_id is not None:
+            location = ReservationValidator.validate_location(location_id, resolver)
+            if location["valid"]:
+                location_id = location["location_id"]
+            elif location["candidates"]:
+                options = ", ".join(f"{c['name']} in {c['city']} ({c['location_id']})" for c in location["candidates"])
+                errors.append(f"Restaurant '{location_id}' is ambiguous - did you mean: {options}?")
+            else:
+                errors.append(f"Unknown restaurant '{location_id}'")
+        
         if not ReservationValidator.validate_date(date):
             errors.append("Invalid date format or date out of range")
         
@@ -84,5 +102,6 @@ class ReservationValidator:
         return {
             "valid": len(errors) == 0,
             "errors": errors,
-            "parsed_date": parsed_date
+            "parsed_date": parsed_date,
+            "location_id": location_id
         }
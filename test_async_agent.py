@@ -0,0 +1,134 @@
+"""
+Tests for the asyncio database facade and AsyncLlamaAgent
+"""
+
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from src.agent.async_agent import AsyncLlamaAgent
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.database.async_db import AsyncRestaurantDatabase
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.utils.telemetry import Telemetry
+
+DAY = (date.today() + timedelta(days=30)).isoformat()
+SEARCH = f"Any tables for 4 in Chicago on {DAY} at 19:00?"
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = RestaurantDatabase(str(tmp_path / "async.db"))
+    yield db
+    db.close()
+
+
+def _agent(agent_class, db, monkeypatch, script=None):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    async_mode = agent_class is AsyncLlamaAgent
+    return agent_class(AsyncRestaurantDatabase(db) if async_mode else db, NoShowPredictor(),
+                       RecommendationEngine(db), client=LocalClient(ScriptedResponder(script), async_mode=async_mode),
+                       response_cache=ResponseCache(), telemetry=Telemetry())
+
+
+def test_async_db_books_concurrently_without_overbooking(db):
+    seats = db.get_location_details("LOC005")["seating_capacity"]
+
+    async def scenario():
+        async_db = AsyncRestaurantDatabase(db, max_workers=4)
+        booking = dict(location_id="LOC005", date="2030-01-15", time="19:00", party_size=10,
+                       customer_name="Ada", customer_phone="5551234")
+        results = await asyncio.gather(*(async_db.create_reservation(**booking) for _ in range(12)),
+                                       return_exceptions=True)
+        with pytest.raises(ValueError):
+            await async_db.get_location_details("LOC999")
+        stats = await async_db.get_statistics()
+        await async_db.close()
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+    booked = [r for r in results if not isinstance(r, Exception)]
+    assert all(isinstance(r, ValueError) for r in results if isinstance(r, Exception))
+    assert 10 * len(booked) <= seats < 10 * (len(booked) + 1)
+    assert stats["total_reservations"] == len(booked)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_async_agent_emits_the_same_events_as_the_sync_agent(db, monkeypatch, stream):
+    script = [{"tool_calls": [{"name": "search_available_slots",
+                               "arguments": {"date": DAY, "time": "19:00", "party_size": 4, "city": "Chicago"}}]},
+              {"content": "Two places in Chicago have room."}]
+
+    def strip(event):
+        # Tool call ids and result rows differ between runs
+        return {key: value for key, value in event.items() if key in ("type", "name", "delta", "text")}
+
+    sync_events = [strip(e) for e in _agent(LlamaAgent, db, monkeypatch, script).stream_message(SEARCH)] \
+        if stream else None
+    agent = _agent(AsyncLlamaAgent, db, monkeypatch, script)
+
+    async def collect():
+        if stream:
+            return [event async for event in agent.stream_message(SEARCH)]
+        return [{"type": "done", "response": await agent.process_message(SEARCH)}]
+
+    events = asyncio.run(collect())
+    response = events[-1]["response"]
+    assert response["response_text"] == "Two places in Chicago have room."
+    assert response["tool_calls"][0]["result"]["success"]
+    assert agent.usage.report()["turns"][-1]["tool_path"] == "search_available_slots"
+    if stream:
+        assert [strip(e) for e in events[:-1]] == sync_events[:-1]
+
+
+def test_async_agent_turns_of_one_conversation_do_not_interleave(db, monkeypatch):
+    agent = _agent(AsyncLlamaAgent, db, monkeypatch, [{"content": "Hello!"}])
+
+    async def both():
+        return await asyncio.gather(agent.process_message("hi"), agent.process_message("hello"))
+
+    asyncio.run(both())
+    roles = [(m["role"], m["content"]) for m in agent.messages[1:]]
+    assert roles == [("user", "hi"), ("assistant", "Hello!"), ("user", "hello"), ("assistant", "Hello!")]
+
+
+def test_async_agent_failed_completion_becomes_an_error_reply(db, monkeypatch):
+    agent = _agent(AsyncLlamaAgent, db, monkeypatch)
+
+    async def fail(**kwargs):
+        raise RuntimeError("upstream timeout")
+
+    agent.client.chat.completions.create = fail
+    response = asyncio.run(agent.process_message("hi"))
+    assert "upstream timeout" in response["response_text"]
+    assert agent.usage.report()["turns"][-1]["answered_by"] == "error"
+
+
+def test_async_agent_keeps_sql_off_the_event_loop(db):
+    agent = AsyncLlamaAgent(AsyncRestaurantDatabase(db), NoShowPredictor(), RecommendationEngine(db),
+                            client=LocalClient(ScriptedResponder(), async_mode=True),
+                            response_cache=ResponseCache(), telemetry=Telemetry(), fast_path=True)
+    # A location write from another process leaves the catalog due for a check
+    other = RestaurantDatabase(db.db_path)
+    with other.pool.write() as conn:
+        conn.execute("UPDATE locations SET avg_rating = 4.9 WHERE location_id = 'LOC001'")
+    other.close()
+    db.catalog.refresh_seconds = 0
+    location = db.get_location_details("LOC003")
+    threads = []
+    db.pool.set_trace_callback(lambda sql: threads.append(threading.current_thread()))
+
+    async def turns():
+        await agent.process_message(SEARCH)
+        await agent.process_message(f"Please book the {location['name']} in {location['city']} for 2 on {DAY} "
+                                    f"at 19:00. My name is Ann Lee, phone 555-1234")
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(turns())
+    assert [turn["answered_by"] for turn in agent.usage.report()["turns"]] == ["fast", "forced"]
+    assert threads and loop_thread not in threads
@@ -0,0 +1,117 @@
+"""
+Tests for the location x slot availability grid and its search tool
+"""
+
+import pytest
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.utils.telemetry import Telemetry
+
+DAY = "2030-01-15"
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "grid.db"))
+    yield database
+    database.close()
+
+
+def _cells(grid, location_id):
+    return next(location["availability"] for location in grid["locations"]
+                if location["location_id"] == location_id)
+
+
+def test_cells_show_seats_left_after_bookings(db):
+    seats = db.get_location_details("LOC001")["seating_capacity"]
+    db.create_reservation("LOC001", DAY, "19:00", 6, "Ada", "5551234")
+    db.create_reservation("LOC001", "2030-01-16", "19:30", 4, "Bo", "5554321")
+
+    grid = db.get_availability_grid(DAY, "2030-01-16", "19:00", "20:00", 2, location_id="LOC001")
+
+    assert grid["dates"] == [DAY, "2030-01-16"]
+    assert grid["times"] == ["19:00", "19:30", "20:00"]
+    assert _cells(grid, "LOC001") == {DAY: [seats - 6, seats, seats], "2030-01-16": [seats, seats - 4, seats]}
+
+
+def test_cells_outside_opening_hours_are_zero(db):
+    location = db.get_location_details("LOC001")
+    opens, closes = location["hours_open"], location["hours_close"]
+    assert (opens, closes) == ("11:00", "23:00")
+
+    morning = db.get_availability_grid(DAY, DAY, "10:00", "11:30", 2, location_id="LOC001")
+    late = db.get_availability_grid(DAY, DAY, "22:30", "23:00", 2, location_id="LOC001")
+
+    seats = location["seating_capacity"]
+    assert _cells(morning, "LOC001")[DAY] == [0, 0, seats, seats]
+    # Closing time itself is no longer bookable
+    assert _cells(late, "LOC001")[DAY] == [seats, 0]
+
+
+def test_cells_too_full_for_the_party_are_zero(db):
+    seats = db.get_location_details("LOC001")["seating_capacity"]
+    left = 4
+    remaining = seats - left
+    while remaining:
+        party = min(20, remaining)
+        db.create_reservation("LOC001", DAY, "19:00", party, "Ada", "5551234")
+        remaining -= party
+
+    small = db.get_availability_grid(DAY, DAY, "18:30", "19:30", 2, location_id="LOC001")
+    large = db.get_availability_grid(DAY, DAY, "18:30", "19:30", 6, location_id="LOC001")
+
+    assert _cells(small, "LOC001")[DAY] == [seats, left, seats]
+    assert _cells(large, "LOC001")[DAY] == [seats, 0, seats]
+
+
+@pytest.mark.parametrize("window, message", [
+    ((DAY, "2030-01-29", "19:00", "19:00", 2), "limited to 14 days"),
+    ((DAY, "2030-01-28", "11:00", "22:00", 2, 15), "exceeds 400 cells"),
+    ((DAY, DAY, "19:00", "20:00", 2, 10), "at least 15"),
+    (("2030-01-16", DAY, "19:00", "20:00", 2), "end_date"),
+])
+def test_oversized_grids_are_rejected(db, window, message):
+    with pytest.raises(ValueError, match=message):
+        db.get_availability_grid(*window)
+
+
+def test_limit_keeps_the_best_rated_locations(db):
+    grid = db.get_availability_grid(DAY, DAY, "19:00", "19:00", 2, limit=3)
+    ratings = [location["rating"] for location in grid["locations"]]
+
+    assert len(ratings) == 3
+    assert ratings == sorted(ratings, reverse=True)
+    top = db.conn.execute("SELECT MAX(avg_rating) FROM locations").fetchone()[0]
+    assert ratings[0] == top
+
+
+def test_part_of_a_city_name_still_filters(db):
+    cities = {location["city"] for location in
+              db.get_availability_grid(DAY, DAY, "19:00", "19:00", 2, city="york", limit=50)["locations"]}
+    assert cities == {"New York"}
+    assert {slot["city"] for slot in db.get_available_slots(DAY, "19:00", 2, city="york")} == {"New York"}
+    # Too short, or part of several names: no match rather than a guess
+    assert db.get_availability_grid(DAY, DAY, "19:00", "19:00", 2, city="an")["locations"] == []
+    assert db.get_available_slots(DAY, "19:00", 2, cuisine="ese") == []
+
+
+def test_grid_tool_reports_results_and_rejections(db, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    agent = LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=LocalClient(ScriptedResponder()),
+                       response_cache=ResponseCache(), telemetry=Telemetry())
+    city = db.get_location_details("LOC001")["city"]
+
+    found = agent._execute_tool("search_availability_grid", {
+        "start_date": DAY, "end_date": "2030-01-16", "time_from": "19:00", "time_to": "20:00",
+        "party_size": 2, "city": city.lower()})
+    rejected = agent._execute_tool("search_availability_grid", {
+        "start_date": DAY, "end_date": "2030-02-15", "time_from": "19:00", "time_to": "20:00",
+        "party_size": 2})
+
+    assert found["success"] and found["count"] == len(found["locations"]) > 0
+    assert {location["city"] for location in found["locations"]} == {city}
+    assert not rejected["success"] and "14 days" in rejected["error"]
@@ -0,0 +1,117 @@
+"""
+Tests for the pooled, WAL-mode connection layer
+"""
+
+import threading
+
+import pytest
+
+from src.database.restaurant_db import RestaurantDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "pool.db"), pragmas={"cache_size": -2048})
+    yield database
+    database.close()
+
+
+def test_wal_mode_and_pragmas(db):
+    assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert db.conn.execute("PRAGMA cache_size").fetchone()[0] == -2048
+
+
+def test_each_thread_gets_its_own_reader(db):
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(db.conn))
+    thread.start()
+    thread.join()
+    assert seen[0] is not db.conn
+    assert db.conn is db.conn
+
+
+def test_search_does_not_wait_behind_open_write(db):
+    in_transaction = threading.Event()
+    release = threading.Event()
+
+    def hold_write():
+        with db.pool.write() as conn:
+            conn.execute("UPDATE locations SET avg_rating = 1.0 WHERE location_id = 'LOC001'")
+            in_transaction.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=hold_write)
+    writer.start()
+    assert in_transaction.wait(5)
+
+    # Readers see the last committed snapshot while the writer holds its lock
+    slots = db.get_available_slots("2030-01-15", "19:00", 2, location_id="LOC001")
+    assert slots and slots[0]["rating"] != 1.0
+
+    release.set()
+    writer.join()
+    assert db.get_location_details("LOC001")["avg_rating"] == 1.0
+
+
+def test_concurrent_bookings_never_overbook(db):
+    seats = db.get_location_details("LOC005")["seating_capacity"]
+    errors = []
+
+    def book():
+        try:
+            db.create_reservation("LOC005", "2030-01-15", "19:00", 10, "Ada", "5551234")
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=book) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    booked = db.conn.execute(
+        "SELECT booked_covers FROM slot_occupancy WHERE location_id = 'LOC005'"
+    ).fetchone()[0]
+    assert booked == 10 * (20 - len(errors))
+    assert booked <= seats
+
+
+def test_readers_of_finished_threads_are_closed(db):
+    db.conn
+    opened = db.pool.open_connections()
+    threads = [threading.Thread(target=db.get_statistics) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert db.pool.open_connections() == opened
+
+
+def test_memory_readers_wait_for_open_write():
+    database = RestaurantDatabase(":memory:")
+    in_transaction = threading.Event()
+    release = threading.Event()
+    seen = []
+
+    def hold_write():
+        with database.pool.write() as conn:
+            conn.execute("UPDATE locations SET avg_rating = 1.0 WHERE location_id = 'LOC001'")
+            in_transaction.set()
+            release.wait(5)
+
+    def read():
+        seen.append(database.get_location_details("LOC001")["avg_rating"])
+
+    writer = threading.Thread(target=hold_write)
+    writer.start()
+    assert in_transaction.wait(5)
+    reader = threading.Thread(target=read)
+    reader.start()
+    reader.join(0.2)
+    # The uncommitted rating is never visible to another thread
+    assert seen == []
+    release.set()
+    writer.join()
+    reader.join()
+    assert seen == [1.0]
+    database.close()
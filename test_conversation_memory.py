@@ -0,0 +1,107 @@
+"""
+Tests for the token-budgeted conversation memory
+"""
+
+from src.agent.memory import PINNED_PREFIX, ConversationMemory, estimate_tokens
+from src.agent.tool_encoding import encode_tool_result
+
+
+def _turn(i, rows=20):
+    """One user turn with a search tool round trip"""
+    result = {"success": True, "count": rows, "available_slots": [
+        {"location_id": f"LOC{n:03d}", "restaurant_name": f"Place {n}", "cuisine": "Thai", "city": "Chicago",
+         "rating": 4.5, "price_range": "$$", "available_capacity": 40, "demand": "high"}
+        for n in range(rows)
+    ]}
+    return [
+        {"role": "user", "content": f"question {i}"},
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": f"call{i}", "type": "function",
+             "function": {"name": "search_available_slots", "arguments": "{}"}}
+        ]},
+        {"role": "tool", "tool_call_id": f"call{i}", "content": encode_tool_result("search_available_slots", result)},
+        {"role": "assistant", "content": f"answer {i}"},
+    ]
+
+
+def _history(turns):
+    messages = [{"role": "system", "content": "system prompt"}]
+    for i in range(turns):
+        messages += _turn(i)
+    return messages + [{"role": "user", "content": "latest"}]
+
+
+def test_stays_under_budget_and_keeps_turns_whole():
+    memory = ConversationMemory(max_tokens=800, keep_recent_turns=2)
+    compacted = memory.compact(_history(30))
+
+    assert compacted[0]["content"] == "system prompt"
+    assert compacted[-1]["content"] == "latest"
+    assert sum(estimate_tokens(m) for m in compacted) <= 800
+
+    # Every tool message still follows the assistant message that called it
+    for i, message in enumerate(compacted):
+        if message["role"] == "tool":
+            calls = [tc["id"] for m in compacted[:i] for tc in m.get("tool_calls") or []]
+            assert message["tool_call_id"] in calls
+
+
+def test_stale_tool_results_are_summarized():
+    memory = ConversationMemory(max_tokens=100000)
+    compacted = memory.compact(_history(2))
+    tool = [m for m in compacted if m["role"] == "tool"][0]["content"].splitlines()
+
+    assert tool == [
+        "count=20 showing=5 summarized",
+        "location_id|restaurant_name|city",
+        "LOC000|Place 0|Chicago",
+        "LOC001|Place 1|Chicago",
+        "LOC002|Place 2|Chicago",
+        "LOC003|Place 3|Chicago",
+        "LOC004|Place 4|Chicago",
+    ]
+    # Compacting again leaves the summary alone
+    assert memory.compact(compacted) == compacted
+
+
+def test_grid_and_nearby_summaries_keep_their_context():
+    memory = ConversationMemory()
+    grid = encode_tool_result("search_availability_grid", {
+        "success": True, "party_size": 2, "times": ["18:00", "19:00"], "dates": ["2030-01-15"],
+        "locations": [{"location_id": "LOC001", "restaurant_name": "Thai House", "cuisine": "Thai",
+                       "city": "Austin", "rating": 4.5, "price_range": "$$",
+                       "availability": {"2030-01-15": [4, 0]}}],
+    })
+    nearby = encode_tool_result("search_nearby", {
+        "success": True, "origin": "Union Square", "nearby": [
+            {"location_id": "LOC002", "name": "Sushi Bar", "city": "San Francisco", "distance_km": 0.4}],
+    })
+
+    assert memory.summarize_tool_content(grid).splitlines() == [
+        "party_size=2 times=18:00 19:00", "count=1 summarized", "location_id|restaurant_name|city",
+        "LOC001|Thai House|Austin",
+    ]
+    assert memory.summarize_tool_content(nearby).splitlines() == [
+        "origin=Union Square", "count=1 summarized", "location_id|name|city", "LOC002|Sushi Bar|San Francisco",
+    ]
+    assert memory.summarize_tool_content("error: Location LOC999 not found") == "error: Location LOC999 not found"
+
+
+def test_booking_slots_are_pinned_after_eviction():
+    memory = ConversationMemory(max_tokens=300, keep_recent_turns=1)
+    memory.observe_tool(
+        "create_reservation",
+        {"location_id": "LOC007", "date": "2030-01-15", "time": "19:00", "party_size": 4,
+         "customer_name": "Ada", "customer_phone": "5551234"},
+        {"success": True, "reservation": {"confirmation_number": "GF-AB12CD34",
+                                          "restaurant_name": "Thai House"}},
+    )
+    compacted = memory.compact(_history(10))
+    compacted = memory.compact(compacted)
+
+    pinned = [m for m in compacted if (m.get("content") or "").startswith(PINNED_PREFIX)]
+    assert len(pinned) == 1
+    assert "GF-AB12CD34" in pinned[0]["content"] and "party_size=4" in pinned[0]["content"]
+
+    memory.observe_tool("cancel_reservation", {"confirmation_number": "GF-AB12CD34"}, {"success": True})
+    assert "confirmation_number" not in memory.slots
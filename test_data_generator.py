@@ -0,0 +1,107 @@
+"""
+Tests for the seeded synthetic data generator
+"""
+
+import sqlite3
+from datetime import date
+
+from src.database.generator import GeneratorConfig, generate_database, generate_locations
+from src.database.migrations import rebuild_demand_aggregates
+from src.database.restaurant_db import RestaurantDatabase
+
+TODAY = date(2030, 1, 15)
+
+
+def _config(**overrides):
+    return GeneratorConfig(**{"locations": 20, "reservations": 5000, "seed": 3, "today": TODAY, **overrides})
+
+
+def _dump(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT * FROM reservations ORDER BY confirmation_number").fetchall()
+    conn.close()
+    return rows
+
+
+def test_same_seed_same_data(tmp_path):
+    generate_database(str(tmp_path / "a.db"), _config())
+    generate_database(str(tmp_path / "b.db"), _config())
+    generate_database(str(tmp_path / "c.db"), _config(seed=4))
+    assert _dump(str(tmp_path / "a.db")) == _dump(str(tmp_path / "b.db"))
+    assert _dump(str(tmp_path / "a.db")) != _dump(str(tmp_path / "c.db"))
+
+
+def test_counts_and_statuses(tmp_path):
+    path = str(tmp_path / "gen.db")
+    summary = generate_database(path, _config())
+    assert summary["locations"] == 20
+    assert sum(summary["statuses"].values()) == 5000
+    assert set(summary["statuses"]) == {"cancelled", "completed", "confirmed", "no_show"}
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM reservations").fetchone()[0] == 5000
+    # Only future bookings are still confirmed; only past ones were attended or missed
+    assert conn.execute("SELECT MIN(date) FROM reservations WHERE status = 'confirmed'").fetchone()[0] >= "2030-01-15"
+    assert conn.execute("""
+        SELECT MAX(date) FROM reservations WHERE status IN ('completed', 'no_show')
+    """).fetchone()[0] < "2030-01-15"
+    conn.close()
+
+
+def test_confirmed_bookings_fit_capacity_and_match_ledger(tmp_path):
+    path = str(tmp_path / "gen.db")
+    # Few locations and a short horizon force contention for slots
+    generate_database(path, _config(locations=3, reservations=20000, future_days=7))
+    conn = sqlite3.connect(path)
+    overbooked = conn.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT r.location_id, SUM(r.party_size) AS covers, l.seating_capacity
+            FROM reservations r JOIN locations l ON l.location_id = r.location_id
+            WHERE r.status = 'confirmed'
+            GROUP BY r.location_id, r.date, r.time
+        ) WHERE covers > seating_capacity
+    """).fetchone()[0]
+    ledger = conn.execute("""
+        SELECT location_id, date, time, booked_covers FROM slot_occupancy ORDER BY 1, 2, 3
+    """).fetchall()
+    expected = conn.execute("""
+        SELECT location_id, date, time, SUM(party_size) FROM reservations
+        WHERE status = 'confirmed' GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+    """).fetchall()
+    conn.close()
+    assert overbooked == 0
+    assert ledger == expected
+
+
+def test_aggregates_match_a_rebuild_from_reservations(tmp_path):
+    path = str(tmp_path / "gen.db")
+    generate_database(path, _config(reservations=20000))
+    conn = sqlite3.connect(path)
+    tables = ("demand_profile", "demand_weekly", "slot_occupancy")
+
+    def dump():
+        return {table: conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3").fetchall() for table in tables}
+
+    generated = dump()
+    # Forecasters reload everything after the load
+    assert conn.execute("SELECT location_id FROM demand_changes ORDER BY seq DESC").fetchone() == ("*",)
+    rebuild_demand_aggregates(conn.cursor())
+    conn.execute("DELETE FROM slot_occupancy")
+    conn.execute("""
+        INSERT INTO slot_occupancy (location_id, date, time, booked_covers, reservation_count)
+        SELECT location_id, date, time, SUM(party_size), COUNT(*) FROM reservations
+        WHERE status = 'confirmed' GROUP BY 1, 2, 3
+    """)
+    rebuilt = dump()
+    conn.close()
+    assert all(generated[table] for table in tables)
+    assert generated == rebuilt
+
+
+def test_sample_locations_are_seeded(tmp_path):
+    db = RestaurantDatabase(str(tmp_path / "sample.db"))
+    details = db.get_location_details("LOC087")
+    db.close()
+    expected = generate_locations(GeneratorConfig(locations=87, seed=0))[-1]
+    assert details["name"] == expected[1]
+    assert details["city"] == expected[3]
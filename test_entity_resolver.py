@@ -0,0 +1,128 @@
+"""
+Tests for the fuzzy restaurant, city and cuisine resolver
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.intent_router import IntentRouter
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.database.entity_resolver import edit_distance
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.utils.telemetry import Telemetry
+from src.utils.validators import ReservationValidator
+
+DAY = (date.today() + timedelta(days=30)).isoformat()
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "resolver.db"))
+    yield database
+    database.close()
+
+
+def _location_in(db, city):
+    return dict(db.conn.execute("SELECT location_id, name, city, cuisine FROM locations WHERE city = ? "
+                                "ORDER BY location_id LIMIT 1", (city,)).fetchone())
+
+
+def test_cities_and_cuisines(db):
+    resolver = db.resolver
+    assert [resolver.resolve_city(v) for v in ("LA", "l.a.", "nyc", "SF", "Bostn", "san fransisco")] == [
+        "Los Angeles", "Los Angeles", "New York", "San Francisco", "Boston", "San Francisco"]
+    assert resolver.resolve_city("Justin") is None
+    assert resolver.resolve_city("Atlantis") is None
+    assert resolver.resolve_cuisine("japanes") == "Japanese"
+    assert resolver.resolve_city("york") == "New York" and resolver.resolve_cuisine("ese") is None
+    assert resolver.match_cities("a table in nyc tonight")[0] == ["new york"]
+    assert edit_distance("austin", "boston", 1) == 2
+
+
+def test_locations_resolve_by_id_and_description(db):
+    resolver = db.resolver
+    assert resolver.best_location("loc7") == "LOC007"
+
+    location = _location_in(db, "Los Angeles")
+    name = location["name"].lower().replace("the ", "")
+    assert resolver.best_location(f"book the {name} in LA please") == location["location_id"]
+    assert resolver.resolve_location(f"{name} in los angeles")[0]["location_id"] == location["location_id"]
+
+    # A name shared by several cities is ambiguous until a city is given
+    shared = db.conn.execute("""
+        SELECT name FROM locations GROUP BY name HAVING COUNT(DISTINCT city) > 1 LIMIT 1
+    """).fetchone()
+    if shared:
+        assert resolver.best_location(shared[0]) is None
+        assert len(resolver.resolve_location(shared[0])) > 1
+    assert resolver.resolve_location("zzzz qqqq") == []
+
+
+def test_validator_resolves_locations(db):
+    location = _location_in(db, "San Francisco")
+    name = location["name"].lower().replace("the ", "")
+    validation = ReservationValidator.validate_reservation_request(
+        DAY, "19:00", 2, "555-1234", location_id=f"{name} in SF", resolver=db.resolver)
+    assert validation["valid"] and validation["location_id"] == location["location_id"]
+
+    validation = ReservationValidator.validate_reservation_request(
+        DAY, "19:00", 2, "555-1234", location_id="LOC999", resolver=db.resolver)
+    assert not validation["valid"] and "Unknown restaurant" in validation["errors"][0]
+
+
+def test_router_accepts_aliases(db):
+    router = IntentRouter(**db.get_lookup_values(), resolver=db.resolver)
+    assert router.route(f"table for 2 in LA on {DAY} at 7pm") == (
+        "search_available_slots", {"date": DAY, "time": "19:00", "party_size": 2, "city": "los angeles"})
+    assert router.route(f"japanes in nyc for 4 on {DAY} at 19:00")[1]["cuisine"] == "japanese"
+
+
+def test_described_restaurant_is_booked_without_the_model(db, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    responder = ScriptedResponder(script=[{"content": "unused"}])
+    agent = LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=LocalClient(responder),
+                       response_cache=ResponseCache(), telemetry=Telemetry())
+    location = _location_in(db, "Los Angeles")
+    name = location["name"].lower().replace("the ", "")
+
+    response = agent.process_message(f"Please book the {name} in LA for 2 on {DAY} at 19:00. "
+                                     f"My name is Ann Lee, phone 555-1234")
+    assert response["tool_calls"][0]["input"]["location_id"] == location["location_id"]
+    assert response["reservation_created"]["restaurant_name"] == location["name"]
+    assert agent.get_usage_report()["totals"]["calls"] == 0
+
+
+def test_restaurants_listed_by_the_assistant_are_not_booked_without_the_model(db, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    responder = ScriptedResponder(script=[{"content": "Which of them would you like?"}])
+    agent = LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=LocalClient(responder),
+                       response_cache=ResponseCache(), telemetry=Telemetry())
+    listing = "Here are some options: 1. The American Table 2. The Mediterranean Grill 3. The Brazilian Tavern"
+    assert db.resolver.best_location(listing) is None
+    agent.messages.append({"role": "assistant", "content": listing})
+    # Even a single restaurant named only by the assistant is not the guest's choice
+    agent.messages.append({"role": "assistant", "content": "The American Table has room at 19:00."})
+
+    response = agent.process_message(f"Book it for 2 on {DAY} at 19:00. My name is Ann Lee, phone 555-1234")
+    assert response["tool_calls"] == [] and response["reservation_created"] is None
+    assert response["response_text"] == "Which of them would you like?"
+
+
+def test_relative_dates_follow_the_date_in_the_prompt(db):
+    today = date.today() + timedelta(days=100)
+    agent = LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=LocalClient(ScriptedResponder()),
+                       response_cache=ResponseCache(), telemetry=Telemetry(), fast_path=True, clock=lambda: today)
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    assert f"Today's date is {today.isoformat()}" in agent.messages[0]["content"]
+    assert f'says "tomorrow", use date: {tomorrow}' in agent.messages[0]["content"]
+
+    search = agent.process_message("table for 2 in Chicago tomorrow at 7pm")
+    assert search["tool_calls"][0]["input"]["date"] == tomorrow
+    location = _location_in(db, "Los Angeles")
+    booked = agent.process_message(f"Please book {location['name']} in LA for 2 tomorrow at 19:00. "
+                                   f"My name is Ann Lee, phone 555-1234")
+    assert booked["reservation_created"]["date"] == tomorrow
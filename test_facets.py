@@ -0,0 +1,103 @@
+"""
+Tests for the in-memory location facet index
+"""
+
+import pytest
+
+from src.database.migrations import normalize_key
+from src.database.restaurant_db import RestaurantDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "facets.db"))
+    yield database
+    database.close()
+
+
+def _ids(db, rows):
+    return [db.catalog.rows[i]["location_id"] for i in rows]
+
+
+def test_lookup_matches_sql(db):
+    for cuisine, city, price in [("italian", None, None), (None, "New York ", None),
+                                 ("Italian", "chicago", None), (None, None, "Fine Dining"),
+                                 ("japanese", None, "upscale")]:
+        sql = "SELECT location_id FROM locations WHERE 1"
+        params = []
+        for column, value in (("cuisine_key", cuisine), ("city_key", city)):
+            if value:
+                sql += f" AND {column} = ?"
+                params.append(value.strip().lower())
+        if price:
+            sql += " AND price_range = ?"
+            params.append(price.lower().replace(" ", "_"))
+        expected = [row[0] for row in db.conn.execute(sql + " ORDER BY avg_rating DESC, location_id", params)]
+        assert _ids(db, db.facets.lookup(cuisine=cuisine, city=city, price_range=price)) == expected
+
+    assert len(db.facets.lookup()) == 87
+    assert len(db.facets.lookup(cuisine="Klingon")) == 0
+    assert len(db.facets.lookup(city="Boston", price_range="free")) == 0
+
+
+def test_writes_bump_the_version(db):
+    facets = db.facets
+    facets.refresh()
+    version = facets.version
+    assert not facets.refresh()
+
+    city = db.get_location_details("LOC001")["city"]
+    before = _ids(db, facets.lookup(city=city))
+    with db.pool.write() as conn:
+        conn.execute("UPDATE locations SET city = 'Atlantis' WHERE location_id = 'LOC001'")
+
+    assert _ids(db, facets.lookup(city="atlantis")) == ["LOC001"]
+    assert facets.version > version
+    assert _ids(db, facets.lookup(city=city)) == [i for i in before if i != "LOC001"]
+    # Bookings do not touch locations, so the index is not rebuilt
+    db.create_reservation("LOC003", "2030-01-15", "19:00", 2, "Ada", "5551234")
+    assert not facets.refresh()
+
+
+def test_keys_fold_case_like_sqlite(db):
+    with db.pool.write() as conn:
+        conn.execute("UPDATE locations SET city = ' ZÜRICH' WHERE location_id = 'LOC001'")
+    for city in ("zÜrich", "ZÜRICH ", "zürich"):
+        sql = db.conn.execute("SELECT location_id FROM locations WHERE city_key = ?",
+                              (normalize_key(city),)).fetchall()
+        assert _ids(db, db.facets.lookup(city=city)) == [row[0] for row in sql]
+    assert _ids(db, db.facets.lookup(city="zürich")) == []
+
+
+def test_lookups_between_checks_do_not_query(db, tmp_path):
+    db.facets.lookup(cuisine="italian")
+    statements = []
+    db.pool.set_trace_callback(statements.append)
+    for city in ("chicago", "new york", "boston"):
+        db.facets.lookup(city=city)
+    assert statements == []
+
+    # Writes from another process show up at the next check, without any write on the read path
+    other = RestaurantDatabase(str(tmp_path / "facets.db"))
+    with other.pool.write() as conn:
+        conn.execute("UPDATE locations SET city = 'Atlantis' WHERE location_id = 'LOC001'")
+    other.close()
+    db.catalog.refresh_seconds = 0
+    assert _ids(db, db.facets.lookup(city="atlantis")) == ["LOC001"]
+    assert not any(sql.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")) for sql in statements)
+
+
+def test_available_slots_use_the_index(db):
+    location = db.get_location_details("LOC001")
+    capacity = location["seating_capacity"]
+    db.create_reservation("LOC001", "2030-01-15", "19:00", capacity - 1, "Ada", "5551234")
+
+    slots = db.get_available_slots("2030-01-15", "19:00", 2, cuisine=location["cuisine"].upper())
+    assert "LOC001" not in [slot["location_id"] for slot in slots]
+    assert all(slot["cuisine"] == location["cuisine"] for slot in slots)
+    ratings = [slot["rating"] for slot in slots]
+    assert ratings == sorted(ratings, reverse=True)
+
+    assert db.get_available_slots("2030-01-15", "19:00", 1, location_id="LOC001")[0]["available_capacity"] == 1
+    assert db.get_available_slots("2030-01-15", "19:00", 1, location_id="LOC999") == []
+    assert len(db.get_available_slots("2030-01-15", "19:00", 1)) == db.SLOT_LIMIT
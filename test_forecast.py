@@ -0,0 +1,114 @@
+"""
+Tests for the demand aggregates and forecaster
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from src.database.generator import GeneratorConfig, generate_database
+from src.database.restaurant_db import RestaurantDatabase
+
+TODAY = date(2030, 1, 15)
+
+PROFILE_SQL = """
+    SELECT location_id, (CAST(strftime('%w', date) AS INTEGER) + 6) % 7, time, SUM(party_size), COUNT(*)
+    FROM reservations WHERE status IN ('completed', 'no_show')
+    GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+"""
+
+
+@pytest.fixture(scope="module")
+def history_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("forecast") / "history.db")
+    generate_database(path, GeneratorConfig(locations=20, reservations=30000, seed=9, today=TODAY))
+    database = RestaurantDatabase(path)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "forecast.db"))
+    yield database
+    database.close()
+
+
+def _insert(db, number, location_id, day, time="19:00", party_size=4, status="completed"):
+    with db.pool.write() as conn:
+        conn.execute("""
+            INSERT INTO reservations (confirmation_number, location_id, date, time, party_size,
+                                      customer_name, customer_phone, status)
+            VALUES (?, ?, ?, ?, ?, 'Ada', '5551234', ?)
+        """, (number, location_id, day, time, party_size, status))
+
+
+def _profile(db):
+    return db.conn.execute("""
+        SELECT location_id, weekday, time, covers, reservations FROM demand_profile
+        WHERE reservations > 0 ORDER BY 1, 2, 3
+    """).fetchall()
+
+
+def test_triggers_keep_aggregates_current(db):
+    _insert(db, "R1", "LOC001", "2029-12-03")
+    _insert(db, "R2", "LOC001", "2029-12-10", party_size=2, status="no_show")
+    _insert(db, "R3", "LOC002", "2029-12-04", status="cancelled")
+    with db.pool.write() as conn:
+        conn.execute("UPDATE reservations SET time = '20:00', party_size = 6 WHERE confirmation_number = 'R1'")
+        conn.execute("UPDATE reservations SET status = 'completed' WHERE confirmation_number = 'R3'")
+        conn.execute("DELETE FROM reservations WHERE confirmation_number = 'R2'")
+
+    assert [tuple(r) for r in _profile(db)] == [tuple(r) for r in db.conn.execute(PROFILE_SQL)]
+    weekly = db.conn.execute("SELECT location_id, SUM(covers) FROM demand_weekly GROUP BY 1 HAVING SUM(covers)")
+    assert [tuple(r) for r in weekly] == [("LOC001", 6), ("LOC002", 4)]
+
+
+def test_seasonal_baseline(history_db):
+    forecast = history_db.demand.forecast("2030-01-21", 7)
+    assert forecast["covers"].shape == (20, 7, len(forecast["times"]))
+    per_day = forecast["covers"].sum(axis=(0, 2))
+    # 2030-01-21 is a Monday; the generator books Saturdays hardest and Mondays least
+    assert per_day.argmax() == 5 and per_day.argmin() == 0
+    per_time = forecast["covers"].sum(axis=(0, 1))
+    assert forecast["times"][per_time.argmax()] in ("19:00", "19:30")
+    assert np.all((forecast["occupancy"] >= 0) & (forecast["occupancy"] <= 1))
+
+    one = history_db.demand.forecast("2030-01-21", 7, location_ids=["LOC003", "LOC999"])
+    assert one["location_ids"] == ["LOC003"]
+    assert np.allclose(one["covers"][0], forecast["covers"][forecast["location_ids"].index("LOC003")])
+
+
+def test_forecast_follows_history_changes(history_db):
+    demand = history_db.demand
+    demand.refresh()
+    before = demand.forecast("2030-01-21", 7)
+    # Served from the cache while the aggregates are unchanged
+    assert demand.forecast("2030-01-21", 7)["covers"].base is before["covers"].base
+    other = demand.profile[history_db.catalog.index["LOC002"]].copy()
+
+    # A busy Saturday night at LOC001, finished after the forecast was cached
+    for n in range(10):
+        _insert(history_db, f"F{n}", "LOC001", "2030-01-12", party_size=8)
+    after = demand.forecast("2030-01-21", 7)
+    i = after["location_ids"].index("LOC001")
+    saturday_19 = (i, 5, after["times"].index("19:00"))
+    assert after["covers"][saturday_19] > before["covers"][saturday_19]
+    assert np.array_equal(demand.profile[history_db.catalog.index["LOC002"]], other)
+
+
+def test_predict_demand(db):
+    location = db.get_location_details("LOC001")
+    quiet = db.predict_demand("LOC001", "2030-01-15", "19:00")
+    assert quiet["predicted_covers"] == 0 and quiet["demand"] == "low"
+
+    db.create_reservation("LOC001", "2030-01-15", "19:00", location["seating_capacity"] - 2, "Ada", "5551234")
+    busy = db.predict_demand("LOC001", "2030-01-15", "19:00")
+    assert busy["booked_covers"] == location["seating_capacity"] - 2
+    assert busy["demand"] == "very high" and busy["recommendation"]
+    slot = db.get_available_slots("2030-01-15", "19:00", 2, location_id="LOC001")[0]
+    assert slot["demand"] == "very high"
+
+    with pytest.raises(ValueError):
+        db.predict_demand("LOC999", "2030-01-15", "19:00")
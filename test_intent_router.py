@@ -0,0 +1,57 @@
+"""
+Tests for the deterministic fast-path intent router
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from src.agent.intent_router import IntentRouter, parse_party_size, parse_time
+
+TODAY = date.today()
+TOMORROW = (TODAY + timedelta(days=1)).isoformat()
+NEXT_MONTH = (TODAY + timedelta(days=30)).isoformat()
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(["new york", "chicago", "san francisco"], ["italian", "thai"], today=TODAY)
+
+
+def test_cancel_with_confirmation_number(router):
+    assert router.route("Please cancel my reservation gf-ab12cd34") == (
+        "cancel_reservation", {"confirmation_number": "GF-AB12CD34"}
+    )
+
+
+def test_formulaic_search_is_routed(router):
+    assert router.route(f"Italian in Chicago for 4 on {NEXT_MONTH} at 19:00") == (
+        "search_available_slots",
+        {"date": NEXT_MONTH, "time": "19:00", "party_size": 4, "city": "chicago", "cuisine": "italian"},
+    )
+    assert router.route("find me a table for two in San Francisco tomorrow at 7:30pm") == (
+        "search_available_slots",
+        {"date": TOMORROW, "time": "19:30", "party_size": 2, "city": "san francisco"},
+    )
+
+
+@pytest.mark.parametrize("message", [
+    "cancel GF-AB12CD34 and book another table",            # second intent
+    "cancel GF-AB12CD34 GF-ZZ12CD34",                       # two reservations
+    f"romantic Italian in Chicago for 4 on {NEXT_MONTH} at 19:00",  # preference words
+    f"Italian in Chicago for 4 on {NEXT_MONTH}",            # no time
+    "Italian or Thai in Chicago for 4 tomorrow at 7 pm",    # two cuisines
+    "table for 4 in Chicago or New York tomorrow at 7 pm",  # two cities
+    "Italian in Chicago for 4 tomorrow at 7 pm or 8 pm",    # two times
+    "Italian in Chicago for 4 on 2001-01-01 at 19:00",      # date in the past
+])
+def test_ambiguous_messages_fall_through(router, message):
+    assert router.route(message) is None
+
+
+def test_slot_parsers():
+    assert parse_time("at noon") == "12:00"
+    assert parse_time("7 pm") == "19:00"
+    assert parse_time("12am") == "00:00"
+    assert parse_party_size("party of six") == 6
+    assert parse_party_size("for dinner") is None
@@ -0,0 +1,117 @@
+"""
+Tests for the offline completion backends (scripted stand-in and cassettes)
+"""
+
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import pytest
+from groq import Groq
+
+from src.agent.async_agent import AsyncLlamaAgent
+from src.agent.backends import Cassette, LocalClient, RecordingClient, ScriptedResponder, make_server
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.database.async_db import AsyncRestaurantDatabase
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+
+DAY = (date.today() + timedelta(days=30)).isoformat()
+SEARCH = f"Any tables for 4 in Chicago on {DAY} at 19:00 somewhere romantic?"
+
+
+@pytest.fixture
+def db():
+    db = RestaurantDatabase(":memory:")
+    return db
+
+
+def _agent(db, client, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    return LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=client,
+                      response_cache=ResponseCache())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_scripted_backend_drives_the_full_tool_loop(db, monkeypatch, stream):
+    agent = _agent(db, LocalClient(ScriptedResponder()), monkeypatch)
+
+    if stream:
+        events = list(agent.stream_message(SEARCH))
+        response = events[-1]["response"]
+        assert "".join(e["delta"] for e in events if e["type"] == "text") == response["response_text"]
+    else:
+        response = agent.process_message(SEARCH)
+
+    assert [call["name"] for call in response["tool_calls"]] == ["search_available_slots"]
+    assert response["tool_calls"][0]["input"]["city"] == "chicago"
+    assert response["response_text"].startswith("Here is what I found (count=")
+
+
+def test_usage_and_latency_are_simulated():
+    client = LocalClient(ScriptedResponder([{"content": "hi there"}], completion_tokens=50),
+                         latency_ms=0, token_latency_ms=1)
+    response = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "x" * 400}])
+    assert response.choices[0].message.content == "hi there"
+    assert response.usage.completion_tokens == 50 and response.usage.prompt_tokens == 104
+
+
+def test_recorded_session_replays_offline(db, monkeypatch, tmp_path):
+    path = str(tmp_path / "session.json")
+    recorder = RecordingClient(LocalClient(ScriptedResponder()), Cassette(path))
+    recorded = _agent(db, recorder, monkeypatch).process_message(SEARCH)
+
+    replayed = _agent(db, LocalClient(Cassette(path)), monkeypatch).process_message(SEARCH)
+    assert replayed["response_text"] == recorded["response_text"]
+
+    missed = _agent(db, LocalClient(Cassette(path)), monkeypatch).process_message("something new")
+    assert "No recorded completion" in missed["response_text"]
+
+
+def test_recorded_booking_replays_against_a_fresh_database(monkeypatch, tmp_path):
+    path = str(tmp_path / "session.json")
+    turns = [SEARCH, "Book it under Ada Lovelace, phone 555-123-4567", "Thanks, is there parking?"]
+
+    def session(client):
+        agent = _agent(RestaurantDatabase(":memory:"), client, monkeypatch)
+        return [agent.process_message(turn) for turn in turns]
+
+    recorded = session(RecordingClient(LocalClient(ScriptedResponder()), Cassette(path)))
+    replayed = session(LocalClient(Cassette(path)))
+
+    # The replayed booking gets a new confirmation number, which must not change later keys
+    booked = [turn["reservation_created"]["confirmation_number"] for turn in (recorded[1], replayed[1])]
+    assert booked[0] != booked[1]
+    assert [turn["response_text"] for turn in replayed[2:]] == [turn["response_text"] for turn in recorded[2:]]
+    assert [[call["name"] for call in turn["tool_calls"]] for turn in replayed] == \
+        [["search_available_slots"], ["create_reservation"], []]
+
+
+def test_async_agent_runs_on_the_scripted_backend(db, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    agent = AsyncLlamaAgent(AsyncRestaurantDatabase(db), NoShowPredictor(), RecommendationEngine(db),
+                            client=LocalClient(ScriptedResponder(), async_mode=True),
+                            response_cache=ResponseCache())
+    response = asyncio.run(agent.process_message(SEARCH))
+    assert response["tool_calls"][0]["name"] == "search_available_slots"
+
+
+def test_http_stand_in_speaks_the_groq_protocol():
+    server = make_server(ScriptedResponder([{"tool_calls": [{"name": "cancel_reservation",
+                                                            "arguments": {"confirmation_number": "GF-AB12CD34"}}]}]),
+                         port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = Groq(api_key="offline", base_url=f"http://127.0.0.1:{server.server_port}")
+        message = client.chat.completions.create(
+            model="m", messages=[{"role": "user", "content": "cancel"}]
+        ).choices[0].message
+        assert message.tool_calls[0].function.name == "cancel_reservation"
+
+        chunks = list(client.chat.completions.create(
+            model="m", messages=[{"role": "user", "content": "cancel"}], stream=True
+        ))
+        assert chunks[-1].x_groq.usage.total_tokens > 0
+    finally:
+        server.shutdown()
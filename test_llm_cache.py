@@ -0,0 +1,74 @@
+"""
+Tests for the persistent LLM response cache
+"""
+
+from src.agent.llm_cache import ResponseCache
+
+
+def _request(user_text, tool_result=None):
+    messages = [{"role": "system", "content": "prompt"}, {"role": "user", "content": user_text}]
+    if tool_result:
+        messages.append({"role": "tool", "tool_call_id": "c1", "content": tool_result})
+    return {"model": "m", "messages": messages, "tools": [], "temperature": 0.7, "max_tokens": 10}
+
+
+def test_normalized_requests_share_a_key():
+    key = ResponseCache.make_key(_request("Italian in  New York for 4"))
+    assert key == ResponseCache.make_key(_request(" Italian in New York for 4 "))
+    assert key != ResponseCache.make_key(_request("Thai in New York for 4"))
+    # Replayed tool arguments copy names verbatim, so case is part of the key
+    assert ResponseCache.make_key(_request("Book for Ada Lee")) != ResponseCache.make_key(_request("book for ada lee"))
+
+
+def test_hits_do_not_write_to_disk(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_memory_entries=1, max_disk_entries=2)
+    cache.put("k0", {"content": "0", "tool_calls": []})
+    cache.put("k1", {"content": "1", "tool_calls": []})
+    changes = cache._conn.total_changes
+
+    assert cache.get("k0")["content"] == "0"
+    assert cache.get("k0")["content"] == "0"
+    assert cache._conn.total_changes == changes and not cache._conn.in_transaction
+
+    # The next store writes the pending access first, so k0 is now the most recent and k1 goes
+    cache.put("k2", {"content": "2", "tool_calls": []})
+    rows = cache._conn.execute("SELECT key FROM llm_responses ORDER BY key").fetchall()
+    assert [r[0] for r in rows] == ["k0", "k2"]
+
+
+def test_hits_survive_restart_and_respect_ttl(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    cache.put("k", {"content": "hello", "tool_calls": []})
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get("k") == {"content": "hello", "tool_calls": []}
+    assert reopened.get("missing") is None
+    assert reopened.stats()["hits"] == 1 and reopened.stats()["misses"] == 1
+
+    expired = ResponseCache(path, ttl_seconds=1e-9)
+    assert expired.get("k") is None
+    assert expired.stats()["expired"] == 1
+
+
+def test_tool_dependent_entries_go_stale_when_data_changes():
+    cache = ResponseCache()
+    request = _request("any tables?", tool_result="count=3")
+    assert ResponseCache.depends_on_data(request)
+
+    key = ResponseCache.make_key(request)
+    cache.put(key, {"content": "3 tables", "tool_calls": []}, data_version=7)
+    assert cache.get(key, data_version=7)["content"] == "3 tables"
+    assert cache.get(key, data_version=8) is None
+    assert cache.stats()["stale"] == 1
+
+
+def test_size_bounds_evict_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_memory_entries=2, max_disk_entries=3)
+    for i in range(5):
+        cache.put(f"k{i}", {"content": str(i), "tool_calls": []})
+
+    assert len(cache._memory) == 2
+    rows = cache._conn.execute("SELECT key FROM llm_responses ORDER BY key").fetchall()
+    assert [r[0] for r in rows] == ["k2", "k3", "k4"]
@@ -0,0 +1,29 @@
+"""
+Smoke test for the concurrent conversation load generator
+"""
+
+import json
+import os
+import sys
+
+from benchmarks.load_test import percentile, run_load_test
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) is None
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([5.0], 99) == 5.0
+
+
+def test_conversations_complete_without_errors():
+    environ, stdout = dict(os.environ), sys.stdout
+    report = run_load_test(users=3, conversations=6, latency_ms=0, token_latency_ms=0)
+
+    # Settings go to the agents, not the process
+    assert dict(os.environ) == environ and sys.stdout is stdout
+
+    assert report["summary"]["errors"] == 0
+    assert report["summary"]["conversations_completed"] == 6
+    assert all(report["stages"][stage]["count"] == 6 for stage in report["stages"])
+    assert report["sqlite"]["transactions"] >= 18  # book, modify and cancel per conversation
+    json.dumps(report)
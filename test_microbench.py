@@ -0,0 +1,36 @@
+"""
+Smoke test for the microbenchmark suite
+"""
+
+from benchmarks.microbench import BENCHMARKS, compare, fixture_path, parse_scales, run_suite
+from src.database.restaurant_db import RestaurantDatabase
+
+
+def test_suite_runs_every_benchmark(tmp_path):
+    report = run_suite([(87, 200)], warmup=1, repeat=3, data_dir=str(tmp_path))
+
+    assert {r["benchmark"] for r in report["results"]} == set(BENCHMARKS)
+    assert all(r["median_ms"] >= 0 and r["py_peak_kib"] >= 0 for r in report["results"])
+
+    # Write benchmarks run on a copy, so the cached fixture never drifts
+    fixture = RestaurantDatabase(fixture_path(str(tmp_path), 87, 200, 0))
+    assert fixture.conn.execute("SELECT COUNT(*) FROM reservations").fetchone()[0] == 200
+    fixture.close()
+
+
+def test_regressions_respect_thresholds():
+    def report(median, name="get_statistics"):
+        return {"results": [{"benchmark": name, "locations": 87, "reservations": 0, "median_ms": median}]}
+
+    assert compare(report(1.3), report(1.0)) == [{
+        "benchmark": "get_statistics", "locations": 87, "reservations": 0, "baseline_ms": 1.0,
+        "median_ms": 1.3, "change": 0.3, "threshold": 0.25,
+    }]
+    assert compare(report(1.2), report(1.0)) == []
+    assert compare(report(1.3), {**report(1.0), "thresholds": {"get_statistics": 0.5}}) == []
+    assert compare(report(0.03), report(0.01)) == []  # below the noise floor
+
+
+def test_scale_parsing():
+    assert parse_scales("smoke") == [(87, 0)]
+    assert parse_scales("87:0,1000:100000") == [(87, 0), (1000, 100000)]
@@ -0,0 +1,93 @@
+"""
+Tests for the fitted, batch no-show model
+"""
+
+from datetime import date
+
+import numpy as np
+import pytest
+
+from src.database.generator import GeneratorConfig, generate_database
+from src.database.ml_models import NoShowPredictor
+from src.database.no_show import MODEL_FORMAT, NoShowModel, fit_no_show_model, prior_history
+from src.database.restaurant_db import RestaurantDatabase
+
+TODAY = date(2030, 1, 15)
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("no_show") / "history.db")
+    generate_database(path, GeneratorConfig(locations=20, reservations=40000, seed=5, today=TODAY))
+    database = RestaurantDatabase(path)
+    yield database
+    database.close()
+
+
+@pytest.fixture(scope="module")
+def model(db):
+    return fit_no_show_model(db.conn, data_version=db.get_data_version())
+
+
+def test_fit_recovers_the_history(model, tmp_path):
+    c = model.coefficients
+    # The generator raises no-show odds for big parties, same-day bookings and
+    # flaky regulars, and lowers them for anniversaries
+    assert c["party_size"] > 0 and c["same_day"] > 0 and c["history_rate"] > 0
+    assert c["occasion_anniversary"] < c["occasion_casual"]
+    assert model.metrics["log_loss"] < model.metrics["baseline_log_loss"]
+
+    path = str(tmp_path / "model.json")
+    model.save(path)
+    assert NoShowModel.load(path) == model
+    assert NoShowPredictor(model_path=path).model == model
+    model_v0 = NoShowModel(**{**model.__dict__, "format": MODEL_FORMAT - 1})
+    model_v0.save(path)
+    with pytest.raises(ValueError):
+        NoShowModel.load(path)
+
+
+def test_prior_history_only_counts_earlier_visits():
+    phones = np.array(["a", "b", "a", "a", "b"])
+    dates = np.array(["2030-01-03", "2030-01-01", "2030-01-01", "2030-01-02", "2030-01-02"])
+    no_show = np.array([0.0, 1.0, 1.0, 0.0, 0.0])
+    no_shows, visits = prior_history(phones, dates, no_show)
+    assert visits.tolist() == [2, 0, 0, 1, 1]
+    assert no_shows.tolist() == [1, 0, 0, 1, 1]
+
+
+def test_batch_matches_single_predictions(db, model):
+    predictor = NoShowPredictor(db, model=model)
+    phone = db.conn.execute("""
+        SELECT customer_phone FROM reservations WHERE status = 'no_show'
+        GROUP BY customer_phone ORDER BY COUNT(*) DESC LIMIT 1
+    """).fetchone()[0]
+    cases = [(2, 0, "anniversary", None, "2030-01-18"), (8, 40, "", phone, "2030-01-19"),
+             (4, 5, "Birthday", phone, None), (1, 2, "picnic", "555-9999999", "2030-01-20")]
+    single = [predictor.predict_risk(p, a, o, customer_phone=c, date=d) for p, a, o, c, d in cases]
+    batch = predictor.predict_risk_batch(
+        [c[0] for c in cases], [c[1] for c in cases], [c[2] for c in cases],
+        weekday=[-1 if c[4] is None else date.fromisoformat(c[4]).weekday() for c in cases],
+        customer_phone=[c[3] for c in cases],
+    )
+    assert np.allclose(batch, single)
+    # A guest with a no-show record is riskier than a stranger booking the same way
+    assert predictor.predict_risk(8, 40, "", phone) > predictor.predict_risk(8, 40, "", "555-9999999")
+
+
+def test_score_upcoming(db, model):
+    scores = NoShowPredictor(db, model=model).score_upcoming(TODAY.isoformat())
+    expected = {row[0] for row in db.conn.execute(
+        "SELECT confirmation_number FROM reservations WHERE status = 'confirmed' AND date >= ?",
+        (TODAY.isoformat(),))}
+    assert set(scores) == expected and expected
+    assert all(0 < risk < 1 for risk in scores.values())
+    assert NoShowPredictor(db, model=model).score_upcoming("2099-01-01") == {}
+
+
+def test_rules_without_a_model(tmp_path):
+    predictor = NoShowPredictor(model_path=str(tmp_path / "missing.json"))
+    assert predictor.model is None
+    assert predictor.predict_risk(2, 0, "anniversary") == pytest.approx(0.20)
+    assert predictor.predict_risk(10, 1, "casual") == pytest.approx(0.55)
+    assert predictor.predict_risk_batch([2, 10], [20, 20], ["business", None]).tolist() == pytest.approx([0.0, 0.25])
@@ -0,0 +1,121 @@
+"""
+Query-plan regression tests
+Runs EXPLAIN QUERY PLAN on every statement issued by restaurant_db.py and
+ml_models.py and fails if any of them falls back to a full table scan
+"""
+
+import re
+import sqlite3
+
+import pytest
+
+from src.database.geo import city_center, haversine_km, scatter_coordinates
+from src.database.migrations import SCHEMA_VERSION, get_schema_version, migrate
+from src.database.restaurant_db import RestaurantDatabase
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.no_show import NoShowModel
+
+# "SCAN locations" / "SCAN l" is a table scan; "SCAN l USING INDEX ..." is not
+TABLE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+PLANNED = ("SELECT", "UPDATE", "DELETE", "INSERT INTO SLOT_OCCUPANCY")
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "plans.db"))
+    yield database
+    database.close()
+
+
+def _exercise(db):
+    """Call every public query path once"""
+    engine = RecommendationEngine(db)
+
+    db.get_available_slots("2030-01-15", "19:00", 2)
+    db.get_available_slots("2030-01-15", "19:00", 2, cuisine="Italian")
+    db.get_available_slots("2030-01-15", "19:00", 2, city="New York")
+    db.get_available_slots("2030-01-15", "19:00", 2, cuisine="Italian", city="new york ")
+    db.get_available_slots("2030-01-15", "19:00", 2, location_id="LOC001")
+    db.get_availability_grid("2030-01-15", "2030-01-17", "18:00", "21:00", 2)
+    db.get_availability_grid("2030-01-15", "2030-01-15", "18:00", "21:00", 2, city="Chicago")
+    db.find_nearby(41.88, -87.63, date="2030-01-15", time="19:00", party_size=2)
+
+    res = db.create_reservation("LOC001", "2030-01-15", "19:00", 2, "Ada", "5551234")
+    db.modify_reservation(res["confirmation_number"], {"time": "20:00", "party_size": 3})
+    db.cancel_reservation(res["confirmation_number"])
+
+    db.get_location_details("LOC001")
+    db.get_statistics()
+    db.get_data_version()
+    db.get_lookup_values()
+
+    engine.get_recommendations(party_size=2)
+    engine.get_recommendations(party_size=2, cuisine="japanese")
+
+    predictor = NoShowPredictor(db, model=NoShowModel(coefficients={}, occasions=[], base_rate=0.1))
+    predictor.predict_risk(2, 3, customer_phone="5551234")
+    predictor.score_upcoming("2030-01-01")
+
+    db.predict_demand("LOC001", "2030-01-15", "19:00")
+    db.demand.forecast("2030-01-15", 7, location_ids=["LOC001"])
+
+
+def _table_scans(conn, sql):
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [row[3] for row in rows if TABLE_SCAN.match(row[3])]
+
+
+def test_no_query_falls_back_to_table_scan(db):
+    statements = []
+    db.pool.set_trace_callback(statements.append)
+    _exercise(db)
+    db.pool.set_trace_callback(None)
+
+    planned = [s for s in statements if s.lstrip().upper().startswith(PLANNED)]
+    assert planned, "trace callback captured no statements"
+
+    failures = {}
+    for sql in planned:
+        scans = _table_scans(db.conn, sql)
+        if scans:
+            failures[" ".join(sql.split())] = scans
+
+    assert not failures, f"table scans detected: {failures}"
+
+
+def test_lookup_keys_match_case_insensitively(db):
+    city = db.get_location_details("LOC001")["city"]
+    upper = db.get_available_slots("2030-01-15", "19:00", 1, city=city.upper())
+    exact = db.get_available_slots("2030-01-15", "19:00", 1, city=city)
+    assert upper == exact and exact
+
+
+def test_migrate_upgrades_legacy_database(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE locations (
+            location_id TEXT PRIMARY KEY, name TEXT NOT NULL, address TEXT NOT NULL,
+            city TEXT NOT NULL, phone TEXT NOT NULL, cuisine TEXT NOT NULL,
+            seating_capacity INTEGER NOT NULL, avg_rating REAL DEFAULT 4.5,
+            price_range TEXT DEFAULT 'moderate', hours_open TEXT DEFAULT '11:00',
+            hours_close TEXT DEFAULT '23:00', special_features TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        INSERT INTO locations (location_id, name, address, city, phone, cuisine, seating_capacity)
+        VALUES ('LOC001', 'Thai House', '1 Main St', 'Boston', '555-0000', 'Thai', 50)
+    """)
+    conn.commit()
+
+    assert get_schema_version(conn) == 0
+    assert migrate(conn) == SCHEMA_VERSION
+    assert migrate(conn) == SCHEMA_VERSION
+    row = conn.execute("SELECT city_key, cuisine_key FROM locations").fetchone()
+    assert row == ("boston", "thai")
+    # Pre-coordinate rows are placed deterministically around their city
+    point = conn.execute("SELECT latitude, longitude FROM locations").fetchone()
+    assert point == scatter_coordinates("LOC001", "Boston")
+    assert haversine_km(*point, *city_center("Boston")) < 50
+    conn.close()
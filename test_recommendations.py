@@ -0,0 +1,185 @@
+"""
+Tests for whole-catalog recommendation scoring
+"""
+
+import threading
+
+import pytest
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.database.catalog import COLUMN_TYPES, LOCATION_COLUMNS, LocationCatalog
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.utils.telemetry import Telemetry
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "recs.db"))
+    yield database
+    database.close()
+
+
+def _location(db, location_id):
+    row = db.conn.execute(f"SELECT {', '.join(LOCATION_COLUMNS)} FROM locations WHERE location_id = ?",
+                          (location_id,)).fetchone()
+    return dict(row)
+
+
+def _insert(db, row):
+    columns = ", ".join(row)
+    with db.pool.write() as conn:
+        conn.execute(f"INSERT INTO locations ({columns}) VALUES ({', '.join('?' * len(row))})", list(row.values()))
+
+
+def test_ranks_the_whole_catalog(db):
+    engine = RecommendationEngine(db)
+    engine.catalog.refresh()
+    top_rated = {row[0] for row in db.conn.execute(
+        "SELECT location_id FROM locations ORDER BY avg_rating DESC LIMIT 10")}
+
+    # A budget match outside the ten best-rated locations still wins
+    target = next(row for row in engine.catalog.rows
+                  if row["price_range"] == "budget" and row["location_id"] not in top_rated)
+    budget_rows = [row for row in engine.catalog.rows if row["price_range"] == "budget"]
+    best = max(budget_rows, key=lambda row: row["avg_rating"])
+    results = engine.get_recommendations(party_size=2, budget="budget", limit=3)
+    assert results[0]["location_id"] == best["location_id"]
+    assert all(r["price_range"] == "budget" for r in results)
+    assert target["location_id"] in [r["location_id"] for r in
+                                     engine.get_recommendations(2, budget="budget", limit=len(budget_rows))]
+
+    scores = [r["match_score"] for r in engine.get_recommendations(2, budget="Fine Dining", limit=10)]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_filters_and_weights(db):
+    engine = RecommendationEngine(db, weights={"price_match": 0.0})
+    results = engine.get_recommendations(party_size=4, cuisine="ITALIAN", city="chicago", limit=50)
+    assert results and all(r["cuisine"] == "Italian" and r["city"] == "Chicago" for r in results)
+    assert engine.get_recommendations(party_size=4, cuisine="Klingon") == []
+    assert engine.get_recommendations(party_size=10_000) == []
+
+    # Without the price bonus the order is by rating alone
+    ratings = [r["rating"] for r in engine.get_recommendations(party_size=2, budget="budget", limit=10)]
+    assert ratings == sorted(ratings, reverse=True)
+
+
+def test_catalog_refreshes_incrementally(db):
+    engine = RecommendationEngine(db)
+    catalog = engine.catalog
+    assert catalog.refresh() and not catalog.refresh()
+    size, version = len(catalog), catalog.version
+
+    with db.pool.write() as conn:
+        conn.execute("UPDATE locations SET avg_rating = 5.0, price_range = 'budget' WHERE location_id = 'LOC050'")
+    new = {**_location(db, "LOC001"), "location_id": "LOC900", "name": "New Place", "avg_rating": 4.9}
+    _insert(db, new)
+    with db.pool.write() as conn:
+        conn.execute("DELETE FROM locations WHERE location_id = 'LOC002'")
+
+    # Writes through the catalog's own pool are picked up as they commit
+    assert catalog.version > version and not catalog.refresh()
+    assert len(catalog) == size
+    assert catalog.rating[catalog.index["LOC050"]] == 5.0
+    assert not catalog.active[catalog.index["LOC002"]]
+    ids = [r["location_id"] for r in engine.get_recommendations(2, budget="budget", limit=200)]
+    assert ids[0] == "LOC050" and "LOC002" not in ids
+    assert "LOC900" in [r["location_id"] for r in engine.get_recommendations(2, budget=new["price_range"],
+                                                                            limit=200)]
+
+
+def test_locations_closed_after_the_facet_lookup_are_not_ranked(db, tmp_path):
+    engine = RecommendationEngine(db)
+    best = engine.get_recommendations(2, city="Chicago", limit=1)[0]["location_id"]
+    other = RestaurantDatabase(str(tmp_path / "recs.db"))
+    with other.pool.write() as conn:
+        conn.execute("DELETE FROM locations WHERE location_id = ?", (best,))
+    other.close()
+    # The catalog has seen the delete, the facet index not yet
+    assert engine.catalog.refresh() and engine.facets.version < engine.catalog.version
+
+    ranked = engine.top_k(2, city="Chicago", k=3)
+    assert ranked and all(engine.catalog.rows[i] is not None for i, _ in ranked)
+    assert best not in [r["location_id"] for r in engine.get_recommendations(2, city="Chicago", limit=3)]
+
+
+def test_concurrent_refreshes_publish_whole_snapshots(db):
+    catalog = LocationCatalog(db)
+    catalog.refresh()
+    seen = []
+
+    def refresh_and_read():
+        for _ in range(20):
+            catalog.refresh()
+            snapshot = catalog.snapshot
+            seen.append((snapshot.version, {len(getattr(snapshot, name)) for name in COLUMN_TYPES}
+                         | {len(snapshot.rows)}))
+
+    def write():
+        for n in range(20):
+            _insert(db, {**_location(db, "LOC001"), "location_id": f"LOC9{n:02d}", "name": f"Place {n}"})
+
+    threads = [threading.Thread(target=refresh_and_read) for _ in range(4)] + [threading.Thread(target=write)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    catalog.refresh()
+    assert catalog.version == db.conn.execute("SELECT MAX(seq) FROM location_changes").fetchone()[0]
+    assert len(catalog.rows) == len(catalog.rating) == len(catalog.latitude)
+    assert all(len(lengths) == 1 for _, lengths in seen)
+    with pytest.raises(ValueError):
+        catalog.rating[0] = 0.0
+
+
+def test_change_log_is_pruned_past_every_reader(db, tmp_path):
+    # A second pool on the same file stands in for another process
+    other = RestaurantDatabase(str(tmp_path / "recs.db"))
+    leader, lagging = db.catalog, other.catalog
+    leader.current()
+    lagging.current()
+    with other.pool.write():
+        pass  # bookkeeping rides along with writes
+    start = lagging.version
+    for rating in (4.1, 4.2, 4.3):
+        with db.pool.write() as conn:
+            conn.execute("UPDATE locations SET avg_rating = ? WHERE location_id = 'LOC050'", (rating,))
+
+    def oldest():
+        return db.conn.execute("SELECT MIN(seq) FROM location_changes").fetchone()[0]
+
+    # The leader followed its own writes; the lagging catalog still needs everything after its version
+    assert leader.version == db.conn.execute("SELECT MAX(seq) FROM location_changes").fetchone()[0]
+    assert oldest() <= start + 1
+    assert lagging.refresh() and lagging.changed_rows(start) == [lagging.index["LOC050"]]
+    with other.pool.write():
+        pass
+    with db.pool.write():
+        pass
+    assert oldest() == leader.version == lagging.version
+
+    # A catalog whose entry expired has lost its changes and reloads everything
+    with db.pool.write() as conn:
+        conn.execute("DELETE FROM change_log_readers WHERE reader = ?", (lagging.reader_id,))
+        conn.execute("UPDATE locations SET avg_rating = 4.4 WHERE location_id = 'LOC050'")
+        conn.execute("UPDATE locations SET avg_rating = 4.5 WHERE location_id = 'LOC050'")
+    with db.pool.write():
+        pass
+    assert oldest() == leader.version
+    assert lagging.refresh() and lagging.changed_rows(start) is None
+    assert lagging.rating[lagging.index["LOC050"]] == 4.5
+    other.close()
+
+
+def test_agent_recommendation_tool(db, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    agent = LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=LocalClient(ScriptedResponder()),
+                       response_cache=ResponseCache(), telemetry=Telemetry())
+    result = agent._execute_tool("get_recommendations", {"party_size": 4, "occasion": "birthday",
+                                                         "budget": "upscale"})
+    assert result["success"] and result["recommendations"]
+    assert result["recommendations"][0]["price_range"] == "upscale"
@@ -0,0 +1,85 @@
+"""
+Tests for templated tool replies and the final-reply policy
+"""
+
+import json
+import threading
+from types import SimpleNamespace
+
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.agent.response_templates import BACKGROUND, KEEP, SKIP, choose_policy, render_tool_reply
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+
+CANCEL = {"name": "cancel_reservation", "input": {"confirmation_number": "GF-AB12CD34"},
+          "result": {"success": True, "message": "cancelled"}}
+SEARCH = {"name": "search_available_slots", "input": {}, "result": {"success": True, "available_slots": []}}
+
+
+def test_policy_per_round():
+    assert choose_policy([CANCEL]) == SKIP
+    assert choose_policy([CANCEL, SEARCH]) == KEEP
+    assert choose_policy([{**CANCEL, "result": {"success": False, "error": "nope"}}]) == KEEP
+    assert choose_policy([CANCEL], override=BACKGROUND) == BACKGROUND
+    assert choose_policy([CANCEL], override=KEEP) == KEEP
+    assert "GF-AB12CD34 has been cancelled" in render_tool_reply([CANCEL])
+
+
+class ScriptedClient:
+    """Returns queued assistant messages and records each request"""
+
+    def __init__(self, *messages):
+        self.messages = list(messages)
+        self.requests = []
+        self.threads = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        self.threads.append(threading.current_thread().name)
+        return SimpleNamespace(choices=[SimpleNamespace(message=self.messages.pop(0))])
+
+
+def _tool_call_message(name, arguments):
+    call = SimpleNamespace(id="call1", type="function",
+                           function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+    return SimpleNamespace(content=None, tool_calls=[call])
+
+
+def _cancelling_agent(monkeypatch, *follow_ups):
+    """Agent whose model cancels a fresh reservation, then says follow_ups"""
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    db = RestaurantDatabase(":memory:")
+    confirmation = db.create_reservation("LOC001", "2030-01-15", "19:00", 2, "Ann", "555-1234")["confirmation_number"]
+    client = ScriptedClient(_tool_call_message("cancel_reservation", {"confirmation_number": confirmation}),
+                            *follow_ups)
+    agent = LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=client,
+                       response_cache=ResponseCache())
+    return agent, client, confirmation
+
+
+def test_transactional_round_skips_second_completion(monkeypatch):
+    agent, client, confirmation = _cancelling_agent(monkeypatch)
+
+    response = agent.process_message("please cancel my booking")
+
+    assert len(client.requests) == 1
+    assert f"{confirmation} has been cancelled" in response["response_text"]
+    assert agent.messages[-1] == {"role": "assistant", "content": response["response_text"]}
+
+
+def test_background_policy_adds_follow_up_on_next_turn(monkeypatch):
+    agent, client, _ = _cancelling_agent(
+        monkeypatch, SimpleNamespace(content="Want to rebook for another night?", tool_calls=None)
+    )
+    agent.response_policy = BACKGROUND
+
+    agent.process_message("cancel it")
+    agent._follow_ups[0].result(timeout=5)
+
+    assert agent.collect_follow_ups() == ["Want to rebook for another night?"]
+    assert client.requests[1]["messages"][-1]["role"] == "system"
+    # Follow-ups never take a tool worker
+    assert client.threads[1].startswith("goodfoods-follow-up")
+    assert agent.messages[-1]["content"] == "Want to rebook for another night?"
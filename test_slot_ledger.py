@@ -0,0 +1,60 @@
+"""
+Tests for the slot occupancy ledger behind get_available_slots
+"""
+
+import pytest
+
+from src.database.restaurant_db import RestaurantDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "ledger.db"))
+    yield database
+    database.close()
+
+
+def _capacity(db, location_id, date="2030-01-15", time="19:00"):
+    slots = db.get_available_slots(date, time, 1, location_id=location_id)
+    return slots[0]["available_capacity"] if slots else 0
+
+
+def _seats(db, location_id):
+    return db.get_location_details(location_id)["seating_capacity"]
+
+
+def test_booking_reduces_capacity_by_party_size(db):
+    seats = _seats(db, "LOC001")
+    db.create_reservation("LOC001", "2030-01-15", "19:00", 6, "Ada", "5551234")
+    assert _capacity(db, "LOC001") == seats - 6
+    assert _capacity(db, "LOC001", time="20:00") == seats
+
+
+def test_modify_and_cancel_move_covers(db):
+    seats = _seats(db, "LOC002")
+    res = db.create_reservation("LOC002", "2030-01-15", "19:00", 4, "Ada", "5551234")
+
+    db.modify_reservation(res["confirmation_number"], {"time": "20:00", "party_size": 5})
+    assert _capacity(db, "LOC002") == seats
+    assert _capacity(db, "LOC002", time="20:00") == seats - 5
+
+    db.cancel_reservation(res["confirmation_number"])
+    db.cancel_reservation(res["confirmation_number"])  # idempotent
+    assert _capacity(db, "LOC002", time="20:00") == seats
+
+
+def test_overbooking_is_rejected(db):
+    seats = _seats(db, "LOC003")
+    db.create_reservation("LOC003", "2030-01-15", "19:00", seats, "Ada", "5551234")
+    assert db.get_available_slots("2030-01-15", "19:00", 1, location_id="LOC003") == []
+    with pytest.raises(ValueError):
+        db.create_reservation("LOC003", "2030-01-15", "19:00", 1, "Bob", "5554321")
+
+
+def test_rebuild_matches_incremental_ledger(db):
+    for time in ("18:00", "19:00", "19:00"):
+        db.create_reservation("LOC004", "2030-01-15", time, 3, "Ada", "5551234")
+    before = db.conn.execute("SELECT * FROM slot_occupancy ORDER BY time").fetchall()
+    db.rebuild_slot_occupancy()
+    after = db.conn.execute("SELECT * FROM slot_occupancy ORDER BY time").fetchall()
+    assert [tuple(r) for r in before] == [tuple(r) for r in after]
@@ -0,0 +1,96 @@
+"""
+Tests for the spatial index and nearby search
+"""
+
+import numpy as np
+import pytest
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.agent.tool_encoding import encode_tool_result
+from src.database.geo import CITY_CENTERS, haversine_km
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.database.spatial import SpatialIndex
+from src.utils.telemetry import Telemetry
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "spatial.db"))
+    yield database
+    database.close()
+
+
+def _brute_force(catalog, latitude, longitude):
+    distances = haversine_km(latitude, longitude, catalog.latitude, catalog.longitude)
+    rows = np.flatnonzero(catalog.active & ~np.isnan(distances))
+    return rows[np.lexsort((rows, distances[rows]))], distances
+
+
+def test_index_matches_brute_force(db):
+    catalog = db.catalog
+    catalog.refresh()
+    # Small cells so queries cross many of them
+    index = SpatialIndex(catalog, cell_km=0.5)
+    for latitude, longitude in list(CITY_CENTERS.values()) + [(37.8, -122.3), (0.0, 0.0)]:
+        expected, distances = _brute_force(catalog, latitude, longitude)
+        for radius in (1, 4, 12, 40):
+            rows, found = index.within(latitude, longitude, radius)
+            assert rows.tolist() == [i for i in expected if distances[i] <= radius]
+            assert np.allclose(found, distances[rows]) and np.all(np.diff(found) >= 0)
+        rows, _ = index.nearest(latitude, longitude, 5)
+        nearby = [i for i in expected if distances[i] <= 500][:5]
+        assert rows.tolist() == nearby
+
+
+def test_find_nearby_filters(db):
+    latitude, longitude = CITY_CENTERS["chicago"]
+    results = db.find_nearby(latitude, longitude, limit=5)
+    assert len(results) == 5 and all(r["city"] == "Chicago" for r in results)
+    assert [r["distance_km"] for r in results] == sorted(r["distance_km"] for r in results)
+
+    cuisine = results[0]["cuisine"]
+    assert all(r["cuisine"] == cuisine for r in db.find_nearby(latitude, longitude, cuisine=cuisine.lower()))
+    assert all(r["distance_km"] <= 5 for r in db.find_nearby(latitude, longitude, radius_km=5))
+
+    # A fully booked nearest location gives way to the next one
+    nearest = db.get_location_details(results[0]["location_id"])
+    db.create_reservation(nearest["location_id"], "2030-01-15", "19:00", nearest["seating_capacity"], "Ada", "5551234")
+    open_now = db.find_nearby(latitude, longitude, limit=5, date="2030-01-15", time="19:00", party_size=2)
+    assert [r["location_id"] for r in open_now[:4]] == [r["location_id"] for r in results[1:]]
+    assert all(r["available_capacity"] >= 2 for r in open_now)
+
+    with pytest.raises(ValueError):
+        db.find_nearby(91, 0)
+    with pytest.raises(ValueError):
+        db.find_nearby(latitude, longitude, date="2030-01-15")
+
+
+def test_index_follows_location_changes(db):
+    with db.pool.write() as conn:
+        conn.execute("UPDATE locations SET latitude = 0.001, longitude = 0.001 WHERE location_id = 'LOC010'")
+    assert [r["location_id"] for r in db.find_nearby(0.0, 0.0, radius_km=1)] == ["LOC010"]
+    with db.pool.write() as conn:
+        conn.execute("DELETE FROM locations WHERE location_id = 'LOC010'")
+    assert db.find_nearby(0.0, 0.0, radius_km=1) == []
+
+
+def test_agent_tool(db, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    agent = LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=LocalClient(ScriptedResponder()),
+                       response_cache=ResponseCache(), telemetry=Telemetry())
+    result = agent._execute_tool("search_nearby", {"near": "downtown SF", "party_size": 2})
+    assert result["success"] and result["origin"] == "San Francisco"
+    assert result["nearby"] and all(r["city"] == "San Francisco" for r in result["nearby"][:3])
+    assert encode_tool_result("search_nearby", result).startswith("origin=San Francisco\ncount=")
+
+    assert not agent._execute_tool("search_nearby", {"near": "me"})["success"]
+    agent.set_user_location(*CITY_CENTERS["boston"])
+    result = agent._execute_tool("search_nearby", {"near": "me", "radius_km": 10})
+    assert result["success"] and all(r["city"] == "Boston" for r in result["nearby"])
+
+    location = db.get_location_details("LOC002")
+    result = agent._execute_tool("search_nearby", {"near": location["name"] + " in " + location["city"]})
+    assert result["nearby"][0]["location_id"] == "LOC002" and result["nearby"][0]["distance_km"] == 0
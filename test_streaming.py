@@ -0,0 +1,85 @@
+"""
+Tests for the event sequence stream_message yields
+"""
+
+import pytest
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.utils.telemetry import Telemetry
+
+SEARCH = {"name": "search_available_slots",
+          "arguments": {"date": "2030-01-15", "time": "19:00", "party_size": 2, "city": "Chicago"}}
+
+
+@pytest.fixture
+def db():
+    db = RestaurantDatabase(":memory:")
+    yield db
+    db.close()
+
+
+def _agent(db, monkeypatch, script=None):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    return LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db),
+                      client=LocalClient(ScriptedResponder(script)),
+                      response_cache=ResponseCache(), telemetry=Telemetry())
+
+
+def _shown(events):
+    """The reply a UI ends up showing: deltas appended, replace events starting over"""
+    text = ""
+    for event in events:
+        if event["type"] == "text":
+            text += event["delta"]
+        elif event["type"] == "replace":
+            text = event["text"]
+    return text
+
+
+def test_deltas_join_into_the_response_text(db, monkeypatch):
+    reply = "Two places in Chicago have room at 19:00, both well rated and close to the river."
+    events = list(_agent(db, monkeypatch, [{"tool_calls": [SEARCH]}, {"content": reply}]).stream_message("x"))
+
+    types = [event["type"] for event in events]
+    assert types[:2] == ["tool_call", "tool_result"] and types[-1] == "done"
+    assert types.count("text") > 1 and "replace" not in types
+    assert "".join(event["delta"] for event in events if event["type"] == "text") == reply
+    assert events[1]["result"]["success"] and events[1]["input"] == events[0]["input"]
+
+    response = events[-1]["response"]
+    assert set(response) == {"response_text", "tool_calls", "reservation_created"}
+    assert response["response_text"] == _shown(events) == reply
+    assert [call["name"] for call in response["tool_calls"]] == ["search_available_slots"]
+    assert response["reservation_created"] is None
+
+
+def test_claimed_booking_without_a_tool_is_replaced(db, monkeypatch):
+    claim = "Your table is booked, confirmation GF-12345678."
+    events = list(_agent(db, monkeypatch, [{"content": claim}]).stream_message("book it"))
+
+    streamed = "".join(event["delta"] for event in events if event["type"] == "text")
+    replace = [event for event in events if event["type"] == "replace"]
+    assert streamed == claim
+    assert len(replace) == 1 and events.index(replace[0]) == len(events) - 2
+    assert replace[0]["text"] != claim and "cannot complete the reservation" in replace[0]["text"]
+    assert events[-1]["response"]["response_text"] == _shown(events) == replace[0]["text"]
+
+
+def test_failed_completion_replaces_the_partial_reply(db, monkeypatch):
+    agent = _agent(db, monkeypatch)
+
+    def fail(**kwargs):
+        raise RuntimeError("upstream timeout")
+
+    agent.client.chat.completions.create = fail
+    events = list(agent.stream_message("hi"))
+
+    assert [event["type"] for event in events] == ["replace", "done"]
+    response = events[-1]["response"]
+    assert "upstream timeout" in response["response_text"]
+    assert response["response_text"] == _shown(events)
+    assert response["tool_calls"] == [] and response["reservation_created"] is None
@@ -0,0 +1,127 @@
+"""
+Tests for tracing spans and metrics export
+"""
+
+import asyncio
+import json
+import urllib.request
+from datetime import date, timedelta
+
+import pytest
+
+from src.agent.async_agent import AsyncLlamaAgent
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.database.async_db import AsyncRestaurantDatabase
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.utils.telemetry import Metrics, Telemetry
+
+DAY = (date.today() + timedelta(days=30)).isoformat()
+SEARCH = f"Any tables for 4 in Chicago on {DAY} at 19:00 somewhere romantic?"
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "traced.db"))
+    yield database
+    database.close()
+
+
+def _agent(db, telemetry, monkeypatch, agent_class=LlamaAgent, **kwargs):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    client = LocalClient(ScriptedResponder(), **kwargs)
+    return agent_class(db, NoShowPredictor(), RecommendationEngine(db), client=client,
+                       response_cache=ResponseCache(), telemetry=telemetry)
+
+
+def _spans(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_turn_spans_nest_llm_tool_and_sql(db, tmp_path, monkeypatch):
+    telemetry = Telemetry(trace_path=str(tmp_path / "traces.jsonl"))
+    agent = _agent(db, telemetry, monkeypatch)
+    list(agent.stream_message(SEARCH))
+
+    spans = _spans(tmp_path / "traces.jsonl")
+    by_id = {span["span_id"]: span for span in spans}
+    names = [span["name"] for span in spans]
+    assert names[0] == "turn" and spans[0]["parent_id"] is None
+    # Search results go back to the model for the final reply
+    assert spans[0]["attributes"]["path"] == "llm"
+    assert names.count("llm") == 2
+    assert {span["trace_id"] for span in spans} == {spans[0]["span_id"]}
+
+    tool = next(span for span in spans if span["name"] == "tool.search_available_slots")
+    assert by_id[tool["parent_id"]]["name"] == "turn"
+    assert tool["attributes"]["success"] is True
+    sql = [span for span in spans if span["name"] == "sql" and span["parent_id"] == tool["span_id"]]
+    assert sql and all(span["attributes"]["statement"] for span in sql)
+    # Children finish inside their parents
+    assert sum(span["duration_ms"] for span in sql) <= tool["duration_ms"] + 0.01
+
+
+def test_booking_spans_validation_and_prediction(db, tmp_path, monkeypatch):
+    telemetry = Telemetry(trace_path=str(tmp_path / "traces.jsonl"))
+    agent = _agent(db, telemetry, monkeypatch)
+    result = agent._execute_tool("create_reservation", {
+        "location_id": "LOC001", "date": DAY, "time": "19:00", "party_size": 2,
+        "customer_name": "Ann Lee", "customer_phone": "555-1234",
+    })
+    assert result["success"]
+
+    spans = _spans(tmp_path / "traces.jsonl")
+    root = spans[0]
+    assert root["name"] == "tool.create_reservation"
+    children = {span["name"] for span in spans if span["parent_id"] == root["span_id"]}
+    assert {"validate", "predict_no_show", "db.create_reservation"} <= children
+
+
+def test_sampling_skips_spans_but_keeps_metrics(db, tmp_path, monkeypatch):
+    telemetry = Telemetry(trace_path=str(tmp_path / "traces.jsonl"), sample_rate=0.0)
+    agent = _agent(db, telemetry, monkeypatch)
+    agent.process_message(SEARCH)
+
+    assert not (tmp_path / "traces.jsonl").exists()
+    snapshot = telemetry.metrics.snapshot()
+    assert snapshot["counters"]["goodfoods_turns_total"] == {'{path="llm"}': 1}
+    assert snapshot["counters"]["goodfoods_llm_calls_total"] == {'{cached="false",stream="false"}': 2}
+    assert snapshot["histograms"]["goodfoods_span_seconds"]['{span="turn"}']["count"] == 1
+
+
+def test_async_agent_tool_spans_keep_their_parent(db, tmp_path, monkeypatch):
+    telemetry = Telemetry(trace_path=str(tmp_path / "traces.jsonl"))
+    async_db = AsyncRestaurantDatabase(db)
+    agent = _agent(async_db, telemetry, monkeypatch, agent_class=AsyncLlamaAgent, async_mode=True)
+    asyncio.run(agent.process_message(SEARCH))
+
+    spans = _spans(tmp_path / "traces.jsonl")
+    by_id = {span["span_id"]: span for span in spans}
+    tool = next(span for span in spans if span["name"] == "tool.search_available_slots")
+    assert by_id[tool["parent_id"]]["name"] == "turn"
+    assert any(span["name"] == "sql" and span["parent_id"] == tool["span_id"] for span in spans)
+
+
+def test_prometheus_text_and_endpoint(tmp_path):
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.inc("goodfoods_tool_calls_total", tool="cancel_reservation", success="true")
+    metrics.observe("goodfoods_span_seconds", 0.5, span="turn")
+    text = metrics.render_prometheus()
+    assert 'goodfoods_tool_calls_total{success="true",tool="cancel_reservation"} 1' in text
+    assert 'goodfoods_span_seconds_bucket{span="turn",le="0.1"} 0' in text
+    assert 'goodfoods_span_seconds_bucket{span="turn",le="1"} 1' in text
+    assert 'goodfoods_span_seconds_bucket{span="turn",le="+Inf"} 1' in text
+    assert "# TYPE goodfoods_span_seconds histogram" in text
+
+    telemetry = Telemetry(metrics_path=str(tmp_path / "goodfoods.prom"))
+    telemetry.metrics = metrics
+    server = telemetry.serve_metrics(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        assert urllib.request.urlopen(url).read().decode() == text
+    finally:
+        telemetry.close()
+    assert (tmp_path / "goodfoods.prom").read_text() == text
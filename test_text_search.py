@@ -0,0 +1,67 @@
+"""
+Tests for local BM25 restaurant search
+"""
+
+import pytest
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.agent.tool_encoding import encode_tool_result
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.database.text_search import tokenize
+from src.utils.telemetry import Telemetry
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = RestaurantDatabase(str(tmp_path / "search.db"))
+    yield database
+    database.close()
+
+
+def test_tokenize():
+    assert tokenize("Romantic rooftop with Vegan options!") == ["romantic", "rooftop", "vegan", "option"]
+    assert tokenize("Chef's table, fine_dining, gluten-free") == ["chef", "table", "fine", "dining", "gluten", "free"]
+
+
+def test_descriptive_query_ranks_feature_matches_first(db):
+    results = db.search_restaurants("romantic rooftop with vegan options", limit=5)
+    assert results
+    best = results[0]["special_features"]
+    assert "rooftop" in best and "vegan options" in best
+    scores = [r["score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
+
+    city = results[0]["city"]
+    in_city = db.search_restaurants("rooftop", city=city.upper(), party_size=2)
+    assert in_city and all(r["city"] == city and "rooftop" in r["special_features"] for r in in_city)
+    assert db.search_restaurants("zzyzx") == []
+    with pytest.raises(ValueError):
+        db.search_restaurants("   ")
+
+
+def test_index_follows_location_changes(db):
+    assert db.search_restaurants("speakeasy") == []
+    version = db.text_index.version
+    with db.pool.write() as conn:
+        conn.execute("UPDATE locations SET special_features = 'hidden speakeasy' WHERE location_id = 'LOC007'")
+    assert [r["location_id"] for r in db.search_restaurants("speakeasy")] == ["LOC007"]
+    # Only the changed row was re-indexed
+    assert db.catalog.changed_rows(version) == [db.catalog.index["LOC007"]]
+
+    with db.pool.write() as conn:
+        conn.execute("DELETE FROM locations WHERE location_id = 'LOC007'")
+    assert db.search_restaurants("speakeasy") == []
+
+
+def test_agent_tool(db, monkeypatch):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    agent = LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=LocalClient(ScriptedResponder()),
+                       response_cache=ResponseCache(), telemetry=Telemetry())
+    result = agent._execute_tool("search_restaurants", {"query": "live music", "party_size": 4})
+    assert result["success"] and result["count"] == len(result["restaurants"]) > 0
+    encoded = encode_tool_result("search_restaurants", result)
+    assert encoded.startswith(f"count={result['count']}") and "live music" in encoded
+    assert not agent._execute_tool("search_restaurants", {"query": ""})["success"]
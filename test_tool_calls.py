@@ -0,0 +1,114 @@
+"""
+Tests for running a round of tool calls: ordering, concurrency and chaining
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.utils.telemetry import Telemetry
+
+SEARCH = {"name": "search_available_slots",
+          "arguments": {"date": "2030-01-15", "time": "19:00", "party_size": 2}}
+NEARBY = {"name": "search_nearby", "arguments": {"near": "Chicago"}}
+BOOK = {"name": "create_reservation", "arguments": {"location_id": "LOC001"}}
+CANCEL = {"name": "cancel_reservation", "arguments": {"confirmation_number": "GF-AB12CD34"}}
+
+
+@pytest.fixture
+def db():
+    db = RestaurantDatabase(":memory:")
+    yield db
+    db.close()
+
+
+def _agent(db, monkeypatch, script):
+    monkeypatch.setenv("FAST_PATH_ENABLED", "false")
+    return LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db),
+                      client=LocalClient(ScriptedResponder(script)),
+                      response_cache=ResponseCache(), telemetry=Telemetry())
+
+
+class RecordingTools:
+    """Stands in for _dispatch_tool, noting start/end order and overlap"""
+
+    def __init__(self, reads_meet: int = 0):
+        self.events = []
+        self.active = 0
+        self.max_active_with_write = 0
+        self._lock = threading.Lock()
+        # Read-only calls wait here until this many of them run at once
+        self.barrier = threading.Barrier(reads_meet) if reads_meet else None
+
+    def __call__(self, tool_name, arguments):
+        with self._lock:
+            self.events.append(("start", tool_name))
+            self.active += 1
+        if tool_name in LlamaAgent.WRITE_TOOLS:
+            time.sleep(0.02)
+            with self._lock:
+                self.max_active_with_write = max(self.max_active_with_write, self.active)
+        elif self.barrier:
+            self.barrier.wait(timeout=5)
+        with self._lock:
+            self.active -= 1
+            self.events.append(("end", tool_name))
+        return {"success": True, "tool": tool_name}
+
+
+def test_results_keep_call_order(db, monkeypatch):
+    agent = _agent(db, monkeypatch, [{"tool_calls": [SEARCH, BOOK, NEARBY, CANCEL]}, {"content": "All done."}])
+    monkeypatch.setattr(agent, "_dispatch_tool", RecordingTools())
+
+    response = agent.process_message("search, book, look nearby, then cancel")
+
+    names = [call["name"] for call in response["tool_calls"]]
+    assert names == ["search_available_slots", "create_reservation", "search_nearby", "cancel_reservation"]
+    assert [call["result"]["tool"] for call in response["tool_calls"]] == names
+    calls = next(m for m in agent.messages if m.get("tool_calls"))["tool_calls"]
+    tool_messages = [m for m in agent.messages if m["role"] == "tool"]
+    assert [m["tool_call_id"] for m in tool_messages] == [call["id"] for call in calls]
+
+
+def test_reads_run_together_and_writes_alone(db, monkeypatch):
+    round_ = [SEARCH, NEARBY, BOOK, CANCEL, SEARCH, NEARBY]
+    agent = _agent(db, monkeypatch, [{"tool_calls": round_}, {"content": "All done."}])
+    tools = RecordingTools(reads_meet=2)
+    monkeypatch.setattr(agent, "_dispatch_tool", tools)
+
+    agent.process_message("do everything at once")
+
+    # Both pairs of searches met at the barrier, so each pair overlapped
+    assert not tools.barrier.broken
+    assert tools.max_active_with_write == 1
+    # Writes start only after everything before them ended, and in call order
+    book = tools.events.index(("start", "create_reservation"))
+    cancel = tools.events.index(("start", "cancel_reservation"))
+    assert sorted(tools.events[book - 2:book]) == [("end", "search_available_slots"), ("end", "search_nearby")]
+    assert tools.events[book + 1:cancel + 1] == [("end", "create_reservation"), ("start", "cancel_reservation")]
+
+
+def test_tool_rounds_chain_up_to_max_tool_steps(db, monkeypatch):
+    monkeypatch.setenv("MAX_TOOL_STEPS", "2")
+    # Two tool rounds are allowed, so the third request goes out without tools
+    agent = _agent(db, monkeypatch, [{"tool_calls": [SEARCH]}, {"tool_calls": [NEARBY]},
+                                     {"content": "Here are my picks."}])
+    requests = []
+    create = agent.client.chat.completions.create
+    agent.client.chat.completions.create = lambda **kwargs: (
+        requests.append({**kwargs, "messages": list(kwargs["messages"])}) or create(**kwargs))
+    monkeypatch.setattr(agent, "_dispatch_tool", RecordingTools())
+
+    response = agent.process_message("find me somewhere")
+
+    assert [call["name"] for call in response["tool_calls"]] == ["search_available_slots", "search_nearby"]
+    assert ["tools" in request for request in requests] == [True, True, False]
+    # Each round sees the results of the one before it
+    assert requests[1]["messages"][-1]["role"] == "tool"
+    assert response["response_text"] == "Here are my picks."
@@ -0,0 +1,40 @@
+"""
+Tests for the compact tool-result encoder
+"""
+
+import json
+
+from src.agent.tool_encoding import encode_tool_result
+
+
+def _slot(n):
+    return {"location_id": f"LOC{n:03d}", "restaurant_name": f"Place|{n}", "cuisine": "Thai",
+            "address": "1 Main St", "city": "Boston", "rating": 4.5, "price_range": "budget",
+            "available_capacity": 40, "demand": "moderate"}
+
+
+def test_search_results_are_projected_and_capped():
+    result = {"success": True, "available_slots": [_slot(n) for n in range(20)], "count": 20}
+    encoded = encode_tool_result("search_available_slots", result, max_rows=3)
+    lines = encoded.splitlines()
+
+    assert lines[0] == "count=20 showing=3"
+    assert lines[1].split("|")[0] == "location_id" and "address" not in lines[1]
+    assert lines[2] == "LOC000|Place/0|Thai|Boston|4.5|budget|40|moderate"
+    assert len(lines) == 5
+    assert len(encoded) < len(json.dumps(result)) / 4
+
+
+def test_grid_results_are_one_line_per_location():
+    result = {"success": True, "party_size": 2, "dates": ["2030-01-15"], "times": ["18:00", "18:30"],
+              "locations": [{"location_id": "LOC001", "restaurant_name": "Thai House", "cuisine": "Thai",
+                             "city": "Boston", "rating": 4.5, "price_range": "budget",
+                             "availability": {"2030-01-15": [40, 0]}}]}
+    encoded = encode_tool_result("search_availability_grid", result)
+    assert encoded.splitlines()[-1].endswith("|2030-01-15:40,0")
+
+
+def test_errors_and_transactional_results_stay_small():
+    assert encode_tool_result("cancel_reservation", {"success": False, "error": "not found"}) == "error: not found"
+    encoded = encode_tool_result("cancel_reservation", {"success": True, "message": "done", "note": None})
+    assert encoded == '{"success":true,"message":"done"}'
@@ -0,0 +1,114 @@
+"""
+Tests for LLM token and cost accounting
+"""
+
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.agent.backends import LocalClient, ScriptedResponder
+from src.agent.llama_agent import LlamaAgent
+from src.agent.llm_cache import ResponseCache
+from src.agent.usage import HARD, HARD_BUDGET_REPLY, OK, SOFT, UsageLedger
+from src.database.ml_models import NoShowPredictor, RecommendationEngine
+from src.database.restaurant_db import RestaurantDatabase
+from src.utils.telemetry import Telemetry
+
+DAY = (date.today() + timedelta(days=30)).isoformat()
+SEARCH = f"Any tables for 4 in Chicago on {DAY} at 19:00 somewhere romantic?"
+
+
+@pytest.fixture
+def db():
+    db = RestaurantDatabase(":memory:")
+    return db
+
+
+def _agent(db, monkeypatch, client=None, fast_path=False, cache=None):
+    monkeypatch.setenv("FAST_PATH_ENABLED", str(fast_path).lower())
+    client = client or LocalClient(ScriptedResponder(completion_tokens=25))
+    return LlamaAgent(db, NoShowPredictor(), RecommendationEngine(db), client=client,
+                      response_cache=cache or ResponseCache(), telemetry=Telemetry())
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_reported_usage_is_accounted_per_path_and_model(db, monkeypatch, stream):
+    agent = _agent(db, monkeypatch)
+    if stream:
+        list(agent.stream_message(SEARCH))
+    else:
+        agent.process_message(SEARCH)
+
+    report = agent.get_usage_report()
+    totals = report["totals"]
+    assert totals["calls"] == 2 and totals["turns"] == 1 and totals["estimated_calls"] == 0
+    assert totals["completion_tokens"] == 50
+    assert totals["total_tokens"] == totals["prompt_tokens"] + 50
+    # llama-3.3-70b-versatile: $0.59 / $0.79 per million tokens
+    assert totals["cost_usd"] == pytest.approx((totals["prompt_tokens"] * 0.59 + 50 * 0.79) / 1e6, abs=1e-6)
+    assert list(report["by_path"]) == ["search_available_slots"]
+    assert list(report["by_model"]) == ["llama-3.3-70b-versatile"]
+    assert report["turns"][0]["answered_by"] == "llm"
+
+    snapshot = agent.telemetry.metrics.snapshot()["counters"]["goodfoods_llm_tokens_total"]
+    assert snapshot['{kind="completion",model="llama-3.3-70b-versatile"}'] == 50
+
+
+def test_missing_usage_is_estimated_and_cache_hits_are_free(db, monkeypatch):
+    class NoUsageClient:
+        def __init__(self):
+            self.chat = SimpleNamespace(completions=self)
+
+        def create(self, **kwargs):
+            message = SimpleNamespace(content="Hello! How can I help with a reservation?", tool_calls=None)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    cache = ResponseCache()
+    agent = _agent(db, monkeypatch, client=NoUsageClient(), cache=cache)
+    agent.process_message("hello there")
+    agent.reset_conversation()
+    agent.process_message("hello there")
+
+    report = agent.get_usage_report()
+    first, second = report["by_conversation"][1], report["by_conversation"][2]
+    assert report["totals"]["estimated_calls"] == 1
+    assert first["total_tokens"] > 0 and first["completion_tokens"] == 14
+    assert second == {**second, "cached_calls": 1, "total_tokens": 0}
+    assert report["by_path"]["chat"]["calls"] == 2
+
+
+def test_budgets(db, monkeypatch):
+    ledger = UsageLedger(soft_budget=100, hard_budget=200)
+    assert ledger.budget_state() == OK
+    ledger.record("llama-3.1-8b-instant", {"prompt_tokens": 90, "completion_tokens": 20})
+    assert ledger.budget_state() == SOFT
+    ledger.record("llama-3.1-8b-instant", {"prompt_tokens": 80, "completion_tokens": 20})
+    assert ledger.budget_state() == HARD
+
+    agent = _agent(db, monkeypatch, fast_path=True)
+    agent.usage = ledger
+    # Free-form turns are refused...
+    response = agent.process_message("What would you recommend for a birthday?")
+    assert response["response_text"] == HARD_BUDGET_REPLY
+    # ...but model-free ones still work
+    response = agent.process_message(f"Table for 2 in Boston on {DAY} at 7pm")
+    assert response["tool_calls"][0]["name"] == "search_available_slots"
+    assert ledger.report()["answered_by"] == {"budget": 1, "fast": 1}
+    assert ledger.total_tokens() == 210
+
+
+def test_soft_budget_compacts_history_harder(db, monkeypatch):
+    agent = _agent(db, monkeypatch)
+    for i in range(4):
+        agent.messages += [{"role": "user", "content": f"question {i} " + "x" * 400},
+                           {"role": "assistant", "content": "answer"}]
+    agent.memory.max_tokens = 400
+
+    agent._compact_history()
+    assert sum(m["role"] == "user" for m in agent.messages) == 3
+
+    agent.usage = UsageLedger(soft_budget=1)
+    agent.usage.record("m", {"prompt_tokens": 1, "completion_tokens": 0})
+    agent._compact_history()
+    assert sum(m["role"] == "user" for m in agent.messages) == 1